@@ -0,0 +1,350 @@
+"""
+Suite de benchmarks del bot.
+
+Uso:
+    python -m benchmarks.run                      # Compara con benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline      # Guarda los resultados como nueva referencia
+    python -m benchmarks.run --filter journal --max-size 1e7
+
+Cada benchmark se mide con datos sintéticos reproducibles y se expresa en
+segundos por operación. Si algún resultado empeora más de `--tolerance`
+respecto a la referencia guardada, el proceso termina con código 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import StubClient, synthetic_closes, synthetic_klines, write_history
+from data import position_ledger
+from data.trade_journal import TradeJournal
+from data.transaction_handler import calculate_profit
+from services.binance_api import BinanceAPI
+from services.kline_stream import QueueKlineSource
+from services.order_manager import OrderManager
+from services.trading_runtime import TradingRuntime
+from strategies.backtester import compute_indicator_columns
+from strategies.batch_kernels import close_matrix, compute_indicators
+from strategies.bollinger_bands import calculate_bollinger_bands
+from strategies.incremental import IndicatorEngine
+from strategies.macd import calculate_macd
+from strategies.moving_average import moving_average_strategy
+from strategies.rsi import calculate_rsi
+from utils.rate_limiter import WeightRateLimiter
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+INDICATOR_SIZES = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Registro: (grupo, nombre, tamaños, setup); setup(n, workdir) -> (función, operaciones por llamada)
+BENCHMARKS = []
+
+
+def benchmark(group, name, sizes):
+    def register(setup):
+        BENCHMARKS.append((group, name, sizes, setup))
+        return setup
+    return register
+
+
+# --- Indicadores vectorizados -------------------------------------------------
+
+def _frame(n):
+    return pd.DataFrame({'Close': synthetic_closes(n)})
+
+
+@benchmark('indicators', 'calculate_rsi', INDICATOR_SIZES)
+def _rsi(n, workdir):
+    data = _frame(n)
+    return (lambda: calculate_rsi(data)), 1
+
+
+@benchmark('indicators', 'calculate_macd', INDICATOR_SIZES)
+def _macd(n, workdir):
+    data = _frame(n)
+    return (lambda: calculate_macd(data)), 1
+
+
+@benchmark('indicators', 'calculate_bollinger_bands', INDICATOR_SIZES)
+def _bollinger(n, workdir):
+    data = _frame(n)
+    return (lambda: calculate_bollinger_bands(data)), 1
+
+
+@benchmark('indicators', 'moving_average_strategy', INDICATOR_SIZES)
+def _moving_average(n, workdir):
+    data = _frame(n)
+    return (lambda: moving_average_strategy(data)), 1
+
+
+@benchmark('indicators', 'compute_indicator_columns', INDICATOR_SIZES)
+def _indicator_columns(n, workdir):
+    close = synthetic_closes(n)
+    return (lambda: compute_indicator_columns(close)), 1
+
+
+@benchmark('indicators', 'batch_kernels.compute_indicators (1440 velas/par)', (10, 100, 1_000))
+def _batch_kernels(n, workdir):
+    matrix = close_matrix([synthetic_closes(1440, seed=seed) for seed in range(n)])
+    return (lambda: compute_indicators(matrix)), n
+
+
+@benchmark('indicators', 'IndicatorEngine.update', (100, 1_000, 10_000, 100_000))
+def _incremental(n, workdir):
+    closes = synthetic_closes(n).tolist()
+
+    def run():
+        engine = IndicatorEngine()
+        for close in closes:
+            engine.update(close)
+    return run, n
+
+
+# --- Iteración completa del bucle de decisión ---------------------------------
+
+@benchmark('decision', 'TradingRuntime.on_event', (100, 1_000, 10_000))
+def _decision(history_size, workdir, batch=200):
+    """
+    Una vela cerrada de punta a punta (caché, indicadores, decisión, registro)
+    contra un cliente en memoria; `history_size` es el tamaño de la caché.
+    """
+    klines = synthetic_klines(history_size)
+    api = BinanceAPI(client=StubClient(klines), rate_limiter=WeightRateLimiter(max_weight=1e12))
+    runtime = TradingRuntime(api, OrderManager(api), QueueKlineSource(), history_size=history_size,
+                             is_simulation=True)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(runtime.warm_up(refresh_balances=False))
+
+    closes = synthetic_closes(10_000, seed=1)
+    state = {'open_time': int(klines[-1][0]), 'index': 0}
+
+    def next_event():
+        state['open_time'] += 60_000
+        state['index'] = (state['index'] + 1) % len(closes)
+        close = f"{closes[state['index']]:.8f}"
+        return {'e': 'kline', 's': 'ETHUSDT', 'k': {
+            't': state['open_time'], 'T': state['open_time'] + 59_999, 's': 'ETHUSDT', 'i': '1m',
+            'o': close, 'h': close, 'l': close, 'c': close, 'v': '1.0', 'x': True}}
+
+    async def run_batch():
+        for _ in range(batch):
+            await runtime.on_event(next_event())
+    return (lambda: loop.run_until_complete(run_batch())), batch
+
+
+@benchmark('decision', 'TradingRuntime.on_event (live)', (100, 1_000, 10_000))
+def _decision_live(history_size, workdir, batch=210, period=21):
+    """
+    Camino en vivo: una de cada `period` velas cae un 3% y da señal de compra,
+    así que se miden también la orden de mercado, `record_transaction` (libro
+    de posiciones y diario en un historial temporal) y la actualización de
+    saldos. El tiempo se reparte entre todas las velas del lote.
+    """
+    klines = synthetic_klines(history_size)
+    position_ledger.use_history_file(os.path.join(tempfile.mkdtemp(dir=workdir), 'transaction_history.csv'))
+    position_ledger._default_ledger = None
+    api = BinanceAPI(client=StubClient(klines), rate_limiter=WeightRateLimiter(max_weight=1e12))
+    # Sin filtro de RSI: la señal depende solo de la banda inferior
+    runtime = TradingRuntime(api, OrderManager(api), QueueKlineSource(), history_size=history_size,
+                             min_rsi=101)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(runtime.warm_up())
+
+    closes = synthetic_closes(10_000, seed=1)
+    state = {'open_time': int(klines[-1][0]), 'index': 0}
+
+    def next_event():
+        state['open_time'] += 60_000
+        state['index'] = (state['index'] + 1) % len(closes)
+        close = f"{closes[state['index']] * (0.97 if state['index'] % period == 0 else 1.0):.8f}"
+        return {'e': 'kline', 's': 'ETHUSDT', 'k': {
+            't': state['open_time'], 'T': state['open_time'] + 59_999, 's': 'ETHUSDT', 'i': '1m',
+            'o': close, 'h': close, 'l': close, 'c': close, 'v': '1.0', 'x': True}}
+
+    async def run_batch():
+        for _ in range(batch):
+            await runtime.on_event(next_event())
+            if runtime._order_task is not None:
+                await runtime._order_task  # La orden cuenta en el tiempo de su vela
+                runtime._order_task = None
+    return (lambda: loop.run_until_complete(run_batch())), batch
+
+
+# --- Persistencia -------------------------------------------------------------
+
+@benchmark('persistence', 'calculate_profit (cold)', (100, 1_000, 10_000, 100_000, 1_000_000))
+def _profit_cold(n, workdir):
+    """Primera llamada del proceso: incluye cargar el libro desde el historial."""
+    directory = tempfile.mkdtemp(dir=workdir)
+    write_history(os.path.join(directory, 'transaction_history.csv'), n)
+    os.chdir(directory)
+
+    def run():
+        position_ledger._default_ledger = None
+        for name in os.listdir(directory):
+            if name.endswith('.snapshot.json'):
+                os.remove(os.path.join(directory, name))
+        calculate_profit('ETHUSDT', 0.01, 3100.0)
+    return run, 1
+
+
+@benchmark('persistence', 'calculate_profit (warm)', (100, 1_000, 10_000, 100_000, 1_000_000))
+def _profit_warm(n, workdir):
+    directory = tempfile.mkdtemp(dir=workdir)
+    write_history(os.path.join(directory, 'transaction_history.csv'), n)
+    os.chdir(directory)
+    position_ledger._default_ledger = None
+    calculate_profit('ETHUSDT', 0.01, 3100.0)
+    return (lambda: calculate_profit('ETHUSDT', 0.01, 3100.0)), 1
+
+
+def _journal_setup(fmt, n, workdir):
+    journal = TradeJournal(os.path.join(workdir, f"journal-{fmt}-{n}"), fmt=fmt, batch_size=10_000)
+
+    def run():
+        for i in range(n):
+            journal.append('BUY' if i % 2 else 'SELL', 'ETHUSDT', 0.01, 3000.0, 30.0, i, fee=0.03)
+        journal.flush()
+    return run, n
+
+
+@benchmark('persistence', 'TradeJournal (csv)', (1_000, 10_000, 100_000, 1_000_000))
+def _journal_csv(n, workdir):
+    return _journal_setup('csv', n, workdir)
+
+
+@benchmark('persistence', 'TradeJournal (binary)', (1_000, 10_000, 100_000, 1_000_000))
+def _journal_binary(n, workdir):
+    return _journal_setup('binary', n, workdir)
+
+
+# --- Medición y comparación ---------------------------------------------------
+
+def measure(func, operations, min_time=0.2, repeat=5):
+    """
+    Mediana de `repeat` rondas; cada ronda repite `func` hasta sumar `min_time`.
+
+    Returns:
+        float: Segundos por operación.
+    """
+    func()  # Calentamiento (cachés, importaciones perezosas, JIT de pandas)
+    start = time.perf_counter()
+    func()
+    single = time.perf_counter() - start
+    number = max(1, int(min_time / single)) if single > 0 else 1000
+    if single > min_time * repeat:
+        repeat = 1  # Casos enormes: una sola medición basta
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return statistics.median(rounds) / operations
+
+
+def run_suite(pattern=None, max_size=1_000_000, min_time=0.2):
+    """Ejecuta los benchmarks seleccionados en un directorio temporal."""
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            for group, name, sizes, setup in BENCHMARKS:
+                for n in sizes:
+                    key = f"{group}/{name}/{n}"
+                    if n > max_size or (pattern and pattern not in key):
+                        continue
+                    os.chdir(workdir)
+                    func, operations = setup(n, workdir)
+                    results[key] = measure(func, operations, min_time)
+                    print(f"{key:<60} {_format_seconds(results[key])}/op", flush=True)
+        finally:
+            os.chdir(cwd)
+            position_ledger.use_history_file("transaction_history.csv")
+            position_ledger._default_ledger = None
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compara con la referencia.
+
+    Returns:
+        list: Tuplas (clave, referencia, actual, ratio) de las regresiones.
+    """
+    regressions = []
+    for key, seconds in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        ratio = seconds / reference
+        status = "REGRESIÓN" if ratio > 1 + tolerance else ("mejora" if ratio < 1 - tolerance else "ok")
+        print(f"{key:<60} {_format_seconds(reference):>10} -> {_format_seconds(seconds):>10} "
+              f"x{ratio:5.2f} {status}")
+        if ratio > 1 + tolerance:
+            regressions.append((key, reference, seconds, ratio))
+    return regressions
+
+
+def _format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f}{unit}"
+    return f"{seconds * 1e9:.1f}ns"
+
+
+def _environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'processor': platform.processor() or platform.system()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del bot de trading")
+    parser.add_argument('--filter', help="Solo los benchmarks cuya clave contenga este texto")
+    parser.add_argument('--max-size', type=float, default=1e6, help="Tamaño máximo (filas) a medir")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Segundos mínimos por ronda")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Archivo JSON de referencia")
+    parser.add_argument('--save-baseline', action='store_true', help="Guarda los resultados como referencia")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Empeoramiento relativo admitido")
+    parser.add_argument('--output', help="Guarda los resultados de esta ejecución en JSON")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.filter, int(args.max_size), args.min_time)
+    report = {'environment': _environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f).get('results', {})
+        baseline.update(results)  # Conserva las claves que no se midieron en esta ejecución
+        with open(args.baseline, 'w') as f:
+            json.dump({'environment': report['environment'], 'results': baseline}, f, indent=2, sort_keys=True)
+        print(f"Referencia guardada en {args.baseline} ({len(baseline)} resultados).")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No hay referencia en {args.baseline}; ejecute con --save-baseline.")
+        return 0
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    if stored.get('environment') != report['environment']:
+        print(f"Aviso: la referencia se midió en otro entorno ({stored.get('environment')}).")
+    regressions = compare(results, stored.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regresiones por encima del {args.tolerance:.0%}.")
+        return 1
+    print("Sin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
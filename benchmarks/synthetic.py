@@ -0,0 +1,175 @@
+import csv
+import time
+import numpy as np
+import pandas as pd
+
+INTERVAL_MS = 60_000
+START_TIME = 1_700_000_000_000
+
+
+def synthetic_closes(n, seed=0, start_price=3000.0, volatility=0.001):
+    """Cierres con paseo aleatorio geométrico (reproducible con `seed`)."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0, volatility, n)
+    return start_price * np.exp(np.cumsum(returns))
+
+
+def synthetic_candles(n, seed=0, start_time=START_TIME, interval_ms=INTERVAL_MS):
+    """
+    Velas OHLCV coherentes (High >= max(Open, Close), Low <= min(Open, Close)).
+
+    Returns:
+        dict: Arrays por columna con los nombres que usa el bot.
+    """
+    rng = np.random.default_rng(seed)
+    close = synthetic_closes(n, seed)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0.0, 0.0005, n)) * close
+    open_time = start_time + np.arange(n, dtype=np.int64) * interval_ms
+    return {
+        'OpenTime': open_time,
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.gamma(2.0, 5.0, n),
+        'CloseTime': open_time + interval_ms - 1,
+    }
+
+
+def synthetic_frame(n, seed=0):
+    """DataFrame de velas como el que reciben las estrategias."""
+    return pd.DataFrame(synthetic_candles(n, seed))
+
+
+def synthetic_klines(n, seed=0, start_time=START_TIME, interval_ms=INTERVAL_MS):
+    """Velas en el formato de `client.get_klines` (listas con precios como texto)."""
+    candles = synthetic_candles(n, seed, start_time, interval_ms)
+    return [[int(candles['OpenTime'][i]), f"{candles['Open'][i]:.8f}", f"{candles['High'][i]:.8f}",
+             f"{candles['Low'][i]:.8f}", f"{candles['Close'][i]:.8f}", f"{candles['Volume'][i]:.8f}",
+             int(candles['CloseTime'][i]), "0", 100, "0", "0", "0"] for i in range(n)]
+
+
+def write_history(path, n, symbol="ETHUSDT", seed=0):
+    """
+    Escribe un transaction_history.csv sintético con `n` operaciones, alternando
+    rachas de compras y ventas de modo que siempre queden lotes abiertos.
+    """
+    rng = np.random.default_rng(seed)
+    prices = synthetic_closes(n, seed)
+    quantities = np.round(rng.uniform(0.01, 0.1, n), 4)
+    now = time.time()
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['type', 'symbol', 'quantity', 'price', 'total', 'order_id', 'timestamp', 'fee', 'net_total'])
+        for i in range(n):
+            side = 'SELL' if i % 3 == 2 else 'BUY'
+            quantity = quantities[i] / 2 if side == 'SELL' else quantities[i]
+            total = quantity * prices[i]
+            writer.writerow([side, symbol, quantity, prices[i], total, i,
+                             time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)), total * 0.001, total])
+    return path
+
+
+class StubClient:
+    """
+    Cliente de Binance en memoria para medir el bucle de decisión sin red.
+
+    Sirve `get_klines` desde velas sintéticas y responde a la cuenta y a las
+    órdenes de mercado (con la misma firma que `python-binance`, incluido
+    `newClientOrderId`) con datos fijos.
+    """
+
+    def __init__(self, klines, symbol="ETHUSDT"):
+        self.klines = klines
+        self.open_times = np.array([kline[0] for kline in klines], dtype=np.int64)
+        self.symbol = symbol
+        self.order_id = 0
+
+    def get_klines(self, symbol, interval, limit=500, startTime=None, endTime=None):
+        start = 0 if startTime is None else int(np.searchsorted(self.open_times, startTime, side='left'))
+        end = len(self.klines) if endTime is None else int(np.searchsorted(self.open_times, endTime, side='right'))
+        if startTime is None:
+            return self.klines[max(start, end - limit):end]
+        return self.klines[start:min(end, start + limit)]
+
+    def get_account(self):
+        return {'balances': [{'asset': 'USDT', 'free': '1000.0', 'locked': '0'},
+                             {'asset': 'ETH', 'free': '0.5', 'locked': '0'}]}
+
+    def get_ticker(self, symbol):
+        return {'symbol': symbol, 'lastPrice': self.klines[-1][4]}
+
+    def order_market(self, symbol, side, quantity, newClientOrderId=None, **params):
+        self.order_id += 1
+        return {'symbol': symbol, 'orderId': self.order_id, 'clientOrderId': newClientOrderId or str(self.order_id),
+                'side': side, 'type': 'MARKET', 'status': 'FILLED', 'executedQty': str(quantity)}
+
+
+class SyntheticDepthFeed:
+    """
+    Libro de órdenes sintético que genera una instantánea como la de
+    `get_order_book` y actualizaciones `depthUpdate` encadenadas como las del
+    stream de profundidad de Binance, para probar el libro local sin red.
+
+    El precio medio sigue un paseo aleatorio en ticks; cada actualización
+    cambia o elimina algunos niveles cerca del precio y elimina los que
+    quedarían cruzados.
+    """
+
+    def __init__(self, symbol="ETHUSDT", seed=0, start_price=3000.0, tick=0.01, levels=200,
+                 changes_per_event=8, start_time=START_TIME):
+        self.symbol = symbol
+        self.rng = np.random.default_rng(seed)
+        self.tick = tick
+        self.levels = levels
+        self.changes_per_event = changes_per_event
+        self.mid = int(round(start_price / tick))
+        self.time = start_time
+        self.update_id = 1000
+        self.bids = {self.mid - i: self._quantity() for i in range(1, levels + 1)}
+        self.asks = {self.mid + i: self._quantity() for i in range(1, levels + 1)}
+
+    def _quantity(self):
+        return round(float(self.rng.gamma(1.5, 2.0)), 4)
+
+    def _price(self, ticks):
+        return f"{ticks * self.tick:.2f}"
+
+    def snapshot(self, limit=5000):
+        """Instantánea del libro actual en el formato de `get_order_book`."""
+        return {
+            'lastUpdateId': self.update_id,
+            'bids': [[self._price(p), f"{self.bids[p]:.4f}"] for p in sorted(self.bids, reverse=True)[:limit]],
+            'asks': [[self._price(p), f"{self.asks[p]:.4f}"] for p in sorted(self.asks)[:limit]],
+        }
+
+    def next_event(self):
+        """Siguiente actualización `depthUpdate` (cada cambio de nivel consume un id de actualización)."""
+        self.mid += int(self.rng.integers(-2, 3))
+        self.time += 100
+        changes = {'b': {}, 'a': {}}
+        # Niveles que quedarían cruzados con el nuevo precio medio
+        for side, book, crossed in (('b', self.bids, lambda p: p >= self.mid),
+                                    ('a', self.asks, lambda p: p <= self.mid)):
+            for price in [p for p in book if crossed(p)]:
+                del book[price]
+                changes[side][price] = 0.0
+        for _ in range(self.changes_per_event):
+            side = 'b' if self.rng.random() < 0.5 else 'a'
+            offset = int(self.rng.integers(1, self.levels + 1))
+            price = self.mid - offset if side == 'b' else self.mid + offset
+            book = self.bids if side == 'b' else self.asks
+            quantity = 0.0 if self.rng.random() < 0.2 else self._quantity()
+            if quantity:
+                book[price] = quantity
+            else:
+                book.pop(price, None)
+            changes[side][price] = quantity
+        first = self.update_id + 1
+        self.update_id += max(len(changes['b']) + len(changes['a']), 1)
+        return {
+            'e': 'depthUpdate', 'E': self.time, 's': self.symbol, 'U': first, 'u': self.update_id,
+            'b': [[self._price(p), f"{q:.4f}"] for p, q in changes['b'].items()],
+            'a': [[self._price(p), f"{q:.4f}"] for p, q in changes['a'].items()],
+        }
@@ -0,0 +1,463 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from data.trade_journal import LEGACY_ALIASES, read_segments
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SECONDS_PER_YEAR = 365 * 24 * 3600
+# Columnas de los CSV de operaciones que usan las estadísticas (con los nombres del esquema común)
+TRADE_COLUMNS = ('type', 'symbol', 'quantity', 'price', 'fee', 'timestamp')
+# Cantidades por debajo de esto se consideran cero (errores de redondeo), como en PositionLedger
+_EPSILON = 1e-12
+
+
+class _Moments:
+    """Media, varianza y semivarianza a la baja de una serie que llega por bloques (fusión de Chan)."""
+
+    __slots__ = ('n', 'mean', 'm2', 'downside')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside = 0.0
+
+    def update(self, values):
+        n = len(values)
+        if not n:
+            return
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.downside += float(np.square(np.minimum(values, 0.0)).sum())
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else math.nan
+
+    def sharpe(self, periods=1.0):
+        std = self.std()
+        return self.mean / std * math.sqrt(periods) if std > 0 else math.nan
+
+    def sortino(self, periods=1.0):
+        downside = math.sqrt(self.downside / self.n) if self.n else 0.0
+        return self.mean / downside * math.sqrt(periods) if downside > 0 else math.nan
+
+
+class _Drawdown:
+    """Máxima caída de una curva que llega por bloques; el máximo previo se arrastra entre bloques."""
+
+    __slots__ = ('relative', 'peak', 'max_drawdown')
+
+    def __init__(self, relative=True):
+        self.relative = relative
+        self.peak = -math.inf
+        self.max_drawdown = 0.0
+
+    def update(self, curve):
+        if not len(curve):
+            return
+        peak = np.maximum.accumulate(curve)
+        np.maximum(peak, self.peak, out=peak)
+        drawdown = peak - curve
+        if self.relative:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                drawdown = np.where(peak > 0, drawdown / peak, 0.0)
+        self.max_drawdown = max(self.max_drawdown, float(drawdown.max()))
+        self.peak = float(peak[-1])
+
+
+class _SymbolStats:
+    """
+    Acumuladores de un símbolo. Los lotes abiertos (FIFO) se guardan como la
+    función de coste acumulado de las compras: `fs[i]` es lo que costaron las
+    primeras `xs[i]` unidades compradas, lineal entre puntos (la pendiente es
+    el precio del lote), y `gs[i]` las comisiones de esas compras. El coste y
+    las comisiones de compra de lo vendido son la diferencia de esas funciones
+    entre las unidades consumidas antes y después de cada venta.
+    """
+
+    __slots__ = ('xs', 'fs', 'gs', 'requested', 'slack', 'consumed', 'buys', 'sells', 'trades', 'wins', 'gross_profit',
+                 'gross_loss', 'turnover', 'fees', 'net_pnl', 'level', 'returns', 'drawdown')
+
+    def __init__(self, initial_capital=None):
+        self.xs = np.zeros(1)
+        self.fs = np.zeros(1)
+        self.gs = np.zeros(1)
+        self.requested = 0.0  # Cantidad vendida solicitada acumulada
+        self.slack = 0.0  # Mínimo acumulado de (comprado - solicitado), acotado en 0
+        self.consumed = 0.0  # Unidades de lotes ya vendidas
+        self.buys = self.sells = self.trades = self.wins = 0
+        self.gross_profit = self.gross_loss = self.turnover = self.fees = self.net_pnl = 0.0
+        self.level = initial_capital or 0.0
+        self.returns = _Moments()
+        self.drawdown = _Drawdown(relative=initial_capital is not None)
+
+    def fifo(self, is_buy, quantity, price, fee):
+        """
+        Cantidad vendida, su coste FIFO y su parte de las comisiones de compra
+        para cada venta del bloque, sin bucles. Como `Position.sell`, una venta
+        mayor que los lotes abiertos solo consume lo disponible.
+        """
+        buy = is_buy & (quantity > 0)
+        xs = np.concatenate([self.xs, self.xs[-1] + np.cumsum(quantity[buy])])
+        fs = np.concatenate([self.fs, self.fs[-1] + np.cumsum(quantity[buy] * price[buy])])
+        gs = np.concatenate([self.gs, self.gs[-1] + np.cumsum(fee[buy])])
+        sell = ~is_buy
+        bought = (self.xs[-1] + np.cumsum(np.where(buy, quantity, 0.0)))[sell]
+        requested = self.requested + np.cumsum(quantity[sell])
+        # consumido_j = min(consumido_{j-1} + q_j, comprado_j) = solicitado_j + min(0, min_{i<=j}(comprado_i - solicitado_i))
+        slack = np.minimum(np.minimum.accumulate(bought - requested), self.slack)
+        consumed = requested + slack
+        previous = np.concatenate([[self.consumed], consumed[:-1]])
+        sold_cost = np.interp(consumed, xs, fs) - np.interp(previous, xs, fs)
+        sold_fees = np.interp(consumed, xs, gs) - np.interp(previous, xs, gs)
+        sold = consumed - previous
+
+        if len(consumed):
+            self.requested, self.slack, self.consumed = float(requested[-1]), float(slack[-1]), float(consumed[-1])
+        # Se descartan los lotes ya vendidos y se rebasa el origen para no perder precisión
+        start = max(int(np.searchsorted(xs, self.consumed, side='right')) - 1, 0)
+        origin = xs[start]
+        self.xs = xs[start:] - origin
+        self.fs = fs[start:] - fs[start]
+        self.gs = gs[start:] - gs[start]
+        self.requested -= origin
+        self.consumed -= origin
+        return sold, sold_cost, sold_fees
+
+    def report(self, rows_per_year=None):
+        closed = self.trades
+        report = {
+            'buys': self.buys, 'sells': self.sells, 'trades': closed,
+            'win_rate': self.wins / closed if closed else math.nan,
+            'net_pnl': self.net_pnl,
+            'avg_trade': (self.gross_profit - self.gross_loss) / closed if closed else math.nan,
+            'profit_factor': self.gross_profit / self.gross_loss if self.gross_loss else math.nan,
+            'sharpe': self.returns.sharpe(rows_per_year or 1.0),
+            'sortino': self.returns.sortino(rows_per_year or 1.0),
+            'max_drawdown': self.drawdown.max_drawdown,
+            'turnover': self.turnover,
+            'fees': self.fees,
+            'fee_bps': self.fees / self.turnover * 1e4 if self.turnover else math.nan,
+            # Parte del beneficio antes de comisiones que se llevan las comisiones
+            'fee_drag': self.fees / (self.net_pnl + self.fees) if self.net_pnl + self.fees > 0 else math.nan,
+            'open_quantity': float(self.xs[-1] - self.consumed),
+        }
+        return report
+
+
+class TradeStats:
+    """
+    Estadísticas de una estrategia a partir de sus operaciones, calculadas por
+    bloques con NumPy: la memoria depende del tamaño del bloque y de los lotes
+    abiertos, no del tamaño del historial.
+
+    Cada venta cierra una operación con PnL FIFO neto de su comisión y de la
+    parte FIFO de las comisiones de las compras que cierra; de esas
+    operaciones salen el acierto, la media y el factor de beneficio.
+
+    `net_pnl`, el drawdown y Sharpe/Sortino se miden sobre la curva de PnL
+    acumulado por caja (cada comisión se descuenta al pagarse, también las de
+    los lotes aún abiertos): Sharpe/Sortino usan el cambio de la curva en cada
+    operación, así que su signo siempre coincide con el de `net_pnl`, y se
+    anualizan según las operaciones por año si se conocen las fechas. El
+    drawdown es relativo si se indica `initial_capital` y absoluto en la
+    moneda cotizada si no.
+    """
+
+    def __init__(self, initial_capital=None):
+        self.initial_capital = initial_capital
+        self.symbols = {}
+        self.total = _SymbolStats(initial_capital)
+        self.rows = 0
+        self.skipped = 0
+        self.first_time = None
+        self.last_time = None
+
+    def _symbol(self, symbol):
+        stats = self.symbols.get(symbol)
+        if stats is None:
+            stats = self.symbols[symbol] = _SymbolStats(self.initial_capital)
+        return stats
+
+    def update(self, side, symbol, quantity, price, fee=None, first_time=None, last_time=None):
+        """
+        Añade un bloque de operaciones en orden cronológico.
+
+        Args:
+            side, symbol: Arrays de texto ('BUY'/'SELL' y símbolo).
+            quantity, price, fee: Arrays numéricos (filas sin cantidad o precio se descartan).
+            first_time, last_time (float, opcional): Primera y última fecha del bloque (epoch, segundos).
+        """
+        quantity = np.asarray(quantity, dtype=float)
+        price = np.asarray(price, dtype=float)
+        fee = np.zeros(len(quantity)) if fee is None else np.nan_to_num(np.asarray(fee, dtype=float))
+        valid = np.isfinite(quantity) & np.isfinite(price)
+        self.rows += len(quantity)
+        self.skipped += int((~valid).sum())
+        if not valid.all():
+            side, symbol = np.asarray(side)[valid], np.asarray(symbol)[valid]
+            quantity, price, fee = quantity[valid], price[valid], fee[valid]
+        if first_time is not None and self.first_time is None:
+            self.first_time = first_time
+        if last_time is not None:
+            self.last_time = last_time
+        if not len(quantity):
+            return
+
+        is_buy = np.asarray(side) == 'BUY'
+        names, codes = np.unique(np.asarray(symbol), return_inverse=True)
+        # Filas agrupadas por símbolo conservando el orden cronológico de cada uno
+        order = np.argsort(codes, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(names)))])
+        pnl = np.zeros(len(quantity))
+        trade_pnl = np.zeros(len(quantity))
+        closed = np.zeros(len(quantity), dtype=bool)
+        for index, name in enumerate(names):
+            rows = order[bounds[index]:bounds[index + 1]]
+            pnl[rows], trade_pnl[rows], closed[rows] = self._apply(self._symbol(name), is_buy[rows], quantity[rows],
+                                                                   price[rows], fee[rows])
+        self._accumulate(self.total, is_buy, pnl, trade_pnl, closed, quantity * price, fee)
+
+    def _apply(self, stats, is_buy, quantity, price, fee):
+        """
+        Actualiza un símbolo. Devuelve, por fila, el PnL por caja (las compras
+        solo restan su comisión), el PnL de la operación que cierra (con la
+        parte de las comisiones de compra) y si cerró una operación.
+        """
+        sold, sold_cost, sold_fees = stats.fifo(is_buy, quantity, price, fee)
+        sell = ~is_buy
+        pnl = -fee
+        pnl[sell] += sold * price[sell] - sold_cost
+        trade_pnl = np.zeros(len(quantity))
+        trade_pnl[sell] = pnl[sell] - sold_fees
+        closed = np.zeros(len(quantity), dtype=bool)
+        closed[sell] = sold > _EPSILON
+        self._accumulate(stats, is_buy, pnl, trade_pnl, closed, quantity * price, fee)
+        return pnl, trade_pnl, closed
+
+    @staticmethod
+    def _accumulate(stats, is_buy, pnl, trade_pnl, closed, notional, fee):
+        trade_pnl = trade_pnl[closed]
+        stats.buys += int(is_buy.sum())
+        stats.sells += len(is_buy) - int(is_buy.sum())
+        stats.trades += len(trade_pnl)
+        stats.wins += int((trade_pnl > 0).sum())
+        stats.gross_profit += float(trade_pnl[trade_pnl > 0].sum())
+        stats.gross_loss -= float(trade_pnl[trade_pnl < 0].sum())
+        stats.turnover += float(notional.sum())
+        stats.fees += float(fee.sum())
+        stats.net_pnl += float(pnl.sum())
+        stats.returns.update(pnl)
+        curve = stats.level + np.cumsum(pnl)
+        stats.drawdown.update(curve)
+        if len(curve):
+            stats.level = float(curve[-1])
+
+    def report(self):
+        """Informe compacto: totales y una entrada por símbolo (serializable a JSON)."""
+        span = (self.last_time - self.first_time) if self.first_time is not None and self.last_time else None
+        years = span / SECONDS_PER_YEAR if span else None
+        per_year = (lambda stats: (stats.buys + stats.sells) / years) if years else (lambda stats: None)
+        return {
+            'rows': self.rows, 'skipped': self.skipped,
+            'start': self.first_time, 'end': self.last_time,
+            'total': self.total.report(per_year(self.total)),
+            'symbols': {name: stats.report(per_year(stats)) for name, stats in sorted(self.symbols.items())},
+        }
+
+
+class EquityStats:
+    """
+    Estadísticas de una curva de capital (p. ej. la de `run_backtest`) por
+    bloques: rentabilidad, volatilidad, Sharpe/Sortino anualizados y máxima
+    caída con el máximo arrastrado entre bloques.
+
+    Args:
+        periods_per_year (float, opcional): Periodos por año de la curva. Si no
+            se indica, se deduce del intervalo mediano de los tiempos del primer bloque.
+    """
+
+    def __init__(self, periods_per_year=None):
+        self.periods_per_year = periods_per_year
+        self.returns = _Moments()
+        self.drawdown = _Drawdown(relative=True)
+        self.first = None
+        self.last = None
+        self.points = 0
+
+    def update(self, equity, times_ms=None):
+        equity = np.asarray(equity, dtype=float)
+        if not len(equity):
+            return
+        if self.periods_per_year is None and times_ms is not None and len(times_ms) > 1:
+            step = float(np.median(np.diff(np.asarray(times_ms, dtype=float))))
+            if step > 0:
+                self.periods_per_year = SECONDS_PER_YEAR * 1000 / step
+        series = equity if self.last is None else np.concatenate([[self.last], equity])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = series[1:] / series[:-1] - 1
+        self.returns.update(returns[np.isfinite(returns)])
+        self.drawdown.update(equity)
+        if self.first is None:
+            self.first = float(equity[0])
+        self.last = float(equity[-1])
+        self.points += len(equity)
+
+    def report(self):
+        periods = self.periods_per_year or 1.0
+        return {
+            'points': self.points,
+            'start_equity': self.first, 'end_equity': self.last,
+            'total_return': self.last / self.first - 1 if self.first else math.nan,
+            'volatility': self.returns.std() * math.sqrt(periods) if self.returns.n > 1 else math.nan,
+            'sharpe': self.returns.sharpe(periods),
+            'sortino': self.returns.sortino(periods),
+            'max_drawdown': self.drawdown.max_drawdown,
+            'periods_per_year': self.periods_per_year,
+        }
+
+
+def _epoch(values):
+    """Fechas de texto ('%Y-%m-%d %H:%M:%S') a segundos epoch (solo se usan para medir el periodo cubierto)."""
+    times = pd.to_datetime(pd.Series(values, dtype=object), format=TIME_FORMAT, errors='coerce')
+    return [None if pd.isna(value) else value.timestamp() for value in times]
+
+
+def _csv_chunks(path, chunk_size):
+    """Bloques de un CSV de operaciones con las columnas de `TRADE_COLUMNS` (admite cabeceras antiguas)."""
+    header = pd.read_csv(path, nrows=0).columns
+    rename = {column: LEGACY_ALIASES.get(column, column) for column in header}
+    usecols = [column for column in header if rename[column] in TRADE_COLUMNS]
+    dtypes = {column: (str if rename[column] in ('type', 'symbol', 'timestamp') else float) for column in usecols}
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunk_size):
+        chunk = chunk.rename(columns=rename)
+        first, last = _epoch(chunk['timestamp'].iloc[[0, -1]]) if 'timestamp' in chunk else (None, None)
+        yield (chunk['type'].to_numpy(), chunk['symbol'].to_numpy(),
+               chunk['quantity'].to_numpy() if 'quantity' in chunk else np.full(len(chunk), np.nan),
+               chunk['price'].to_numpy(), chunk['fee'].to_numpy() if 'fee' in chunk else None, first, last)
+
+
+def _segment_chunks(directory, chunk_size):
+    """Bloques de los segmentos binarios de un `TradeJournal` (memory-mapped: solo se lee cada bloque)."""
+    records = read_segments(directory)
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        yield (np.char.decode(chunk['type']), np.char.decode(chunk['symbol']), chunk['quantity'], chunk['price'],
+               chunk['fee'], float(chunk['timestamp'][0]), float(chunk['timestamp'][-1]))
+
+
+def analyze_trades(paths, chunk_size=200_000, initial_capital=None):
+    """
+    Estadísticas de uno o varios historiales de operaciones
+    (transaction_history.csv, simulated_trades.csv, la salida del backtester
+    o el directorio de segmentos de un diario binario), leídos por bloques.
+    Varios archivos se tratan como continuación uno de otro, en el orden dado.
+
+    Returns:
+        dict: Ver `TradeStats.report`.
+    """
+    stats = TradeStats(initial_capital)
+    for path in ([paths] if isinstance(paths, (str, os.PathLike)) else paths):
+        chunks = _segment_chunks(path, chunk_size) if os.path.isdir(path) else _csv_chunks(path, chunk_size)
+        for side, symbol, quantity, price, fee, first, last in chunks:
+            stats.update(side, symbol, quantity, price, fee, first, last)
+    return stats.report()
+
+
+def analyze_equity(path, column='equity', time_column='CloseTime', chunk_size=500_000, periods_per_year=None):
+    """Estadísticas de una curva de capital guardada en CSV, leída por bloques (ver `EquityStats`)."""
+    stats = EquityStats(periods_per_year)
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [name for name in (column, time_column) if name in header]
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_size):
+        stats.update(chunk[column].to_numpy(), chunk[time_column].to_numpy() if time_column in chunk else None)
+    return stats.report()
+
+
+def format_report(report, top=10):
+    """Resumen de texto de `analyze_trades` (total y los `top` símbolos con más PnL absoluto)."""
+    def line(name, stats):
+        return (f"{name:<12} ops={stats['trades']:>7} acierto={stats['win_rate']:>6.1%} "
+                f"media={stats['avg_trade']:>9.4f} pf={stats['profit_factor']:>6.2f} "
+                f"sharpe={stats['sharpe']:>6.2f} sortino={stats['sortino']:>6.2f} "
+                f"mdd={stats['max_drawdown']:>9.4f} pnl={stats['net_pnl']:>11.2f} "
+                f"volumen={stats['turnover']:>13.2f} comisiones={stats['fees']:>9.2f} ({stats['fee_bps']:.1f} bps)")
+
+    symbols = sorted(report['symbols'].items(), key=lambda item: abs(item[1]['net_pnl']), reverse=True)
+    lines = [f"{report['rows']} filas ({report['skipped']} descartadas), {len(report['symbols'])} símbolos",
+             line('TOTAL', report['total'])]
+    lines += [line(name, stats) for name, stats in symbols[:top]]
+    return "\n".join(lines)
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from data.position_ledger import PositionLedger
+    from strategies.backtester import run_backtest
+
+    directory = tempfile.mkdtemp()
+
+    # Historial grande con varios símbolos, en el formato de transaction_history.csv
+    n, n_symbols = 1_000_000, 40
+    rng = np.random.default_rng(0)
+    symbols = np.array([f"PAR{i}USDT" for i in range(n_symbols)])[rng.integers(0, n_symbols, n)]
+    sides = np.where(rng.random(n) < 0.55, 'BUY', 'SELL')
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    quantities = np.round(rng.uniform(0.1, 2.0, n), 4)
+    history = os.path.join(directory, 'transaction_history.csv')
+    times = pd.date_range('2021-01-01', periods=n, freq='90s').strftime(TIME_FORMAT)
+    pd.DataFrame({'type': sides, 'symbol': symbols, 'quantity': quantities, 'price': prices,
+                  'total': quantities * prices, 'order_id': np.arange(n), 'timestamp': times,
+                  'fee': quantities * prices * 0.001, 'net_total': quantities * prices}).to_csv(history, index=False)
+    print(f"Historial: {n:,} filas, {os.path.getsize(history) / 1e6:.0f} MB")
+
+    start = time.perf_counter()
+    report = analyze_trades(history, chunk_size=100_000, initial_capital=100_000)
+    print(f"Analizado en {time.perf_counter() - start:.2f}s")
+    print(format_report(report, top=3))
+
+    # El PnL FIFO coincide con el del libro de posiciones
+    ledger = PositionLedger(history)
+    ledger.load()
+    for name in ('PAR0USDT', 'PAR7USDT'):
+        stats = report['symbols'][name]
+        gross = stats['net_pnl'] + stats['fees']
+        assert math.isclose(gross, ledger.realized_pnl(name), rel_tol=1e-9, abs_tol=1e-6), name
+        assert math.isclose(stats['open_quantity'], ledger.quantity(name), abs_tol=1e-6)
+
+    # Cada operación cerrada lleva su parte FIFO de las comisiones de compra; el PnL neto, todas
+    small = TradeStats()
+    small.update(['BUY', 'BUY', 'SELL'], ['X'] * 3, [1.0, 1.0, 1.5], [100.0, 110.0, 120.0], [0.1, 0.11, 0.18])
+    summary = small.report()['total']
+    assert math.isclose(summary['avg_trade'], 180 - 155 - (0.1 + 0.055) - 0.18)
+    assert math.isclose(summary['net_pnl'], 180 - 155 - 0.1 - 0.11 - 0.18)
+    assert (report['total']['sharpe'] < 0) == (report['total']['net_pnl'] < 0)
+
+    # Mismo resultado con bloques de otro tamaño
+    other = analyze_trades(history, chunk_size=7_919, initial_capital=100_000)
+    assert math.isclose(other['total']['net_pnl'], report['total']['net_pnl'], rel_tol=1e-9)
+    assert math.isclose(other['total']['max_drawdown'], report['total']['max_drawdown'], rel_tol=1e-9)
+    assert math.isclose(other['total']['sharpe'], report['total']['sharpe'], rel_tol=1e-6)
+
+    # Salida del backtester: operaciones y curva de capital
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.0008, 200_000)))
+    close_time = 1_704_067_200_000 + np.arange(1, len(close) + 1) * 60_000 - 1
+    equity, trades = run_backtest({'Close': close, 'CloseTime': close_time})
+    trades.to_csv(os.path.join(directory, 'backtest_trades.csv'), index=False)
+    equity.to_csv(os.path.join(directory, 'backtest_equity.csv'), index=False)
+    backtest = analyze_trades(os.path.join(directory, 'backtest_trades.csv'))
+    assert math.isclose(backtest['total']['net_pnl'] + trades.loc[trades['type'] == 'BUY', 'fee'].sum(),
+                        trades['realized_pnl'].sum(), rel_tol=1e-9, abs_tol=1e-9)
+    curve = analyze_equity(os.path.join(directory, 'backtest_equity.csv'), chunk_size=30_000)
+    peak = np.maximum.accumulate(equity['equity'].to_numpy())
+    assert math.isclose(curve['max_drawdown'], ((peak - equity['equity']) / peak).max(), rel_tol=1e-12)
+    print(f"Backtest: {backtest['total']['trades']} operaciones, acierto {backtest['total']['win_rate']:.1%}; "
+          f"capital {curve['total_return']:+.2%}, Sharpe {curve['sharpe']:.2f}, máx. caída {curve['max_drawdown']:.2%}")
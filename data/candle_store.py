@@ -0,0 +1,243 @@
+import os
+import time
+import numpy as np
+from data.kline_cache import interval_to_ms
+from data.kline_parser import parse_klines_matrix
+from utils.logger import main_logger
+
+# Columnas de ancho fijo: una por archivo, todas alineadas por índice
+STORE_COLUMNS = {
+    'OpenTime': np.int64,
+    'Open': np.float64,
+    'High': np.float64,
+    'Low': np.float64,
+    'Close': np.float64,
+    'Volume': np.float64,
+    'CloseTime': np.int64,
+}
+
+
+class CandleStore:
+    """
+    Almacén local de velas para un símbolo/intervalo.
+
+    Cada columna se guarda en un archivo binario de ancho fijo
+    (`<root>/<SYMBOL>/<interval>/<Columna>.bin`) y se lee con memory-mapping,
+    así que años de velas de 1m se consultan como arrays de numpy sin
+    cargarlos en memoria ni construir un DataFrame. Solo admite añadir velas
+    al final, en orden cronológico.
+    """
+
+    def __init__(self, root, symbol, interval):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.directory = os.path.join(root, symbol, interval)
+        os.makedirs(self.directory, exist_ok=True)
+        self._maps = None
+        self._repair()
+
+    def _repair(self):
+        """
+        Recupera una escritura a medias: termina un `backfill` confirmado (o
+        descarta sus temporales si no llegó a confirmarse) y recorta las
+        columnas a la longitud común si un `append` quedó a medias.
+        """
+        if os.path.exists(self._commit_path()):
+            self._swap_columns()
+        else:
+            for name in STORE_COLUMNS:
+                if os.path.exists(f"{self._path(name)}.tmp"):
+                    os.remove(f"{self._path(name)}.tmp")
+        sizes = {name: os.path.getsize(self._path(name)) // np.dtype(dtype).itemsize
+                 if os.path.exists(self._path(name)) else 0
+                 for name, dtype in STORE_COLUMNS.items()}
+        rows = min(sizes.values())
+        for name, dtype in STORE_COLUMNS.items():
+            if sizes[name] != rows:
+                with open(self._path(name), 'ab') as f:
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+
+    def _path(self, column):
+        return os.path.join(self.directory, f"{column}.bin")
+
+    def _commit_path(self):
+        return os.path.join(self.directory, "backfill.commit")
+
+    def _swap_columns(self):
+        """
+        Sustituye las columnas por sus `.tmp` (OpenTime al final) y borra la
+        marca de confirmación. Es idempotente: tras un fallo se repite al abrir.
+        """
+        for name in reversed(STORE_COLUMNS):
+            temp_path = f"{self._path(name)}.tmp"
+            if os.path.exists(temp_path):
+                os.replace(temp_path, self._path(name))
+        os.remove(self._commit_path())
+
+    def __len__(self):
+        path = self._path('OpenTime')
+        return os.path.getsize(path) // np.dtype(np.int64).itemsize if os.path.exists(path) else 0
+
+    def _columns(self):
+        """Vistas memory-mapped de todas las columnas (se rehacen tras cada escritura)."""
+        if self._maps is None:
+            n = len(self)
+            self._maps = {
+                name: (np.memmap(self._path(name), dtype=dtype, mode='r', shape=(n,))
+                       if n else np.empty(0, dtype=dtype))
+                for name, dtype in STORE_COLUMNS.items()
+            }
+        return self._maps
+
+    def column(self, name):
+        return self._columns()[name]
+
+    def last_open_time(self):
+        open_times = self.column('OpenTime')
+        return int(open_times[-1]) if len(open_times) else None
+
+    def append(self, candles):
+        """
+        Añade velas en formato `get_klines` (solo las posteriores a la última guardada).
+
+        Returns:
+            int: Número de velas añadidas.
+        """
+        if not len(candles):
+            return 0
+        rows = parse_klines_matrix(candles, tuple(STORE_COLUMNS))
+        last = self.last_open_time()
+        if last is not None:
+            rows = rows[rows[:, 0] > last]
+        if not len(rows):
+            return 0
+        if np.any(np.diff(rows[:, 0]) <= 0):
+            raise ValueError("Las velas deben estar ordenadas y sin duplicados.")
+
+        self._maps = None  # Libera los mapas antes de ampliar los archivos
+        # OpenTime se escribe al final: define la longitud visible del almacén
+        for index, (name, dtype) in reversed(list(enumerate(STORE_COLUMNS.items()))):
+            with open(self._path(name), 'ab') as f:
+                f.write(rows[:, index].astype(dtype).tobytes())
+        return len(rows)
+
+    def _bounds(self, start_time=None, end_time=None):
+        open_times = self.column('OpenTime')
+        start = 0 if start_time is None else int(np.searchsorted(open_times, start_time, side='left'))
+        end = len(open_times) if end_time is None else int(np.searchsorted(open_times, end_time, side='right'))
+        return start, end
+
+    def range(self, start_time=None, end_time=None, columns=None):
+        """
+        Velas con `OpenTime` en [start_time, end_time] (ms) mediante búsqueda binaria.
+
+        Returns:
+            dict: Vistas (sin copia) de cada columna pedida.
+        """
+        start, end = self._bounds(start_time, end_time)
+        maps = self._columns()
+        return {name: maps[name][start:end] for name in (columns or STORE_COLUMNS)}
+
+    def gaps(self, start_time=None, end_time=None):
+        """
+        Detecta huecos en la serie.
+
+        Returns:
+            list: Tuplas (inicio, fin) en ms con el `OpenTime` de la primera y la
+            última vela que faltan en cada hueco.
+        """
+        open_times = self.range(start_time, end_time, columns=['OpenTime'])['OpenTime']
+        if len(open_times) < 2:
+            return []
+        steps = np.diff(open_times)
+        holes = np.flatnonzero(steps > self.interval_ms)
+        return [(int(open_times[i]) + self.interval_ms, int(open_times[i + 1]) - self.interval_ms) for i in holes]
+
+    def ingest(self, client, start_time=None, end_time=None, page_size=1000, now_ms=None):
+        """
+        Descarga con `get_klines` y añade al final todas las velas cerradas
+        desde la última guardada (o desde `start_time` si el almacén está vacío).
+        `now_ms` es la hora actual del mercado (por defecto la del sistema).
+
+        Returns:
+            int: Número de velas añadidas.
+        """
+        last = self.last_open_time()
+        cursor = last + self.interval_ms if last is not None else start_time
+        added = 0
+        while True:
+            params = {'symbol': self.symbol, 'interval': self.interval, 'limit': page_size}
+            if cursor is not None:
+                params['startTime'] = int(cursor)
+            if end_time is not None:
+                params['endTime'] = int(end_time)
+            page = client.get_klines(**params)
+            # La última vela puede estar en curso: solo se guardan velas cerradas
+            closed_before = time.time() * 1000 if now_ms is None else now_ms
+            candles = [kline for kline in page if int(kline[6]) < closed_before]
+            if not candles:
+                break
+            added += self.append(candles)
+            cursor = int(candles[-1][0]) + self.interval_ms
+            if len(page) < page_size:
+                break
+        return added
+
+    def backfill(self, client, page_size=1000):
+        """
+        Rellena los huecos detectados con `gaps()`.
+
+        Como el almacén es solo de añadido, los huecos se reescriben
+        fusionando las velas descargadas con las existentes en columnas
+        temporales que sustituyen a las actuales tras confirmarse.
+
+        Returns:
+            int: Número de velas recuperadas.
+        """
+        holes = self.gaps()
+        if not holes:
+            return 0
+        fetched = []
+        for start, end in holes:
+            cursor = start
+            while cursor <= end:
+                candles = client.get_klines(symbol=self.symbol, interval=self.interval,
+                                            startTime=int(cursor), endTime=int(end), limit=page_size)
+                if not candles:
+                    break
+                fetched.extend(candles)
+                cursor = int(candles[-1][0]) + self.interval_ms
+        if not fetched:
+            return 0
+
+        existing = np.column_stack([np.asarray(self.column(name), dtype=float) for name in STORE_COLUMNS])
+        new_rows = parse_klines_matrix(fetched, tuple(STORE_COLUMNS))
+        merged = np.concatenate([existing, new_rows])
+        merged = merged[np.argsort(merged[:, 0], kind='stable')]
+        merged = merged[np.concatenate([[True], np.diff(merged[:, 0]) > 0])]
+
+        # Todas las columnas se escriben completas en temporales antes de tocar ninguna; la marca de
+        # confirmación permite a `_repair` terminar la sustitución si el proceso cae a mitad
+        for index, (name, dtype) in enumerate(STORE_COLUMNS.items()):
+            with open(f"{self._path(name)}.tmp", 'wb') as f:
+                f.write(merged[:, index].astype(dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self._commit_path(), 'wb') as f:
+            os.fsync(f.fileno())
+        self._maps = None
+        self._swap_columns()
+        recovered = len(merged) - len(existing)
+        main_logger.info(f"Recuperadas {recovered} velas en huecos de {self.symbol} {self.interval}.")
+        return recovered
+
+    def klines(self, start_time=None, end_time=None):
+        """Velas del rango como filas de `get_klines` (los siete primeros campos)."""
+        columns = self.range(start_time, end_time)
+        return [list(row) for row in zip(*(columns[name].tolist() for name in STORE_COLUMNS))]
+
+    def closes(self, start_time=None, end_time=None):
+        """Cierres en el rango como vista memory-mapped de float64."""
+        return self.range(start_time, end_time, columns=['Close'])['Close']
+
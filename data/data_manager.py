@@ -1,5 +1,4 @@
-import csv
-from datetime import datetime
+from data.trade_journal import get_journal
 
 def log_simulated_trade(symbol, price, action, quantity, filename='simulated_trades.csv', fee_rate=0.001):
     """
@@ -15,8 +14,4 @@ def log_simulated_trade(symbol, price, action, quantity, filename='simulated_tra
     """
     fee = price * quantity * fee_rate  # Calcula la comisión
     net_cost = price * quantity - fee if action == 'BUY' else price * quantity + fee  # Calcula el costo neto
-    with open(filename, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        if file.tell() == 0:  # Escribe el encabezado si el archivo está vacío
-            writer.writerow(['Fecha', 'Símbolo', 'Acción', 'Precio', 'Cantidad', 'Comisión', 'Costo Neto'])
-        writer.writerow([datetime.now().strftime('%Y-%m-%d %H:%M:%S'), symbol, action, price, quantity, fee, net_cost])
+    get_journal(filename).append(action, symbol, quantity, price, price * quantity, fee=fee, net_total=net_cost)
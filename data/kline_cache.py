@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from data.kline_parser import parse_klines_matrix
+
+# Columnas de las velas que se guardan en caché (todas como float64)
+KLINE_FIELDS = ('OpenTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'CloseTime')
+
+_INTERVAL_UNITS_MS = {'s': 1000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+
+
+def interval_to_ms(interval):
+    """Duración en milisegundos de un intervalo de Binance (p. ej. '1m', '4h', '1d')."""
+    return int(interval[:-1]) * _INTERVAL_UNITS_MS[interval[-1]]
+
+
+class KlineRingBuffer:
+    """
+    Buffer circular de tamaño fijo para velas.
+
+    Cada valor se escribe dos veces (posición `i` e `i + capacity`), de modo que
+    la ventana ordenada siempre es un tramo contiguo del array y las columnas
+    se pueden entregar como vistas sin copiar datos.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._data = np.full((len(KLINE_FIELDS), 2 * capacity), np.nan)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _write(self, position, row):
+        self._data[:, position] = row
+        self._data[:, position + self.capacity] = row
+
+    def append(self, row):
+        """Añade una vela nueva; si el buffer está lleno descarta la más antigua."""
+        if self._size < self.capacity:
+            self._write(self._size, row)
+            self._size += 1
+        else:
+            self._write(self._start, row)
+            self._start = (self._start + 1) % self.capacity
+
+    def replace_last(self, row):
+        """Sustituye la última vela (p. ej. la vela en curso que se ha actualizado)."""
+        if self._size == 0:
+            raise IndexError("El buffer de velas está vacío.")
+        self._write((self._start + self._size - 1) % self.capacity, row)
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def state(self):
+        """Velas del buffer (campos × velas, de la más antigua a la más reciente) para una instantánea."""
+        return {'rows': self._data[:, self._start:self._start + self._size].copy()}
+
+    def restore(self, state):
+        """Carga las velas de `state()`; si hay más que la capacidad se conservan las últimas."""
+        rows = np.asarray(state['rows'], dtype=np.float64)
+        if rows.ndim != 2 or rows.shape[0] != len(KLINE_FIELDS):
+            raise ValueError("Las velas de la instantánea no tienen las columnas de la caché.")
+        rows = rows[:, -self.capacity:]
+        size = rows.shape[1]
+        self._data[:, :size] = rows
+        self._data[:, self.capacity:self.capacity + size] = rows
+        self._start = 0
+        self._size = size
+
+    def column(self, name):
+        """Vista (sin copia) de una columna, de la vela más antigua a la más reciente."""
+        index = KLINE_FIELDS.index(name)
+        return self._data[index, self._start:self._start + self._size]
+
+    def last(self, name):
+        if self._size == 0:
+            return None
+        return self.column(name)[-1]
+
+
+class KlineCache:
+    """
+    Caché de velas para un símbolo/intervalo.
+
+    Se inicializa una vez con `seed()` (o `seed_from_store()` desde el
+    histórico local) y después `ingest()` incorpora las velas recibidas: la
+    vela en curso se reemplaza y las nuevas se añaden al final.
+    """
+
+    def __init__(self, client, symbol, interval, capacity=100):
+        self.client = client
+        self.symbol = symbol
+        self.interval = interval
+        self.buffer = KlineRingBuffer(capacity)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @staticmethod
+    def _to_rows(candles):
+        """Convierte la respuesta de `get_klines` en filas numéricas con los campos de la caché."""
+        return parse_klines_matrix(candles, KLINE_FIELDS)
+
+    def seed(self):
+        """Descarga la ventana completa y reinicia el buffer."""
+        candles = self.client.get_klines(symbol=self.symbol, interval=self.interval,
+                                         limit=self.buffer.capacity)
+        self.buffer.clear()
+        self.ingest(candles)
+        return len(self.buffer)
+
+    def seed_from_store(self, store):
+        """Carga la ventana con las últimas velas de un `CandleStore`, sin peticiones."""
+        start = max(len(store) - self.buffer.capacity, 0)
+        self.buffer.restore({'rows': np.vstack([store.column(name)[start:] for name in KLINE_FIELDS])})
+        return len(self.buffer)
+
+    def ingest(self, candles):
+        """
+        Incorpora velas ya descargadas (en orden cronológico).
+
+        Las velas con el mismo `OpenTime` que la última guardada la reemplazan,
+        las posteriores se añaden y las anteriores se ignoran.
+
+        Returns:
+            int: Número de velas añadidas.
+        """
+        if not len(candles):
+            return 0
+        appended = 0
+        open_time_index = KLINE_FIELDS.index('OpenTime')
+        for row in self._to_rows(candles):
+            last_open_time = self.buffer.last('OpenTime')
+            if last_open_time is None or row[open_time_index] > last_open_time:
+                self.buffer.append(row)
+                appended += 1
+            elif row[open_time_index] == last_open_time:
+                self.buffer.replace_last(row)
+        return appended
+
+    def column(self, name):
+        return self.buffer.column(name)
+
+    def to_frame(self):
+        """DataFrame construido sobre las vistas del buffer (sin copiar los datos)."""
+        return pd.DataFrame({name: self.buffer.column(name) for name in KLINE_FIELDS}, copy=False)
+
@@ -0,0 +1,85 @@
+import numpy as np
+
+# Posición y tipo de cada campo en las filas de `get_klines` / eventos de velas
+KLINE_COLUMNS = {
+    'OpenTime': (0, np.int64),
+    'Open': (1, np.float64),
+    'High': (2, np.float64),
+    'Low': (3, np.float64),
+    'Close': (4, np.float64),
+    'Volume': (5, np.float64),
+    'CloseTime': (6, np.int64),
+    'QuoteAssetVolume': (7, np.float64),
+    'Trades': (8, np.int64),
+    'TBBAV': (9, np.float64),
+    'TBQAV': (10, np.float64),
+}
+# Campos que usan las estrategias y la caché de velas
+DEFAULT_FIELDS = ('OpenTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'CloseTime')
+
+
+def parse_klines(raw, fields=DEFAULT_FIELDS):
+    """
+    Decodifica la respuesta de `get_klines` en un array por campo.
+
+    Solo se convierten los campos pedidos; cada columna se construye de una vez
+    desde la lista de filas, sin pasar por un DataFrame de objetos.
+
+    Returns:
+        dict: `{campo: np.ndarray}` con int64 para tiempos/trades y float64 para el resto.
+    """
+    columns = {}
+    for name in fields:
+        index, dtype = KLINE_COLUMNS[name]
+        columns[name] = np.array([kline[index] for kline in raw], dtype=dtype)
+    return columns
+
+
+def parse_klines_structured(raw, fields=DEFAULT_FIELDS):
+    """Decodifica la respuesta de `get_klines` en un array estructurado de numpy."""
+    dtype = np.dtype([(name, KLINE_COLUMNS[name][1]) for name in fields])
+    records = np.empty(len(raw), dtype=dtype)
+    for name, column in parse_klines(raw, fields).items():
+        records[name] = column
+    return records
+
+
+def parse_klines_matrix(raw, fields=DEFAULT_FIELDS):
+    """Decodifica la respuesta de `get_klines` en una matriz float64 (filas x campos)."""
+    matrix = np.empty((len(raw), len(fields)), dtype=np.float64)
+    for j, name in enumerate(fields):
+        index = KLINE_COLUMNS[name][0]
+        matrix[:, j] = np.array([kline[index] for kline in raw], dtype=np.float64)
+    return matrix
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import timeit
+    import pandas as pd
+
+    def synthetic_payload(n):
+        start = 1_700_000_000_000
+        return [[start + i * 60_000, "3000.12000000", "3001.00000000", "2999.00000000", "3000.50000000",
+                 "12.34560000", start + i * 60_000 + 59_999, "37000.10000000", 123, "6.10000000",
+                 "18000.20000000", "0"] for i in range(n)]
+
+    def dataframe_path(raw):
+        # Camino anterior: DataFrame de 12 columnas de objetos y conversión de `Close`
+        df = pd.DataFrame(raw, columns=['OpenTime', 'Open', 'High', 'Low', 'Close', 'Volume',
+                                        'CloseTime', 'QuoteAssetVolume', 'Trades',
+                                        'TBBAV', 'TBQAV', 'Ignore'])
+        df['Close'] = df['Close'].astype(float)
+        return df
+
+    for n in (100, 1_000, 100_000):
+        raw = synthetic_payload(n)
+        repeats = max(1, 20_000 // n)
+        results = [
+            ("DataFrame", timeit.timeit(lambda: dataframe_path(raw), number=repeats) / repeats),
+            ("parse_klines (7 campos)", timeit.timeit(lambda: parse_klines(raw), number=repeats) / repeats),
+            ("parse_klines (Close)", timeit.timeit(lambda: parse_klines(raw, ('Close',)), number=repeats) / repeats),
+            ("estructurado", timeit.timeit(lambda: parse_klines_structured(raw), number=repeats) / repeats),
+        ]
+        for name, seconds in results:
+            print(f"{n:>7} filas | {name:<24} {seconds * 1e3:9.3f} ms")
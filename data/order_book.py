@@ -0,0 +1,294 @@
+import bisect
+from utils.logger import main_logger
+from utils.metrics import metrics
+
+
+class BookSide:
+    """
+    Niveles de precio de un lado del libro.
+
+    Los precios se guardan ordenados en una lista (búsqueda binaria con
+    `bisect`) y las cantidades en un diccionario por precio. En las compras la
+    clave es el precio con signo negativo, de modo que en ambos lados el índice
+    0 es siempre el mejor precio.
+    """
+
+    __slots__ = ('sign', 'keys', 'quantities')
+
+    def __init__(self, descending):
+        self.sign = -1.0 if descending else 1.0
+        self.keys = []
+        self.quantities = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        self.keys.clear()
+        self.quantities.clear()
+
+    def set(self, price, quantity):
+        """Fija la cantidad de un nivel; una cantidad 0 lo elimina."""
+        key = self.sign * price
+        if quantity > 0:
+            if key not in self.quantities:
+                bisect.insort(self.keys, key)
+            self.quantities[key] = quantity
+        elif self.quantities.pop(key, None) is not None:
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def best(self):
+        """(precio, cantidad) del mejor nivel, o None si el lado está vacío."""
+        if not self.keys:
+            return None
+        key = self.keys[0]
+        return self.sign * key, self.quantities[key]
+
+    def levels(self, count=None):
+        """Niveles (precio, cantidad) del mejor al peor."""
+        keys = self.keys if count is None else self.keys[:count]
+        return [(self.sign * key, self.quantities[key]) for key in keys]
+
+    def quantity_until(self, price):
+        """Cantidad acumulada en los niveles iguales o mejores que `price`."""
+        end = bisect.bisect_right(self.keys, self.sign * price)
+        quantities = self.quantities
+        return sum(quantities[key] for key in self.keys[:end])
+
+
+class OrderBook:
+    """
+    Libro de órdenes L2 local de un símbolo, mantenido con una instantánea
+    (`get_order_book`) y las actualizaciones diferenciales del stream de
+    profundidad (`<symbol>@depth`), siguiendo el procedimiento de Binance:
+
+    - Mientras no hay instantánea, las actualizaciones se guardan en un buffer.
+    - Al aplicar la instantánea se descartan las actualizaciones ya incluidas
+      (`u <= lastUpdateId`) y la primera aplicada debe cubrir `lastUpdateId + 1`.
+    - Después, cada actualización debe empezar justo tras la anterior
+      (`U == u_anterior + 1`); si hay un hueco, el libro queda desincronizado
+      (`synced = False`) y `needs_snapshot` indica que hay que pedir otra instantánea.
+
+    Las consultas (mejor precio, VWAP para una cantidad, profundidad) no hacen
+    peticiones: trabajan sobre los niveles en memoria.
+    """
+
+    def __init__(self, symbol, max_buffer=10_000):
+        self.symbol = symbol
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id = None
+        self.synced = False
+        self.updated_at = None  # Hora del evento ('E', ms) de la última actualización aplicada
+        self.max_buffer = max_buffer
+        self._buffer = []
+
+    @property
+    def needs_snapshot(self):
+        return not self.synced
+
+    def _side(self, side):
+        """Lado del libro contra el que se ejecuta una orden de `side` ('BUY' consume ventas)."""
+        return self.asks if side == 'BUY' else self.bids
+
+    # --- Sincronización -----------------------------------------------------------
+
+    def apply_snapshot(self, snapshot):
+        """
+        Carga una instantánea de `get_order_book` y aplica las actualizaciones
+        del buffer posteriores a ella.
+
+        Returns:
+            bool: True si el libro queda sincronizado. False si la instantánea es
+            anterior a las actualizaciones guardadas (hay que pedir otra).
+        """
+        last_update_id = int(snapshot['lastUpdateId'])
+        pending = [event for event in self._buffer if int(event['u']) > last_update_id]
+        if pending and int(pending[0]['U']) > last_update_id + 1:
+            main_logger.warning(f"Instantánea del libro de {self.symbol} anterior al stream; se pedirá otra.")
+            self._buffer = pending
+            return False
+
+        for side, levels in ((self.bids, snapshot['bids']), (self.asks, snapshot['asks'])):
+            side.clear()
+            for price, quantity in levels:
+                side.set(float(price), float(quantity))
+        self.last_update_id = last_update_id
+        self.synced = True
+        self._buffer = []
+        for index, event in enumerate(pending):
+            if not self._apply(event) and not self.synced:
+                self._buffer.extend(pending[index + 1:])
+                break
+        return self.synced
+
+    def apply_diff(self, event):
+        """
+        Aplica una actualización `depthUpdate` del stream.
+
+        Returns:
+            bool: True si se aplicó. False si se guardó en el buffer (libro sin
+            sincronizar), si ya estaba incluida o si abrió un hueco de secuencia.
+        """
+        if not self.synced:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.pop(0)
+            self._buffer.append(event)
+            return False
+        return self._apply(event)
+
+    def _apply(self, event):
+        first, last = int(event['U']), int(event['u'])
+        if last <= self.last_update_id:
+            return False  # Ya incluida en la instantánea
+        if first != self.last_update_id + 1 and not first <= self.last_update_id + 1 <= last:
+            metrics.inc('order_book_resyncs', symbol=self.symbol)
+            main_logger.warning(f"Hueco en el stream de profundidad de {self.symbol} "
+                                f"({self.last_update_id} -> {first}); resincronizando.")
+            self.synced = False
+            self._buffer = [event]
+            return False
+        for price, quantity in event['b']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in event['a']:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = last
+        self.updated_at = event.get('E')
+        return True
+
+    # --- Consultas ----------------------------------------------------------------
+
+    def best_bid(self):
+        """(precio, cantidad) de la mejor compra, o None."""
+        return self.bids.best()
+
+    def best_ask(self):
+        """(precio, cantidad) de la mejor venta, o None."""
+        return self.asks.best()
+
+    def mid_price(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread_bps(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (ask[0] - bid[0]) / ((ask[0] + bid[0]) / 2) * 1e4
+
+    def vwap(self, side, quantity):
+        """
+        Precio medio esperado de ejecutar a mercado `quantity` en el lado `side`.
+
+        Returns:
+            tuple: (precio medio, cantidad ejecutable). Si el libro no tiene
+            profundidad suficiente, la cantidad ejecutable es menor que `quantity`;
+            sin niveles, (None, 0.0).
+        """
+        book_side = self._side(side)
+        remaining = quantity
+        cost = 0.0
+        for key in book_side.keys:
+            if remaining <= 0:
+                break
+            used = min(book_side.quantities[key], remaining)
+            cost += used * key
+            remaining -= used
+        filled = quantity - max(remaining, 0.0)
+        if filled <= 0:
+            return None, 0.0
+        return book_side.sign * cost / filled, filled
+
+    def slippage_bps(self, side, quantity):
+        """Deslizamiento esperado (bps, siempre >= 0) respecto al mejor precio al ejecutar `quantity`."""
+        best = self._side(side).best()
+        price, _ = self.vwap(side, quantity)
+        if best is None or price is None:
+            return None
+        return abs(price - best[0]) / best[0] * 1e4
+
+    def depth(self, side, bps):
+        """
+        Cantidad disponible para una orden de `side` a no más de `bps` puntos
+        básicos del precio medio (ventas para 'BUY', compras para 'SELL').
+        """
+        mid = self.mid_price()
+        if mid is None:
+            return 0.0
+        limit = mid * (1 + bps / 1e4) if side == 'BUY' else mid * (1 - bps / 1e4)
+        return self._side(side).quantity_until(limit)
+
+    def max_quantity(self, side, max_slippage_bps):
+        """
+        Mayor cantidad cuyo precio medio de ejecución no se aleja más de
+        `max_slippage_bps` del mejor precio (resuelto nivel a nivel, sin búsquedas).
+        """
+        book_side = self._side(side)
+        best = book_side.best()
+        if best is None:
+            return 0.0
+        # En claves con signo, "peor" siempre es mayor: el límite es best*(1+bps) para compras y
+        # best*(1-bps) para ventas, que con el signo negativo también queda por encima de la mejor clave
+        limit = book_side.sign * best[0] * (1 + book_side.sign * max_slippage_bps / 1e4)
+        quantity = 0.0
+        cost = 0.0
+        for key in book_side.keys:
+            available = book_side.quantities[key]
+            if key > limit:
+                # Parte del nivel que mantiene (coste + x*key) / (cantidad + x) <= límite
+                allowed = max(limit * quantity - cost, 0.0) / (key - limit)
+                if allowed < available:
+                    return quantity + allowed
+            quantity += available
+            cost += available * key
+        return quantity
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import time
+    from benchmarks.synthetic import SyntheticDepthFeed
+
+    feed = SyntheticDepthFeed(seed=3)
+    book = OrderBook("ETHUSDT")
+
+    # Arranque como en producción: el stream llega antes que la instantánea
+    early = [feed.next_event() for _ in range(20)]
+    for event in early[:5]:
+        book.apply_diff(event)
+    snapshot = feed.snapshot()
+    for event in early[5:]:
+        book.apply_diff(event)
+    assert book.apply_snapshot(snapshot)
+
+    n_events = 50_000
+    events = [feed.next_event() for _ in range(n_events)]
+    start = time.perf_counter()
+    for i, event in enumerate(events):
+        if i == n_events // 2:
+            continue  # Evento perdido: hueco de secuencia
+        book.apply_diff(event)
+    elapsed = time.perf_counter() - start
+    print(f"{n_events} actualizaciones en {elapsed:.2f}s ({elapsed / n_events * 1e6:.1f} µs cada una)")
+
+    # Tras el hueco el libro espera una instantánea nueva y aplica lo guardado en el buffer
+    assert book.needs_snapshot
+    assert book.apply_snapshot(feed.snapshot())
+
+    # El libro local coincide con el del generador
+    reference = feed.snapshot()
+    assert book.synced and book.last_update_id == reference['lastUpdateId']
+    assert book.bids.levels() == [(float(p), float(q)) for p, q in reference['bids']]
+    assert book.asks.levels() == [(float(p), float(q)) for p, q in reference['asks']]
+
+    print(f"Mejor compra/venta: {book.best_bid()} / {book.best_ask()} (spread {book.spread_bps():.2f} bps)")
+    for quantity in (1, 10, 50):
+        price, filled = book.vwap('BUY', quantity)
+        print(f"Comprar {quantity}: VWAP {price:.2f} ({book.slippage_bps('BUY', quantity):.2f} bps, "
+              f"ejecutable {filled:g})")
+    print(f"Profundidad a 10 bps: compra {book.depth('BUY', 10):.3f}, venta {book.depth('SELL', 10):.3f}")
+    for side in ('BUY', 'SELL'):
+        quantity = book.max_quantity(side, 1)
+        print(f"Máximo {side} con 1 bps: {quantity:.4f} -> {book.slippage_bps(side, quantity):.4f} bps")
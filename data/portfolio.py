@@ -0,0 +1,339 @@
+import math
+from statistics import NormalDist
+from data.position_ledger import Position
+from strategies.incremental import RollingWindow
+from utils.logger import main_logger
+from utils.metrics import metrics
+
+
+class RiskLimits:
+    """
+    Límites de riesgo de la cartera; None desactiva cada uno.
+
+    Args:
+        max_symbol_exposure (float): Valor máximo (en la moneda de la cartera) de la posición de un símbolo.
+        max_total_exposure (float): Valor máximo de todas las posiciones juntas.
+        max_var (float): VaR máximo de la cartera a una vela, como fracción del capital (p. ej. 0.02).
+        max_drawdown (float): Caída desde el máximo de capital (fracción) que activa el kill switch.
+    """
+
+    def __init__(self, max_symbol_exposure=None, max_total_exposure=None, max_var=None, max_drawdown=None):
+        self.max_symbol_exposure = max_symbol_exposure
+        self.max_total_exposure = max_total_exposure
+        self.max_var = max_var
+        self.max_drawdown = max_drawdown
+
+
+class _Holding:
+    """Posición de un símbolo con su último precio, valor, volatilidad y VaR."""
+
+    __slots__ = ('position', 'price', 'value', 'var', 'returns', 'last_close')
+
+    def __init__(self, position, volatility_window):
+        self.position = position
+        self.price = None
+        self.value = 0.0
+        self.var = 0.0
+        self.returns = RollingWindow(volatility_window)  # Rendimientos logarítmicos por vela
+        self.last_close = None
+
+    def sigma(self):
+        """Volatilidad por vela (desviación muestral de la ventana disponible)."""
+        n = len(self.returns.values)
+        return math.sqrt(self.returns.m2 / (n - 1)) if n > 1 else 0.0
+
+
+class Portfolio:
+    """
+    Cartera valorada a mercado en tiempo real, con límites de riesgo.
+
+    Cada precio (`mark`) actualiza en O(1) el valor del símbolo y, por
+    diferencia, los agregados de la cartera: exposición, PnL no realizado,
+    VaR y drawdown. No hay peticiones ni recorridos de todas las posiciones,
+    así que las comprobaciones previas a cada orden (`buy_capacity`,
+    `halted`) cuestan microsegundos.
+
+    - PnL realizado por lotes FIFO (la misma `Position` que `PositionLedger`).
+    - VaR paramétrico a una vela: z · σ · valor por símbolo, con σ la
+      desviación de los rendimientos de las últimas `volatility_window`
+      velas; el de la cartera es la suma (sin diversificación, conservador).
+    - Kill switch: si el drawdown supera `limits.max_drawdown`, `halted`
+      bloquea las órdenes nuevas hasta llamar a `resume`.
+
+    Args:
+        quote_asset (str): Moneda en la que se valora la cartera.
+        cash (float): Saldo inicial en `quote_asset`.
+        limits (RiskLimits, opcional): Límites de riesgo.
+        confidence (float): Nivel de confianza del VaR.
+        volatility_window (int): Velas de la ventana de volatilidad.
+        positions (dict, opcional): Lotes iniciales en el formato de `PositionLedger.state()`.
+    """
+
+    RECALC_EVERY = 10_000
+
+    def __init__(self, quote_asset="USDT", cash=0.0, limits=None, confidence=0.99, volatility_window=60,
+                 positions=None):
+        self.quote_asset = quote_asset
+        self.cash = float(cash)
+        self.limits = limits or RiskLimits()
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf(confidence)
+        self.volatility_window = volatility_window
+        self.holdings = {}
+        self.exposure = 0.0  # Valor de mercado de todas las posiciones
+        self.cost = 0.0  # Coste de los lotes abiertos
+        self.var = 0.0
+        self.realized_pnl = 0.0
+        self.fees = 0.0
+        self.peak_equity = None
+        self.max_drawdown = 0.0
+        self.halted = False
+        self.halt_reason = None
+        self._updates = 0
+        for symbol, data in (positions or {}).items():
+            self._holding(symbol).position = Position(data['lots'], data['realized_pnl'])
+        self._recalculate()
+
+    # --- Valoración ---------------------------------------------------------------
+
+    @property
+    def equity(self):
+        return self.cash + self.exposure
+
+    @property
+    def unrealized_pnl(self):
+        return self.exposure - self.cost
+
+    @property
+    def drawdown(self):
+        """Caída actual desde el máximo de capital (fracción)."""
+        if not self.peak_equity or self.peak_equity <= 0:
+            return 0.0
+        return max(1 - self.equity / self.peak_equity, 0.0)
+
+    def _holding(self, symbol):
+        holding = self.holdings.get(symbol)
+        if holding is None:
+            holding = self.holdings[symbol] = _Holding(Position(), self.volatility_window)
+        return holding
+
+    def mark(self, symbol, price, bar_close=False):
+        """
+        Valora la posición de `symbol` a `price`. Con `bar_close=True` (cierre
+        de vela) el precio también entra en la ventana de volatilidad.
+        """
+        holding = self._holding(symbol)
+        if bar_close:
+            if holding.last_close:
+                holding.returns.update(math.log(price / holding.last_close))
+            holding.last_close = price
+        holding.price = price
+        value = holding.position.quantity * price
+        self.exposure += value - holding.value
+        holding.value = value
+        var = self.z * holding.sigma() * value
+        self.var += var - holding.var
+        holding.var = var
+
+        self._updates += 1
+        if self._updates % self.RECALC_EVERY == 0:
+            self._recalculate()
+        self._update_drawdown()
+
+    def seed(self, symbol, closes):
+        """Inicializa la ventana de volatilidad de `symbol` con cierres de velas ya cerradas."""
+        holding = self._holding(symbol)
+        holding.returns = RollingWindow(self.volatility_window)
+        holding.last_close = None
+        for close in closes[-(self.volatility_window + 1):]:
+            self.mark(symbol, float(close), bar_close=True)
+
+    def _recalculate(self):
+        """Recalcula los agregados desde las posiciones (acota el error acumulado de las diferencias)."""
+        self.exposure = math.fsum(holding.value for holding in self.holdings.values())
+        self.cost = math.fsum(holding.position.cost for holding in self.holdings.values())
+        self.var = math.fsum(holding.var for holding in self.holdings.values())
+
+    def _update_drawdown(self):
+        equity = self.equity
+        if self.peak_equity is None or equity > self.peak_equity:
+            self.peak_equity = equity
+        drawdown = self.drawdown
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+        limit = self.limits.max_drawdown
+        if limit is not None and drawdown >= limit and not self.halted:
+            self.halt(f"drawdown {drawdown:.2%} >= {limit:.2%}")
+
+    # --- Operaciones ----------------------------------------------------------------
+
+    def apply_fill(self, side, symbol, quantity, price, fee=0.0):
+        """
+        Aplica una ejecución (comisión en la moneda de la cartera).
+
+        Returns:
+            float: PnL realizado (0 para compras).
+        """
+        holding = self._holding(symbol)
+        position = holding.position
+        quantity, price = float(quantity), float(price)
+        cost = position.cost
+        if side == 'BUY':
+            position.buy(quantity, price)
+            self.cash -= quantity * price + fee
+            pnl = 0.0
+        else:
+            pnl = position.sell(quantity, price)
+            self.cash += quantity * price - fee
+            self.realized_pnl += pnl
+        self.cost += position.cost - cost
+        self.fees += fee
+        self.mark(symbol, price if holding.price is None else holding.price)
+        return pnl
+
+    def set_cash(self, cash):
+        """Sincroniza el saldo con el del exchange."""
+        self.cash = float(cash)
+        self._update_drawdown()
+
+    # --- Límites -------------------------------------------------------------------
+
+    def buy_capacity(self, symbol):
+        """
+        Mayor valor (en la moneda de la cartera) que puede comprarse de
+        `symbol` sin superar los límites de exposición y VaR; 0 con el kill
+        switch activo.
+        """
+        if self.halted:
+            return 0.0
+        limits = self.limits
+        holding = self.holdings.get(symbol)
+        value = holding.value if holding is not None else 0.0
+        room = math.inf
+        if limits.max_symbol_exposure is not None:
+            room = min(room, limits.max_symbol_exposure - value)
+        if limits.max_total_exposure is not None:
+            room = min(room, limits.max_total_exposure - self.exposure)
+        if limits.max_var is not None:
+            # Cada unidad de valor comprada añade z·σ de VaR
+            sigma = holding.sigma() if holding is not None else 0.0
+            if sigma > 0:
+                room = min(room, (limits.max_var * self.equity - self.var) / (self.z * sigma))
+        return max(room, 0.0)
+
+    def halt(self, reason):
+        """Activa el kill switch: no se envían órdenes nuevas hasta `resume`."""
+        self.halted = True
+        self.halt_reason = reason
+        metrics.inc('kill_switch')
+        main_logger.error(f"Kill switch activado ({reason}); se bloquean las órdenes nuevas.")
+
+    def resume(self):
+        """Desactiva el kill switch; el drawdown se vuelve a medir desde el capital actual."""
+        self.halted = False
+        self.halt_reason = None
+        self.peak_equity = self.equity
+        main_logger.warning("Kill switch desactivado manualmente.")
+
+    def summary(self):
+        return {
+            'equity': self.equity, 'cash': self.cash, 'exposure': self.exposure,
+            'realized_pnl': self.realized_pnl, 'unrealized_pnl': self.unrealized_pnl, 'fees': self.fees,
+            'drawdown': self.drawdown, 'max_drawdown': self.max_drawdown, 'var': self.var,
+            'halted': self.halted,
+        }
+
+    # --- Instantáneas ----------------------------------------------------------------
+
+    def state(self):
+        return {
+            'quote_asset': self.quote_asset, 'cash': self.cash, 'realized_pnl': self.realized_pnl,
+            'fees': self.fees, 'peak_equity': self.peak_equity, 'max_drawdown': self.max_drawdown,
+            'halted': self.halted, 'halt_reason': self.halt_reason,
+            'holdings': {
+                symbol: {'lots': [list(lot) for lot in holding.position.lots],
+                         'realized_pnl': holding.position.realized_pnl, 'price': holding.price,
+                         'last_close': holding.last_close, 'returns': holding.returns.state()}
+                for symbol, holding in self.holdings.items()
+            },
+        }
+
+    def restore(self, state):
+        if state['quote_asset'] != self.quote_asset:
+            raise ValueError(f"La instantánea de la cartera está en {state['quote_asset']}.")
+        self.holdings = {}
+        for symbol, data in state['holdings'].items():
+            holding = self._holding(symbol)
+            holding.position = Position(data['lots'], data['realized_pnl'])
+            holding.returns.restore(data['returns'])
+            holding.last_close = data['last_close']
+            holding.price = data['price']
+            if holding.price is not None:
+                holding.value = holding.position.quantity * holding.price
+                holding.var = self.z * holding.sigma() * holding.value
+        self.cash = state['cash']
+        self.realized_pnl = state['realized_pnl']
+        self.fees = state['fees']
+        self.peak_equity = state['peak_equity']
+        self.max_drawdown = state['max_drawdown']
+        self.halted = state['halted']
+        self.halt_reason = state['halt_reason']
+        self._recalculate()
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import time
+    from benchmarks.synthetic import synthetic_closes
+
+    symbols = [f"PAR{i}USDT" for i in range(50)]
+    prices = {symbol: synthetic_closes(5000, seed=i, volatility=0.004) for i, symbol in enumerate(symbols)}
+    portfolio = Portfolio(cash=100_000, limits=RiskLimits(max_symbol_exposure=5_000, max_total_exposure=60_000,
+                                                          max_var=0.02, max_drawdown=0.15))
+    for symbol in symbols:
+        portfolio.seed(symbol, prices[symbol][:100])
+
+    # Compras hasta donde dejan los límites
+    for symbol in symbols:
+        price = prices[symbol][99]
+        capacity = portfolio.buy_capacity(symbol)
+        if capacity > 0:
+            portfolio.apply_fill('BUY', symbol, min(capacity, 4_000) / price, price, fee=4.0)
+    print(f"Exposición {portfolio.exposure:,.0f} (límite 60,000), VaR {portfolio.var:,.0f} "
+          f"({portfolio.var / portfolio.equity:.2%} del capital)")
+    assert portfolio.exposure <= 60_000 + 1e-6 and portfolio.var <= 0.02 * portfolio.equity + 1e-6
+
+    # Valoración a mercado en cada precio
+    ticks = [(symbol, float(prices[symbol][t])) for t in range(100, 5000) for symbol in symbols]
+    start = time.perf_counter()
+    for symbol, price in ticks:
+        portfolio.mark(symbol, price, bar_close=True)
+    elapsed = time.perf_counter() - start
+    print(f"{len(ticks):,} precios en {elapsed:.2f}s ({elapsed / len(ticks) * 1e6:.2f} µs cada uno)")
+
+    start = time.perf_counter()
+    for _ in range(100_000):
+        portfolio.buy_capacity('PAR0USDT')
+    print(f"Comprobación de límites: {(time.perf_counter() - start) / 100_000 * 1e6:.2f} µs")
+
+    # Los agregados incrementales coinciden con un recálculo completo
+    exposure = sum(h.position.quantity * h.price for h in portfolio.holdings.values())
+    unrealized = sum(h.position.quantity * h.price - h.position.cost for h in portfolio.holdings.values())
+    assert math.isclose(portfolio.exposure, exposure, rel_tol=1e-9)
+    assert math.isclose(portfolio.unrealized_pnl, unrealized, rel_tol=1e-6, abs_tol=1e-6)
+
+    # Ventas con PnL realizado FIFO, e instantánea
+    for symbol in symbols[:10]:
+        holding = portfolio.holdings[symbol]
+        portfolio.apply_fill('SELL', symbol, holding.position.quantity, holding.price, fee=4.0)
+    copy = Portfolio(cash=0, limits=portfolio.limits)
+    copy.restore(portfolio.state())
+    assert math.isclose(copy.equity, portfolio.equity) and math.isclose(copy.var, portfolio.var)
+    print({key: round(value, 4) if isinstance(value, float) else value
+           for key, value in portfolio.summary().items()})
+
+    # Kill switch: una caída brusca bloquea las compras
+    for symbol in symbols[10:]:
+        portfolio.mark(symbol, portfolio.holdings[symbol].price * 0.3)
+    assert portfolio.halted and portfolio.buy_capacity('PAR0USDT') == 0
+    print(f"Kill switch: {portfolio.halt_reason}")
@@ -0,0 +1,252 @@
+import csv
+import json
+import os
+import threading
+from collections import deque
+from data.trade_journal import flush_journal
+from utils.logger import main_logger
+
+# Tolerancia para considerar agotado un lote (errores de redondeo en cantidades)
+_EPSILON = 1e-12
+
+
+class Position:
+    """Lotes abiertos (FIFO) y PnL realizado de un símbolo."""
+
+    __slots__ = ('lots', 'quantity', 'cost', 'realized_pnl')
+
+    def __init__(self, lots=(), realized_pnl=0.0):
+        self.lots = deque([quantity, price] for quantity, price in lots)
+        self.quantity = sum(lot[0] for lot in self.lots)
+        self.cost = sum(lot[0] * lot[1] for lot in self.lots)
+        self.realized_pnl = realized_pnl
+
+    def buy(self, quantity, price):
+        self.lots.append([quantity, price])
+        self.quantity += quantity
+        self.cost += quantity * price
+
+    def sell(self, quantity, price):
+        """Consume lotes en orden FIFO y devuelve el PnL realizado de la venta."""
+        remaining = quantity
+        sold_cost = 0.0
+        while remaining > _EPSILON and self.lots:
+            lot = self.lots[0]
+            used = min(lot[0], remaining)
+            sold_cost += used * lot[1]
+            remaining -= used
+            lot[0] -= used
+            if lot[0] <= _EPSILON:
+                self.lots.popleft()
+        sold = quantity - remaining
+        self.quantity = max(self.quantity - sold, 0.0)
+        self.cost = max(self.cost - sold_cost, 0.0) if self.lots else 0.0
+        pnl = sold * price - sold_cost
+        self.realized_pnl += pnl
+        return pnl
+
+
+class PositionLedger:
+    """
+    Libro de posiciones en memoria construido a partir del historial de
+    transacciones (append-only).
+
+    El historial se lee una sola vez al arrancar; después cada transacción se
+    aplica de forma incremental. Cada `snapshot_every` transacciones se guarda
+    una instantánea con los lotes abiertos y la posición en bytes del
+    historial, de modo que el arranque solo relee las filas posteriores.
+    Con `history_file=None` el libro vive solo en memoria (modo simulación).
+
+    `lock` (reentrante) protege las posiciones: las transacciones se registran
+    desde varios hilos a la vez. Quien escriba en el historial debe mantenerlo
+    entre la fila y su `apply`, para que una instantánea nunca cubra una fila
+    que todavía no está en las posiciones.
+    """
+
+    def __init__(self, history_file="transaction_history.csv", snapshot_file=None, snapshot_every=1000):
+        self.history_file = history_file
+        self.snapshot_file = snapshot_file or (f"{history_file}.snapshot.json" if history_file else None)
+        self.snapshot_every = snapshot_every
+        self.positions = {}
+        self._pending = 0
+        self.lock = threading.RLock()
+
+    def _position(self, symbol):
+        if symbol not in self.positions:
+            self.positions[symbol] = Position()
+        return self.positions[symbol]
+
+    def apply(self, transaction_type, symbol, quantity, price):
+        """
+        Aplica una transacción al libro.
+
+        Returns:
+            float: PnL realizado (0 para compras).
+        """
+        with self.lock:
+            position = self._position(symbol)
+            if transaction_type == 'BUY':
+                position.buy(float(quantity), float(price))
+                pnl = 0.0
+            else:
+                pnl = position.sell(float(quantity), float(price))
+
+            self._pending += 1
+            if self._pending >= self.snapshot_every:
+                self.save_snapshot()
+        return pnl
+
+    def load(self):
+        """Carga la última instantánea válida y aplica solo las filas posteriores del historial."""
+        self.positions = {}
+        if self.history_file is None:
+            return self
+        offset = self._load_snapshot()
+        replayed = self._replay(offset)
+        if replayed >= self.snapshot_every:
+            self.save_snapshot()
+        return self
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_file) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            main_logger.warning(f"Instantánea del libro de posiciones ilegible; se relee el historial: {e}")
+            return 0
+
+        try:
+            history_size = os.path.getsize(self.history_file)
+        except OSError:
+            history_size = 0
+        if snapshot.get('offset', 0) > history_size:
+            main_logger.warning("La instantánea no corresponde al historial actual; se relee completo.")
+            return 0
+
+        self.restore(snapshot['positions'])
+        return snapshot['offset']
+
+    def _replay(self, offset):
+        """Aplica las filas del historial a partir de `offset` (en bytes)."""
+        try:
+            f = open(self.history_file, newline='')
+        except FileNotFoundError:
+            return 0
+        replayed = 0
+        with f:
+            header = next(csv.reader([f.readline()]), None)
+            if not header:
+                return 0
+            columns = {name: index for index, name in enumerate(header)}
+            if offset:
+                f.seek(offset)
+            t, s, q, p = columns['type'], columns['symbol'], columns['quantity'], columns['price']
+            for row in csv.reader(f):
+                if not row:
+                    continue
+                position = self._position(row[s])
+                if row[t] == 'BUY':
+                    position.buy(float(row[q]), float(row[p]))
+                else:
+                    position.sell(float(row[q]), float(row[p]))
+                replayed += 1
+        self._pending = replayed
+        return replayed
+
+    def save_snapshot(self):
+        """Guarda de forma atómica los lotes abiertos y la posición actual del historial."""
+        with self.lock:
+            if self.history_file is None:
+                self._pending = 0
+                return
+            # El diario escribe en segundo plano: el offset debe incluir todo lo ya aplicado
+            flush_journal(self.history_file)
+            try:
+                offset = os.path.getsize(self.history_file)
+            except OSError:
+                return
+            snapshot = {'offset': offset, 'positions': self.state()}
+            temp_file = f"{self.snapshot_file}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+            os.replace(temp_file, self.snapshot_file)
+            self._pending = 0
+
+    def state(self):
+        """Lotes abiertos y PnL realizado por símbolo (serializable)."""
+        with self.lock:
+            return {
+                symbol: {'lots': [list(lot) for lot in position.lots], 'realized_pnl': position.realized_pnl}
+                for symbol, position in self.positions.items()
+            }
+
+    def restore(self, positions):
+        """Sustituye las posiciones por las de `state()`."""
+        self.positions = {
+            symbol: Position(data['lots'], data['realized_pnl'])
+            for symbol, data in positions.items()
+        }
+
+    def quantity(self, symbol):
+        position = self.positions.get(symbol)
+        return position.quantity if position else 0.0
+
+    def cost_basis(self, symbol):
+        """Coste medio de los lotes abiertos, o None si no hay posición."""
+        position = self.positions.get(symbol)
+        if position is None or position.quantity <= _EPSILON:
+            return None
+        return position.cost / position.quantity
+
+    def realized_pnl(self, symbol):
+        position = self.positions.get(symbol)
+        return position.realized_pnl if position else 0.0
+
+    def unrealized_pnl(self, symbol, price):
+        position = self.positions.get(symbol)
+        return position.quantity * price - position.cost if position else 0.0
+
+    def profit_for_sale(self, symbol, quantity_sold, sell_price):
+        """
+        Ganancia/pérdida de vender `quantity_sold` al precio dado según FIFO,
+        sin modificar el libro. Devuelve None si no hay lotes suficientes.
+        """
+        with self.lock:
+            position = self.positions.get(symbol)
+            remaining = quantity_sold
+            total_cost = 0.0
+            for lot_quantity, lot_price in (position.lots if position else ()):
+                if remaining <= _EPSILON:
+                    break
+                used = min(lot_quantity, remaining)
+                total_cost += used * lot_price
+                remaining -= used
+        if remaining > _EPSILON:
+            return None
+        return quantity_sold * sell_price - total_cost
+
+
+_default_ledger = None
+_default_ledger_lock = threading.Lock()
+_history_file = "transaction_history.csv"
+
+
+def use_history_file(history_file):
+    """
+    Cambia el historial del libro compartido y de `record_transaction` (p. ej.
+    a un archivo temporal al reproducir una sesión, para no tocar el real).
+    """
+    global _history_file
+    _history_file = history_file
+
+
+def get_ledger(history_file=None):
+    """Libro de posiciones compartido del proceso, cargado la primera vez que se usa."""
+    global _default_ledger
+    history_file = history_file or _history_file
+    with _default_ledger_lock:
+        if _default_ledger is None or _default_ledger.history_file != history_file:
+            _default_ledger = PositionLedger(history_file).load()
+        return _default_ledger
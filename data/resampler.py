@@ -0,0 +1,202 @@
+import math
+import numpy as np
+import pandas as pd
+from data.kline_cache import KLINE_FIELDS, KlineRingBuffer, interval_to_ms
+
+# Intervalos superiores que se construyen por defecto a partir de velas de 1m
+DEFAULT_TIMEFRAMES = ('5m', '15m', '1h', '4h')
+
+
+class TimeframeAggregator:
+    """
+    Construye velas de un intervalo superior a partir de velas cerradas del
+    intervalo base, en O(1) por vela base.
+
+    La vela en formación se acumula en variables (apertura, máximo, mínimo,
+    cierre y volumen) y pasa al buffer circular cuando cierra la última vela
+    base de su periodo. Los periodos se alinean con múltiplos del intervalo
+    desde la época (UTC), igual que en Binance.
+    """
+
+    def __init__(self, interval, base_interval="1m", capacity=100):
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.base_ms = interval_to_ms(base_interval)
+        if interval[-1] == 'w' or self.interval_ms % self.base_ms or self.interval_ms <= self.base_ms:
+            raise ValueError(f"No se puede construir {interval} a partir de {base_interval}.")
+        self.buffer = KlineRingBuffer(capacity)
+        self._open_time = None
+        self._last_closed = None
+
+    def update(self, open_time, open_, high, low, close, volume):
+        """
+        Incorpora una vela base cerrada.
+
+        Returns:
+            list: Filas (en el orden de `KLINE_FIELDS`) de las velas de este
+            intervalo que quedan cerradas con esta vela. Si faltan velas base,
+            la vela anterior se cierra incompleta al empezar un periodo nuevo.
+        """
+        completed = []
+        bucket = open_time - open_time % self.interval_ms
+        if self._last_closed is not None and bucket <= self._last_closed:
+            return completed  # Vela base antigua: su periodo ya se cerró
+        if self._open_time is not None and bucket != self._open_time:
+            if bucket < self._open_time:
+                return completed
+            completed.append(self._close())
+        if self._open_time is None:
+            self._open_time = bucket
+            self._open, self._high, self._low, self._volume = open_, high, low, 0.0
+        self._high = max(self._high, high)
+        self._low = min(self._low, low)
+        self._close_price = close
+        self._volume += volume
+
+        if open_time + self.base_ms >= bucket + self.interval_ms:
+            completed.append(self._close())
+        return completed
+
+    def _close(self):
+        row = (self._open_time, self._open, self._high, self._low, self._close_price, self._volume,
+               self._open_time + self.interval_ms - 1)
+        self.buffer.append(row)
+        self._last_closed = self._open_time
+        self._open_time = None
+        return row
+
+    def partial(self):
+        """Vela en formación (o None), con las mismas columnas que el buffer."""
+        if self._open_time is None:
+            return None
+        return (self._open_time, self._open, self._high, self._low, self._close_price, self._volume,
+                self._open_time + self.interval_ms - 1)
+
+    def state(self):
+        partial = self.partial()
+        return {'interval_ms': self.interval_ms, 'buffer': self.buffer.state(), 'last_closed': self._last_closed,
+                'partial': list(partial[:6]) if partial is not None else None}
+
+    def restore(self, state):
+        if state['interval_ms'] != self.interval_ms:
+            raise ValueError(f"Intervalo distinto en la instantánea para {self.interval}.")
+        self.buffer.restore(state['buffer'])
+        self._last_closed = state['last_closed']
+        self._open_time = None
+        if state['partial'] is not None:
+            open_time, self._open, self._high, self._low, self._close_price, self._volume = state['partial']
+            self._open_time = int(open_time)
+
+
+class MultiTimeframeResampler:
+    """
+    Velas e indicadores en varios intervalos desde una única fuente de velas base.
+
+    Cada vela base cerrada actualiza todos los intervalos (O(1) cada uno) sin
+    peticiones adicionales. Si se indica `engine_factory`, cada intervalo tiene
+    además su propio motor de indicadores incrementales que se actualiza al
+    cerrar cada vela de ese intervalo.
+
+    Args:
+        timeframes (tuple): Intervalos superiores a construir (p. ej. '5m', '1h').
+        base_interval (str): Intervalo de las velas de entrada.
+        capacity (int): Velas cerradas que se conservan por intervalo.
+        engine_factory (callable, opcional): Crea un `IndicatorEngine` por intervalo.
+    """
+
+    def __init__(self, timeframes=DEFAULT_TIMEFRAMES, base_interval="1m", capacity=100, engine_factory=None):
+        self.base_interval = base_interval
+        self.aggregators = {interval: TimeframeAggregator(interval, base_interval, capacity)
+                            for interval in timeframes}
+        self.engines = {interval: engine_factory() for interval in timeframes} if engine_factory else {}
+
+    def update(self, kline):
+        """
+        Incorpora una vela base cerrada (fila de `get_klines` o evento convertido).
+
+        Returns:
+            dict: `{intervalo: [filas cerradas]}` solo de los intervalos con velas nuevas.
+        """
+        open_time = int(kline[0])
+        values = (float(kline[1]), float(kline[2]), float(kline[3]), float(kline[4]), float(kline[5]))
+        closed = {}
+        for interval, aggregator in self.aggregators.items():
+            rows = aggregator.update(open_time, *values)
+            if rows:
+                closed[interval] = rows
+                engine = self.engines.get(interval)
+                if engine is not None:
+                    for row in rows:
+                        engine.update(row[4])
+        return closed
+
+    def seed(self, klines):
+        """Incorpora un histórico de velas base cerradas en orden cronológico."""
+        for kline in klines:
+            self.update(kline)
+
+    def state(self):
+        """Velas cerradas, vela en formación y motor de cada intervalo, para una instantánea."""
+        return {interval: {'aggregator': aggregator.state(),
+                           'engine': self.engines[interval].state() if interval in self.engines else None}
+                for interval, aggregator in self.aggregators.items()}
+
+    def restore(self, state):
+        """Reanuda desde `state()`; los intervalos deben ser los mismos."""
+        if set(state) != set(self.aggregators):
+            raise ValueError(f"Intervalos distintos en la instantánea: {sorted(state)}.")
+        for interval, aggregator in self.aggregators.items():
+            aggregator.restore(state[interval]['aggregator'])
+            if interval in self.engines:
+                if state[interval]['engine'] is None:
+                    raise ValueError(f"La instantánea no tiene indicadores para {interval}.")
+                self.engines[interval].restore(state[interval]['engine'])
+
+    def column(self, interval, name):
+        """Vista de una columna de las velas cerradas de `interval`."""
+        return self.aggregators[interval].buffer.column(name)
+
+    def to_frame(self, interval, include_partial=False):
+        """
+        DataFrame de velas cerradas de `interval` con las columnas de la caché, para
+        aplicar cualquier función de `strategies/` sobre otro intervalo.
+        """
+        aggregator = self.aggregators[interval]
+        columns = {name: aggregator.buffer.column(name) for name in KLINE_FIELDS}
+        partial = aggregator.partial() if include_partial else None
+        if partial is not None:
+            columns = {name: np.append(column, partial[i]) for i, (name, column) in enumerate(columns.items())}
+        return pd.DataFrame(columns, copy=False)
+
+    def values(self, interval):
+        """Últimos valores de los indicadores de `interval` (vacío si no hay motor)."""
+        engine = self.engines.get(interval)
+        return engine.values if engine is not None else {}
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import time
+    from benchmarks.synthetic import synthetic_klines
+    from strategies.incremental import IndicatorEngine
+    from strategies.rsi import calculate_rsi
+
+    klines = synthetic_klines(60 * 24 * 30)
+    resampler = MultiTimeframeResampler(capacity=1000, engine_factory=IndicatorEngine)
+    start = time.perf_counter()
+    resampler.seed(klines)
+    elapsed = time.perf_counter() - start
+    print(f"{len(klines)} velas de 1m en {elapsed:.2f}s ({elapsed / len(klines) * 1e6:.1f} µs por vela)")
+
+    # Comprobación contra pandas: resample de 1m a 1h
+    frame = pd.DataFrame(klines).iloc[:, :6].astype(float)
+    frame.columns = ['OpenTime', 'Open', 'High', 'Low', 'Close', 'Volume']
+    frame.index = pd.to_datetime(frame['OpenTime'], unit='ms')
+    hourly = frame.resample('1h').agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+                                       'Volume': 'sum'}).iloc[:-1]  # La última hora aún está en formación
+    ours = resampler.to_frame('1h')
+    for name in ('Open', 'High', 'Low', 'Close', 'Volume'):
+        assert np.allclose(ours[name].to_numpy(), hourly[name].to_numpy()), name
+    rsi = calculate_rsi(ours)['RSI'].iloc[-1]
+    assert math.isclose(rsi, resampler.values('1h')['RSI'], rel_tol=1e-9)
+    print(f"1h coincide con pandas; RSI(1h) = {rsi:.2f}")
@@ -0,0 +1,248 @@
+import atexit
+import csv
+import glob
+import os
+import threading
+import time
+import numpy as np
+
+# Esquema común para operaciones reales y simuladas
+JOURNAL_FIELDS = ['type', 'symbol', 'quantity', 'price', 'total', 'order_id', 'timestamp', 'fee', 'net_total']
+
+# Cabeceras antiguas de simulated_trades.csv, para seguir escribiendo en archivos existentes
+LEGACY_ALIASES = {
+    'Fecha': 'timestamp', 'Símbolo': 'symbol', 'Acción': 'type', 'Precio': 'price',
+    'Cantidad': 'quantity', 'Comisión': 'fee', 'Costo Neto': 'net_total',
+}
+
+# Registro binario de ancho fijo para los segmentos columnares
+RECORD_DTYPE = np.dtype([
+    ('timestamp', 'f8'), ('type', 'S4'), ('symbol', 'S16'), ('quantity', 'f8'), ('price', 'f8'),
+    ('total', 'f8'), ('fee', 'f8'), ('net_total', 'f8'), ('order_id', 'S32'),
+])
+
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+class TradeJournal:
+    """
+    Diario de operaciones con escritura agrupada (group commit).
+
+    `append` solo añade el registro a un buffer en memoria; un hilo en segundo
+    plano vuelca el lote cada `flush_interval` segundos o al llegar a
+    `batch_size` registros, con una sola escritura por lote.
+
+    Args:
+        path (str): Archivo CSV, o directorio de segmentos si `fmt='binary'`.
+        fmt (str): 'csv' o 'binary' (segmentos de registros de ancho fijo).
+        flush_interval (float): Tiempo máximo que un registro espera en memoria.
+        batch_size (int): Registros que fuerzan un volcado inmediato.
+        fsync: 'never', 'batch' (tras cada lote) o segundos mínimos entre fsync.
+        segment_records (int): Registros por segmento binario antes de rotar.
+    """
+
+    def __init__(self, path, fmt='csv', flush_interval=0.05, batch_size=1000, fsync='never',
+                 segment_records=1_000_000):
+        if fmt not in ('csv', 'binary'):
+            raise ValueError("El formato del diario debe ser 'csv' o 'binary'.")
+        self.path = path
+        self.fmt = fmt
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.segment_records = segment_records
+
+        self._buffer = []
+        self._condition = threading.Condition()
+        self._flushed = threading.Condition()
+        self._submitted = 0
+        self._written = 0
+        self._closed = False
+        self._last_fsync = time.monotonic()
+        self._file = None
+        self._open()
+
+        self._thread = threading.Thread(target=self._run, name=f"journal:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        if self.fmt == 'csv':
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self._file = open(self.path, 'a', newline='')
+            if new_file:
+                self._header = JOURNAL_FIELDS
+                csv.writer(self._file).writerow(self._header)
+                self._file.flush()
+            else:
+                with open(self.path, newline='') as f:
+                    self._header = next(csv.reader(f), JOURNAL_FIELDS)
+            # Posición de cada campo del esquema en la cabecera del archivo (admite cabeceras antiguas)
+            names = [LEGACY_ALIASES.get(name, name) for name in self._header]
+            self._columns = [JOURNAL_FIELDS.index(name) if name in JOURNAL_FIELDS else None for name in names]
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            segments = sorted(glob.glob(os.path.join(self.path, '*.seg')))
+            self._segment_index = len(segments)
+            self._segment_count = 0
+            if segments:
+                self._segment_index -= 1
+                self._segment_count = os.path.getsize(segments[-1]) // RECORD_DTYPE.itemsize
+            self._file = open(self._segment_path(self._segment_index), 'ab')
+
+    def _segment_path(self, index):
+        return os.path.join(self.path, f"{index:06d}.seg")
+
+    def append(self, transaction_type, symbol, quantity, price, total, order_id='', fee=0.0, net_total=None,
+               timestamp=None):
+        """Encola una operación; el formateo y la escritura ocurren en el hilo de volcado."""
+        record = (transaction_type, symbol, quantity, price, total, order_id,
+                  time.time() if timestamp is None else timestamp, fee,
+                  total if net_total is None else net_total)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("El diario de operaciones está cerrado.")
+            self._buffer.append(record)
+            self._submitted += 1
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self, timeout=None):
+        """Espera a que todo lo encolado hasta ahora esté escrito en disco."""
+        with self._condition:
+            target = self._submitted
+            self._condition.notify()
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._file.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._buffer and not self._closed:
+                    self._condition.wait(self.flush_interval)
+                batch, self._buffer = self._buffer, []
+                closed = self._closed
+            if batch:
+                self._write(batch)
+                with self._flushed:
+                    self._written += len(batch)
+                    self._flushed.notify_all()
+            if closed and not self._buffer:
+                return
+
+    def _write(self, batch):
+        if self.fmt == 'csv':
+            rows = []
+            formatted = {}  # Los registros de un lote suelen compartir el mismo segundo
+            for record in batch:
+                values = list(record)
+                second = int(values[6])
+                if second not in formatted:
+                    formatted[second] = _format_time(second)
+                values[6] = formatted[second]
+                rows.append(['' if index is None else values[index] for index in self._columns])
+            csv.writer(self._file).writerows(rows)
+        else:
+            start = 0
+            while start < len(batch):
+                if self._segment_count >= self.segment_records:
+                    self._file.close()
+                    self._segment_index += 1
+                    self._segment_count = 0
+                    self._file = open(self._segment_path(self._segment_index), 'ab')
+                chunk = batch[start:start + self.segment_records - self._segment_count]
+                array = np.array([(r[6], r[0], r[1], r[2], r[3], r[4], r[7], r[8], str(r[5])) for r in chunk],
+                                 dtype=RECORD_DTYPE)
+                self._file.write(array.tobytes())
+                self._segment_count += len(chunk)
+                start += len(chunk)
+        self._file.flush()
+        self._maybe_fsync()
+
+    def _maybe_fsync(self):
+        if self.fsync == 'never':
+            return
+        now = time.monotonic()
+        if self.fsync == 'batch' or now - self._last_fsync >= float(self.fsync):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+
+def read_segments(directory):
+    """Lee todos los segmentos binarios de un diario como un array estructurado (memory-mapped)."""
+    arrays = [np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+              for path in sorted(glob.glob(os.path.join(directory, '*.seg')))
+              if os.path.getsize(path) >= RECORD_DTYPE.itemsize]
+    if not arrays:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+
+
+def export_csv(directory, csv_path, chunk_size=500_000):
+    """Exporta los segmentos binarios de un diario a CSV con el esquema común."""
+    records = read_segments(directory)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(JOURNAL_FIELDS)
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            writer.writerows(zip(
+                np.char.decode(chunk['type']), np.char.decode(chunk['symbol']), chunk['quantity'],
+                chunk['price'], chunk['total'], np.char.decode(chunk['order_id']),
+                (_format_time(t) for t in chunk['timestamp']), chunk['fee'], chunk['net_total'],
+            ))
+    return len(records)
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path, **options):
+    """Diario compartido del proceso para un archivo (se crea la primera vez)."""
+    with _journals_lock:
+        if path not in _journals:
+            _journals[path] = TradeJournal(path, **options)
+        return _journals[path]
+
+
+def flush_journal(path):
+    """Vuelca a disco el diario de `path`, si hay uno abierto."""
+    journal = _journals.get(path)
+    if journal is not None:
+        journal.flush()
+
+
+@atexit.register
+def close_journals():
+    with _journals_lock:
+        for journal in _journals.values():
+            journal.close()
+        _journals.clear()
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    for fmt, path in (('csv', os.path.join(directory, 'fills.csv')), ('binary', os.path.join(directory, 'fills'))):
+        journal = TradeJournal(path, fmt=fmt, batch_size=10_000)
+        n = 300_000
+        start = time.perf_counter()
+        for i in range(n):
+            journal.append('BUY' if i % 2 else 'SELL', 'ETHUSDT', 0.01, 3000.0 + i % 7, 30.0, i, fee=0.03)
+        journal.close()
+        elapsed = time.perf_counter() - start
+        print(f"{fmt}: {n} operaciones en {elapsed:.2f}s ({n / elapsed:,.0f}/s)")
+    print(f"Exportadas {export_csv(os.path.join(directory, 'fills'), os.path.join(directory, 'export.csv'))} filas a CSV.")
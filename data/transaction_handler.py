@@ -1,74 +1,37 @@
-import csv
-import time
+from data.position_ledger import get_ledger
+from data.trade_journal import get_journal
 from utils.logger import main_logger
 
-def record_transaction(transaction_type, symbol, quantity, price, total, order_id):
-    """Registra una transacción en un archivo CSV."""
-    file_name = "transaction_history.csv"
-    fields = ['type', 'symbol', 'quantity', 'price', 'total', 'order_id', 'timestamp']
-
+def record_transaction(transaction_type, symbol, quantity, price, total, order_id, fee=0.0):
+    """
+    Registra una transacción en el historial del libro compartido
+    (transaction_history.csv salvo `use_history_file`), con escritura agrupada
+    en segundo plano.
+    """
     try:
-        # Verificar si el archivo existe, si no, crearlo con encabezados
-        try:
-            with open(file_name, 'x', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fields)
-                writer.writeheader()
-        except FileExistsError:
-            pass
-
-        # Registrar la transacción
-        with open(file_name, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fields)
-            writer.writerow({
-                'type': transaction_type,
-                'symbol': symbol,
-                'quantity': quantity,
-                'price': price,
-                'total': total,
-                'order_id': order_id,
-                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-            })
+        # El libro se carga antes de encolar la fila para no contarla dos veces
+        ledger = get_ledger()
+        # Fila y posición bajo el mismo cerrojo: una instantánea no puede quedar entre ambas
+        with ledger.lock:
+            get_journal(ledger.history_file).append(transaction_type, symbol, quantity, price, total, order_id, fee=fee)
+
+            # Mantiene actualizado el libro de posiciones sin releer el historial
+            ledger.apply(transaction_type, symbol, quantity, price)
     except Exception as e:
         main_logger.error(f"Error al registrar transacción: {e}")
 
 def calculate_profit(symbol, quantity_sold, sell_price):
-    """Calcula la ganancia/pérdida neta para una venta basada en el historial de transacciones."""
-    file_name = "transaction_history.csv"
-    try:
-        with open(file_name, 'r') as f:
-            reader = csv.DictReader(f)
-            purchases = [row for row in reader if row['type'] == 'BUY' and row['symbol'] == symbol]
-
-        # Calcular el costo promedio de la cantidad vendida
-        remaining_quantity = quantity_sold
-        total_cost = 0
-
-        for purchase in purchases:
-            purchase_qty = float(purchase['quantity'])
-            purchase_price = float(purchase['price'])
-
-            if remaining_quantity <= 0:
-                break
+    """
+    Calcula la ganancia/pérdida neta para una venta según los lotes abiertos (FIFO).
 
-            if purchase_qty <= remaining_quantity:
-                total_cost += purchase_qty * purchase_price
-                remaining_quantity -= purchase_qty
-            else:
-                total_cost += remaining_quantity * purchase_price
-                remaining_quantity = 0
-
-        if remaining_quantity > 0:
+    Usa el libro de posiciones en memoria, que ya descuenta las ventas
+    registradas, en lugar de releer el historial completo en cada llamada.
+    """
+    try:
+        profit = get_ledger().profit_for_sale(symbol, quantity_sold, sell_price)
+        if profit is None:
             main_logger.warning("No hay suficientes compras registradas para calcular el costo promedio.")
-            return None
-
-        total_revenue = quantity_sold * sell_price
-        profit = total_revenue - total_cost
-
         return profit
-
-    except FileNotFoundError:
-        main_logger.warning("Archivo de historial de transacciones no encontrado. No se puede calcular la ganancia.")
-        return None
     except Exception as e:
         main_logger.error(f"Error al calcular ganancia: {e}")
         return None
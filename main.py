@@ -1,146 +1,129 @@
+from data.position_ledger import get_ledger, use_history_file
 from services.binance_api import BinanceAPI
-from strategies.moving_average import moving_average_strategy
-from strategies.rsi import rsi_strategy
-from strategies.macd import macd_strategy
-from strategies.bollinger_bands import bollinger_strategy
-from strategies.trading_logic import TradingLogic
+from services.depth_stream import WebsocketDepthSource
+from services.exchange_recorder import META, ExchangeJournal, ExchangeReplay, RecordingKlineSource
+from services.exchange_simulator import ReplayFinished
+from services.kline_stream import create_kline_source
+from services.order_engine import OrderEngine, WebsocketUserDataSource
 from services.order_manager import OrderManager
-from services.market_analysis import initial_market_analysis
-from data.transaction_handler import record_transaction, calculate_profit
-import pandas as pd
+from services.multi_symbol_runner import MultiSymbolRunner
+import asyncio
+import os
+import sys
+import tempfile
 import time
+from utils.config import (CANDLE_STORE_DIR, EXCHANGE_JOURNAL, METRICS_PORT, ORDER_BOOK_ENABLED, RISK_LIMITS,
+                          STATE_SNAPSHOT_DIR, TRADE_SYMBOLS)
 from utils.logger import main_logger
+from utils.metrics import start_metrics_server
+from utils.rate_limiter import WeightRateLimiter
+
+def strategy_params():
+    """Parámetros de la estrategia (compartidos por la sesión en vivo y la reproducción)."""
+    return dict(
+        short_window=5,  # Ventana para SMA corta
+        long_window=10,  # Ventana para SMA larga
+        rsi_window=14,  # Ventana para RSI
+        fee_rate=0.001,  # Tasa de comisión
+        precision=4,  # Precisión por defecto (se sustituye por el LOT_SIZE de cada par)
+        min_notional=10,  # Valor mínimo notional por defecto
+        percentage=0.7,  # Porcentaje del saldo a usar (actualizado a 0.7)
+        min_margin=0.003,  # Margen mínimo esperado ajustado
+        min_rsi=35,
+        max_rsi=75,
+        max_slippage_bps=10,  # Deslizamiento máximo esperado según el libro de órdenes local
+        timeframes=('5m', '15m', '1h', '4h'),  # Intervalos superiores construidos desde las velas de 1m
+    )
 
 def main():
-    symbol = "ETHUSDT"
+    symbols = TRADE_SYMBOLS  # Pares a operar (ver utils/config.py)
     interval = "1m"  # Intervalo para datos históricos
-    short_window = 5  # Ventana para SMA corta
-    long_window = 10  # Ventana para SMA larga
-    rsi_window = 14  # Ventana para RSI
-    fee_rate = 0.001  # Tasa de comisión
-    precision = 4  # Precisión para ETH/USDT
-    min_notional = 10  # Valor mínimo notional
-    percentage = 0.7  # Porcentaje del saldo a usar (actualizado a 0.7)
-    min_margin = 0.003  # Margen mínimo esperado ajustado
     is_simulation = False  # Activar el modo simulado
 
     main_logger.info("Iniciando el bot de trading... (Simulación)" if is_simulation else "Iniciando el bot de trading...")
 
-    api = BinanceAPI()
-    order_manager = OrderManager()
-    simulated_balance = {"USDT": 1000, "ETH": 0}  # Balance inicial para simulaciones
-
-    market_data = initial_market_analysis(api, symbol, interval)
-    if market_data is None:
-        main_logger.error("No se pudo obtener datos del mercado. Finalizando el bot.")
-        return
-
-    while True:
+    # Métricas de latencia por etapa en http://127.0.0.1:<METRICS_PORT>/metrics
+    if METRICS_PORT:
         try:
-            # Obtén datos históricos
-            candles = api.client.get_klines(symbol=symbol, interval=interval, limit=100)
-            df = pd.DataFrame(candles, columns=['OpenTime', 'Open', 'High', 'Low', 'Close', 'Volume',
-                                                'CloseTime', 'QuoteAssetVolume', 'Trades',
-                                                'TBBAV', 'TBQAV', 'Ignore'])
-            df['Close'] = df['Close'].astype(float)
-
-            # Aplica estrategias
-            df = moving_average_strategy(df, short_window, long_window)
-            df = rsi_strategy(df, rsi_window)
-            df = macd_strategy(df)
-            df = bollinger_strategy(df)
-
-            # Datos recientes
-            latest_price = df['Close'].iloc[-1]
-            lower_band = df['Lower_Band'].iloc[-1]
-            upper_band = df['Upper_Band'].iloc[-1]
-            rsi = df['RSI'].iloc[-1]
-            macd = df['MACD'].iloc[-1]
-            signal_line = df['Signal_Line'].iloc[-1]
-
-            # Registrar los datos técnicos más recientes
-            main_logger.info(
-                f"Último precio: {latest_price:.2f}, SMA_Corta: {df['SMA_Short'].iloc[-1]:.2f}, "
-                f"SMA_Larga: {df['SMA_Long'].iloc[-1]:.2f}, RSI: {rsi:.2f}, MACD: {macd:.2f}, "
-                f"Signal_Line: {signal_line:.2f}, Upper_Band: {upper_band:.2f}, Lower_Band: {lower_band:.2f}"
-            )
-
-            # Saldo (simulado o real)
-            balances = simulated_balance if is_simulation else api.get_account_balance()
-            usdt_balance = balances.get('USDT', 0)
-            eth_balance = balances.get('ETH', 0)
-
-            # Log de los saldos actuales
-            main_logger.info(
-                f"Saldo actual: USDT: {usdt_balance:.2f}, ETH: {eth_balance:.4f}"
-            )
-
-            if usdt_balance == 0 and eth_balance == 0:
-                main_logger.warning("No hay saldo disponible para operar. Esperando próxima iteración.")
-                time.sleep(60)
-                continue
-
-            # Cantidades dinámicas
-            quantity_buy = TradingLogic.calculate_operable_quantity(
-                usdt_balance, latest_price, fee_rate, precision, min_notional, percentage
-            )
-            quantity_sell = TradingLogic.calculate_operable_quantity(
-                eth_balance * latest_price, latest_price, fee_rate, precision, min_notional, percentage
-            )
-
-            # Costo promedio
-            cost_avg = None
-            if eth_balance > 0:
-                cost_avg = calculate_profit(symbol, eth_balance, latest_price) / eth_balance
-
-            # Simulación de compra
-            if TradingLogic.should_buy(latest_price, lower_band, rsi, min_rsi=35) and quantity_buy > 0:  # Ajuste en el umbral de RSI
-                if is_simulation:
-                    main_logger.info(f"🔔 ¡Simulación de COMPRA! {quantity_buy} ETH a {latest_price:.2f}")
-                    simulated_balance["USDT"] -= quantity_buy * latest_price
-                    simulated_balance["ETH"] += quantity_buy
-                else:
-                    main_logger.info(f"🔔 ¡Alerta de COMPRA detectada! {quantity_buy} ETH a {latest_price:.2f}")
-                    response = order_manager.place_market_order(symbol, 'BUY', quantity_buy)
-                    if response:
-                        record_transaction('BUY', symbol, quantity_buy, latest_price, quantity_buy * latest_price, response['orderId'])
-
-            # Simulación de venta
-            elif cost_avg is not None and TradingLogic.should_sell(
-                latest_price, cost_avg, upper_band, macd, signal_line, fee_rate, min_margin, max_rsi=75
-            ) and quantity_sell > 0:
-                if is_simulation:
-                    main_logger.info(f"🔔 ¡Simulación de VENTA! {quantity_sell} ETH a {latest_price:.2f}")
-                    simulated_balance["USDT"] += quantity_sell * latest_price
-                    simulated_balance["ETH"] -= quantity_sell
-                else:
-                    main_logger.info(f"🔔 ¡Alerta de VENTA detectada! {quantity_sell} ETH a {latest_price:.2f}")
-                    response = order_manager.place_market_order(symbol, 'SELL', quantity_sell)
-                    if response:
-                        record_transaction('SELL', symbol, quantity_sell, latest_price, quantity_sell * latest_price, response['orderId'])
-
-            else:
-                main_logger.info("Sin señales claras en este momento.")
-
-            # Balance actual
-            if is_simulation:
-                main_logger.info(f"Saldo simulado: USDT: {simulated_balance['USDT']:.2f}, ETH: {simulated_balance['ETH']:.4f}")
-
-            time.sleep(60)
-
-        except Exception as e:
-            main_logger.error(f"Error en el bot: {e}")
-            time.sleep(10)  # Reintento tras error
+            start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            # Puerto ocupado o sin permisos: se opera igualmente, solo sin el endpoint de métricas
+            main_logger.warning(f"No se pudo iniciar el servidor de métricas en el puerto {METRICS_PORT}; "
+                                f"se continúa sin él: {e}")
+
+    # Grabación de peticiones, respuestas y eventos del stream para poder reproducir la sesión
+    journal = None
+    if EXCHANGE_JOURNAL:
+        journal = ExchangeJournal(time.strftime(EXCHANGE_JOURNAL))
+        # Las posiciones abiertas al empezar permiten reproducir el PnL sin el historial real
+        journal.write(META, symbols=symbols, interval=interval, params=strategy_params(),
+                      order_book=ORDER_BOOK_ENABLED, risk_limits=RISK_LIMITS,
+                      positions={} if is_simulation else get_ledger().state())
+        main_logger.info(f"Grabando la E/S con el exchange en {journal.path}.")
+
+    # Un único cliente (pool de conexiones + limitador de peso) compartido por todos los pares
+    api = BinanceAPI(journal=journal)
+    # Las órdenes límite, cancelaciones y OCO se siguen con el motor de órdenes y el stream de datos de usuario
+    engine = None if is_simulation else OrderEngine(api, prefix="bot")
+    order_manager = OrderManager(api, engine=engine)
+    user_data_source = WebsocketUserDataSource(api.client) if engine is not None else None
+
+    source = create_kline_source(api.client, symbols, interval)
+    depth_source = WebsocketDepthSource(symbols) if ORDER_BOOK_ENABLED else None
+    if journal is not None:
+        source = RecordingKlineSource(source, journal)
+        if depth_source is not None:
+            depth_source = RecordingKlineSource(depth_source, journal)
+
+    # Las decisiones se toman al cerrar cada vela, según llegan por el stream; el estado de cada
+    # par se reanuda desde su última instantánea y solo se descargan las velas que faltan
+    runner = MultiSymbolRunner(
+        api, order_manager, symbols, interval=interval, source=source,
+        is_simulation=is_simulation, snapshot_dir=STATE_SNAPSHOT_DIR, candle_store_dir=CANDLE_STORE_DIR,
+        depth_source=depth_source, risk_limits=RISK_LIMITS, user_data_source=user_data_source, **strategy_params()
+    )
+
+    try:
+        asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        main_logger.info("Bot detenido por el usuario.")
+    finally:
+        if journal is not None:
+            journal.close()
+
+def replay(path):
+    """
+    Reproduce una sesión grabada a velocidad de CPU, con las esperas
+    virtualizadas. Las transacciones van a un historial temporal que parte de
+    las posiciones grabadas al iniciar la sesión: el historial real no se toca
+    y el resultado no depende de él.
+    """
+    session = ExchangeReplay(path)
+    history_file = os.path.join(tempfile.mkdtemp(prefix="replay-"), "transaction_history.csv")
+    use_history_file(history_file)
+    get_ledger().restore(session.meta.get('positions', {}))
+
+    symbols = session.meta.get('symbols', TRADE_SYMBOLS)
+    interval = session.meta.get('interval', "1m")
+    params = {**strategy_params(), **session.meta.get('params', {})}
+
+    api = BinanceAPI(client=session.client, rate_limiter=WeightRateLimiter(max_weight=1e12))
+    runner = MultiSymbolRunner(
+        api, OrderManager(api), symbols, interval=interval, source=session.source(symbols, interval),
+        clock=session.clock.time, sleep=session.clock.sleep,
+        use_order_books=session.meta.get('order_book', False), risk_limits=session.meta.get('risk_limits'), **params
+    )
+    start = time.perf_counter()
+    try:
+        asyncio.run(runner.run())
+    except ReplayFinished:
+        pass
+    main_logger.info(f"Reproducción de {path} completada en {time.perf_counter() - start:.2f}s "
+                     f"({session.client.mismatches} discrepancias con la sesión grabada); "
+                     f"transacciones en {history_file}.")
 
 if __name__ == "__main__":
-    main()
-
-
-
-
-
-
-
-
-
-
+    if len(sys.argv) == 3 and sys.argv[1] == "--replay":
+        replay(sys.argv[2])
+    else:
+        main()
@@ -1,9 +1,45 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import requests
 from binance.client import Client
+from requests.adapters import HTTPAdapter
 from utils.config import API_KEY, SECRET_KEY
+from services.exchange_recorder import RecordingClient
+from utils.rate_limiter import WeightRateLimiter, RateLimitedClient, install_weight_tracking
 
 class BinanceAPI:
-    def __init__(self):
-        self.client = Client(API_KEY, SECRET_KEY)
+    def __init__(self, client=None, rate_limiter=None, pool_size=50, journal=None, order_threads=4):
+        """
+        Punto central de acceso al exchange: una sesión HTTP con pool de
+        conexiones, un limitador de peso compartido (sincronizado con las
+        cabeceras de peso de Binance) y un pool de hilos propio para las
+        órdenes, que así nunca esperan detrás de descargas de datos.
+
+        Args:
+            client: Cliente ya creado (p. ej. para compartirlo); por defecto se crea uno.
+            rate_limiter (WeightRateLimiter, opcional): Limitador de peso compartido.
+            pool_size (int, opcional): Conexiones HTTP reutilizables en el pool de la sesión.
+            journal (ExchangeJournal, opcional): Graba cada petición y respuesta para reproducirla después.
+            order_threads (int, opcional): Hilos reservados para enviar y cancelar órdenes.
+        """
+        if client is None:
+            client = Client(API_KEY, SECRET_KEY)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            client.session.mount('https://', adapter)
+        self.rate_limiter = rate_limiter or WeightRateLimiter()
+        session = getattr(client, 'session', None)
+        if isinstance(session, requests.Session):
+            install_weight_tracking(session, self.rate_limiter)
+        if journal is not None:
+            client = RecordingClient(client, journal)
+        self.client = RateLimitedClient(client, self.rate_limiter, max_data_in_flight=max(pool_size - order_threads, 1))
+        self.order_executor = ThreadPoolExecutor(max_workers=order_threads, thread_name_prefix="orders")
+
+    async def run_order(self, func, *args, **kwargs):
+        """Ejecuta una llamada de órdenes (bloqueante) en el pool de hilos reservado para órdenes."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.order_executor, functools.partial(func, *args, **kwargs))
 
     def get_account_balance(self):
         """Consulta los balances disponibles en la cuenta."""
@@ -16,10 +52,12 @@ class BinanceAPI:
         ticker = self.client.get_ticker(symbol=symbol)
         return float(ticker['lastPrice'])
 
-    def place_order(self, symbol, side, quantity):
-        """Coloca una orden de mercado."""
+    def place_order(self, symbol, side, quantity, client_order_id=None):
+        """Coloca una orden de mercado (con `client_order_id` como `newClientOrderId` si se indica)."""
+        params = {'newClientOrderId': client_order_id} if client_order_id else {}
         return self.client.order_market(
             symbol=symbol,
             side=side,
-            quantity=quantity
+            quantity=quantity,
+            **params
         )
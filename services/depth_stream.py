@@ -0,0 +1,88 @@
+import asyncio
+from data.order_book import OrderBook
+from services.kline_stream import BINANCE_WS_URL, WebsocketKlineSource
+from utils.logger import main_logger
+from utils.metrics import metrics
+
+
+class WebsocketDepthSource(WebsocketKlineSource):
+    """
+    Stream combinado de actualizaciones diferenciales de profundidad
+    (`<symbol>@depth@100ms`) para varios símbolos en una sola conexión.
+    Tras una reconexión, el hueco de secuencia hace que cada libro se
+    resincronice solo.
+    """
+
+    stream_name = "profundidad"
+
+    def __init__(self, symbols, speed="100ms", url=BINANCE_WS_URL, max_backoff=30):
+        self.speed = speed
+        super().__init__(symbols, None, url=url, max_backoff=max_backoff)
+
+    def _streams(self):
+        return [f"{symbol.lower()}@depth@{self.speed}" for symbol in self.symbols]
+
+
+class OrderBookManager:
+    """
+    Mantiene un `OrderBook` por símbolo a partir de una fuente de eventos de
+    profundidad (websocket, cola en memoria o una sesión grabada).
+
+    Las instantáneas se piden por REST solo al arrancar y tras un hueco de
+    secuencia, en segundo plano: mientras llega, el libro guarda las
+    actualizaciones y aparece como no sincronizado.
+
+    Args:
+        client: Cliente con `get_order_book` (normalmente el `RateLimitedClient` compartido).
+        symbols (list): Símbolos con libro local.
+        limit (int): Niveles por lado de cada instantánea.
+        retry_delay (float): Espera antes de pedir otra instantánea si la anterior no sirvió.
+    """
+
+    def __init__(self, client, symbols, limit=1000, retry_delay=1.0, sleep=asyncio.sleep):
+        self.client = client
+        self.limit = limit
+        self.retry_delay = retry_delay
+        self.sleep = sleep
+        self.books = {symbol: OrderBook(symbol) for symbol in symbols}
+        self._resyncs = {}
+
+    def on_event(self, event):
+        """Aplica un evento `depthUpdate` y, si el libro lo necesita, pide una instantánea en segundo plano."""
+        if event.get('e') != 'depthUpdate':
+            return
+        book = self.books.get(event.get('s'))
+        if book is None:
+            return
+        book.apply_diff(event)
+        if book.needs_snapshot and book.symbol not in self._resyncs:
+            self._resyncs[book.symbol] = asyncio.create_task(self._resync(book))
+
+    async def run(self, source):
+        """Aplica los eventos de `source` hasta que termine."""
+        try:
+            async for event in source.events():
+                self.on_event(event)
+        finally:
+            self.close()
+
+    def close(self):
+        for task in list(self._resyncs.values()):
+            task.cancel()
+
+    async def _resync(self, book):
+        try:
+            while True:
+                try:
+                    snapshot = await asyncio.to_thread(self.client.get_order_book, symbol=book.symbol,
+                                                       limit=self.limit)
+                    if book.apply_snapshot(snapshot):
+                        main_logger.info(f"Libro de órdenes de {book.symbol} sincronizado "
+                                         f"({len(book.bids)} compras, {len(book.asks)} ventas).")
+                        return
+                except Exception as e:
+                    metrics.inc('errors', component='order_book')
+                    main_logger.error(f"Error al obtener la instantánea del libro de {book.symbol}: {e}")
+                await self.sleep(self.retry_delay)
+        finally:
+            self._resyncs.pop(book.symbol, None)
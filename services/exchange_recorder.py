@@ -0,0 +1,333 @@
+import asyncio
+import atexit
+import gzip
+import heapq
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from services.exchange_simulator import ReplayFinished
+from utils.logger import main_logger
+
+# Tipos de registro del diario
+CALL, EVENT, META = 'call', 'event', 'meta'
+
+
+class ExchangeJournal:
+    """
+    Diario comprimido (JSON lines en gzip) de la E/S con el exchange.
+
+    Solo admite añadir: cada lote se escribe desde un hilo en segundo plano y
+    se vuelca con un flush de gzip, de modo que el archivo es legible hasta el
+    último lote aunque el proceso termine de forma abrupta. Si el archivo ya
+    existe, la nueva sesión se añade como otro miembro gzip. `clock` da la
+    marca de tiempo de cada registro (el reloj del mercado que usa el bot).
+    """
+
+    def __init__(self, path, flush_interval=1.0, clock=time.time):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._queue = queue.SimpleQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"exchange-journal:{os.path.basename(path)}",
+                                        daemon=True)
+        self._thread.start()
+        _journals.append(self)
+
+    def write(self, kind, **fields):
+        """Encola un registro con número de secuencia y marca de tiempo (segundos)."""
+        with self._lock:
+            record = {'seq': next(self._sequence), 't': self.clock(), 'kind': kind, **fields}
+            self._queue.put(record)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            lines = [json.dumps(record, ensure_ascii=False, default=str) for record in batch if record is not None]
+            if lines:
+                self._file.write("\n".join(lines) + "\n")
+                self._file.flush()
+            if stop:
+                return
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+_journals = []
+
+
+@atexit.register
+def _close_journals():
+    for journal in _journals:
+        journal.close()
+    _journals.clear()
+
+
+def read_journal(path):
+    """Lee los registros de un diario en orden de escritura (tolera una última línea truncada)."""
+    records = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break  # Escritura interrumpida al final del archivo
+        except EOFError:
+            pass  # Último miembro gzip incompleto
+    return records
+
+
+class RecordingClient:
+    """
+    Envoltorio de `binance.client.Client` que registra cada llamada (método,
+    argumentos, respuesta o error, duración) en un `ExchangeJournal`.
+    """
+
+    def __init__(self, client, journal):
+        self._client = client
+        self._journal = journal
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+
+        def recorded(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as e:
+                self._journal.write(CALL, method=name, args=args, kwargs=kwargs,
+                                    duration=time.perf_counter() - start,
+                                    error={'type': type(e).__name__, 'code': getattr(e, 'code', None),
+                                           'message': getattr(e, 'message', str(e))})
+                raise
+            self._journal.write(CALL, method=name, args=args, kwargs=kwargs,
+                                duration=time.perf_counter() - start, result=result)
+            return result
+        return recorded
+
+
+class RecordingKlineSource:
+    """Fuente de velas que registra cada evento recibido antes de entregarlo."""
+
+    def __init__(self, source, journal):
+        self.source = source
+        self.journal = journal
+
+    async def events(self):
+        async for event in self.source.events():
+            self.journal.write(EVENT, event=event)
+            yield event
+
+
+class ReplayedAPIError(Exception):
+    """Error registrado durante la sesión original, relanzado al reproducirla."""
+
+    def __init__(self, code, message):
+        super().__init__(f"APIError(code={code}): {message}")
+        self.code = code
+        self.message = message
+
+
+class ReplayClock:
+    """
+    Reloj virtual de una reproducción.
+
+    El tiempo avanza con los registros que se consumen del diario (o con
+    `skip`, que usa la fuente que marca el ritmo); `sleep` espera a que el
+    tiempo virtual alcance su plazo sin esperar en tiempo real.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def advance(self, timestamp):
+        """Avanza el reloj (nunca retrocede). Puede llamarse desde cualquier hilo."""
+        if timestamp > self.now:
+            self.now = timestamp
+
+    def _wake(self):
+        while self._waiters and self._waiters[0][0] <= self.now:
+            future = heapq.heappop(self._waiters)[2]
+            if not future.done():
+                future.set_result(None)
+
+    async def sleep(self, seconds):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self.now + seconds, next(self._sequence), future))
+        self._wake()
+        await future
+
+    async def skip(self, seconds):
+        """Espera de la fuente que marca el ritmo: avanza el reloj en lugar de esperar."""
+        self.advance(self.now + seconds)
+        self._wake()
+        await asyncio.sleep(0)
+
+
+class ReplayClient:
+    """
+    Cliente que responde con las respuestas grabadas en un diario.
+
+    Cada método devuelve, en orden, las respuestas registradas para ese método
+    (y símbolo, ya que las consultas de varios símbolos se lanzan en paralelo);
+    los errores grabados se relanzan como `ReplayedAPIError`. Si los argumentos
+    no coinciden con los grabados (la lógica ya no toma las mismas decisiones)
+    se cuenta como discrepancia y se registra un aviso.
+    """
+
+    def __init__(self, records, clock=None):
+        self.clock = clock or ReplayClock(records[0]['t'] if records else 0.0)
+        self.calls = {}
+        for record in records:
+            if record['kind'] == CALL:
+                key = (record['method'], record['kwargs'].get('symbol'))
+                self.calls.setdefault(key, deque()).append(record)
+        self.mismatches = 0
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return not any(self.calls.values())
+
+    def pending(self, method, symbol=None):
+        """Respuestas grabadas que quedan por consumir para `method` (y `symbol`)."""
+        return len(self.calls.get((method, symbol), ()))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def replayed(*args, **kwargs):
+            with self.lock:
+                pending = self.calls.get((name, kwargs.get('symbol')))
+                if not pending:
+                    raise ReplayFinished(f"No quedan respuestas grabadas para {name}.")
+                record = pending.popleft()
+                if list(args) != record['args'] or json.loads(json.dumps(kwargs, default=str)) != record['kwargs']:
+                    self.mismatches += 1
+                    main_logger.warning(f"Reproducción: {name} llamado con {kwargs}, grabado con {record['kwargs']}.")
+            self.clock.advance(record['t'])
+            if 'error' in record:
+                raise ReplayedAPIError(record['error'].get('code'), record['error'].get('message'))
+            return record['result']
+        return replayed
+
+
+class ReplayKlineSource:
+    """Entrega los eventos de velas grabados, avanzando el reloj virtual a la hora de cada uno."""
+
+    def __init__(self, records, clock):
+        self.events_records = [record for record in records if record['kind'] == EVENT]
+        self.clock = clock
+
+    async def events(self):
+        for record in self.events_records:
+            self.clock.advance(record['t'])
+            self.clock._wake()
+            yield record['event']
+            await asyncio.sleep(0)  # Deja procesar el evento antes de avanzar el reloj
+
+
+class ExchangeReplay:
+    """
+    Reúne lo necesario para reproducir una sesión grabada: metadatos, reloj
+    virtual, cliente con las respuestas y fuente de velas (los eventos del
+    stream si se grabaron; si no, sondeo REST sobre las respuestas grabadas).
+    """
+
+    def __init__(self, path):
+        self.records = read_journal(path)
+        if not self.records:
+            raise ValueError(f"El diario {path} está vacío.")
+        self.meta = next((record for record in self.records if record['kind'] == META), {})
+        self.clock = ReplayClock(self.records[0]['t'])
+        self.client = ReplayClient(self.records, self.clock)
+
+    def source(self, symbols, interval):
+        if any(record['kind'] == EVENT for record in self.records):
+            return ReplayKlineSource(self.records, self.clock)
+        from services.kline_stream import PollingKlineSource
+
+        async def paced_sleep(seconds):
+            if not any(self.client.pending('get_klines', symbol) for symbol in symbols):
+                raise ReplayFinished("No quedan respuestas grabadas.")
+            await self.clock.skip(seconds)
+
+        return PollingKlineSource(self.client, symbols, interval, clock=self.clock.time, sleep=paced_sleep)
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import tempfile
+    from benchmarks.synthetic import synthetic_klines
+    from services.binance_api import BinanceAPI
+    from services.exchange_simulator import ExchangeSimulator
+    from services.multi_symbol_runner import MultiSymbolRunner
+    from services.order_manager import OrderManager
+    from utils.rate_limiter import WeightRateLimiter
+
+    os.chdir(tempfile.mkdtemp())
+    symbols = ['ETHUSDT']
+    path = os.path.join(os.getcwd(), 'session.jsonl.gz')
+
+    # Graba una sesión contra el simulador de exchange
+    exchange = ExchangeSimulator({'ETHUSDT': synthetic_klines(600)}, balances={'USDT': 1000.0})
+    clock = exchange.clock()
+    journal = ExchangeJournal(path, clock=clock.time)
+    journal.write(META, symbols=symbols, interval="1m")
+    api = BinanceAPI(client=RecordingClient(exchange, journal), rate_limiter=WeightRateLimiter(max_weight=1e12))
+    from services.kline_stream import PollingKlineSource
+    source = PollingKlineSource(api.client, symbols, "1m", clock=clock.time, sleep=clock.sleep)
+    # El simulador solo virtualiza la espera de la fuente: sin refrescos periódicos que dependan del tiempo real
+    runner = MultiSymbolRunner(api, OrderManager(api), symbols, source=source, clock=clock.time, min_notional=5,
+                               balance_refresh_seconds=1e9, report_seconds=1e9)
+    try:
+        asyncio.run(runner.run())
+    except ReplayFinished:
+        pass
+    journal.close()
+    print(f"Grabados {len(read_journal(path))} registros ({os.path.getsize(path)} bytes).")
+
+    # Reproduce la sesión a velocidad de CPU
+    replay = ExchangeReplay(path)
+    api = BinanceAPI(client=replay.client, rate_limiter=WeightRateLimiter(max_weight=1e12))
+    runner = MultiSymbolRunner(api, OrderManager(api), symbols, source=replay.source(symbols, "1m"),
+                               clock=replay.clock.time, sleep=replay.clock.sleep, min_notional=5,
+                               balance_refresh_seconds=1e9, report_seconds=1e9)
+    start = time.perf_counter()
+    try:
+        asyncio.run(runner.run())
+    except ReplayFinished:
+        pass
+    print(f"Reproducción en {time.perf_counter() - start:.2f}s; discrepancias: {replay.client.mismatches}")
@@ -0,0 +1,631 @@
+import asyncio
+import bisect
+import itertools
+import random
+import threading
+import time
+from decimal import Decimal
+import numpy as np
+from data.kline_cache import interval_to_ms
+from data.kline_parser import parse_klines
+
+QUOTE_ASSETS = ('USDT', 'USDC', 'FDUSD', 'BUSD', 'BTC', 'ETH', 'BNB')
+DEFAULT_FILTERS = {'step_size': '0.00001', 'tick_size': '0.01', 'min_notional': 5.0}
+
+
+class SimulatedExchangeError(Exception):
+    """Error con el mismo `code`/`message` que las respuestas de error de Binance."""
+
+    def __init__(self, code, message):
+        super().__init__(f"APIError(code={code}): {message}")
+        self.code = code
+        self.message = message
+
+
+class ReplayFinished(Exception):
+    """El reloj virtual ha llegado al final de las velas disponibles."""
+
+
+class LatencyModel:
+    """
+    Latencia de ida de cada petición (ms): normal con media `mean_ms` y
+    desviación `jitter_ms`, truncada en 0. La orden se ejecuta con el precio
+    vigente al llegar al exchange, no al enviarla.
+    """
+
+    def __init__(self, mean_ms=50.0, jitter_ms=20.0, seed=None):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+
+    def sample(self):
+        if not self.jitter_ms:
+            return max(self.mean_ms, 0.0)
+        return max(self.random.gauss(self.mean_ms, self.jitter_ms), 0.0)
+
+
+class VirtualClock:
+    """
+    Reloj virtual del simulador, compatible con los parámetros `clock` y
+    `sleep` de `PollingKlineSource` y `TradingRuntime`.
+
+    `sleep` avanza el tiempo del exchange (y casa las órdenes de las velas que
+    cierran entretanto) sin esperar; con `speed` se espera el tiempo real
+    equivalente (p. ej. `speed=1000` ejecuta 1000 veces más rápido).
+    """
+
+    def __init__(self, exchange, speed=None):
+        self.exchange = exchange
+        self.speed = speed
+
+    def time(self):
+        return self.exchange.now_ms / 1000
+
+    async def sleep(self, seconds):
+        if self.exchange.finished:
+            raise ReplayFinished("No quedan velas por reproducir.")
+        self.exchange.advance(self.exchange.now_ms + seconds * 1000)
+        await asyncio.sleep(seconds / self.speed if self.speed else 0)
+
+
+class _Order:
+    __slots__ = ('order_id', 'client_order_id', 'symbol', 'side', 'type', 'price', 'stop_price',
+                 'quantity', 'executed', 'quote', 'commission', 'status', 'time', 'update_time',
+                 'sequence', 'locked', 'list_id')
+
+    def to_response(self, fills=None):
+        response = {
+            'symbol': self.symbol, 'orderId': self.order_id, 'clientOrderId': self.client_order_id,
+            'transactTime': self.update_time, 'price': f"{self.price or 0:.8f}",
+            'origQty': f"{self.quantity:.8f}", 'executedQty': f"{self.executed:.8f}",
+            'cummulativeQuoteQty': f"{self.quote:.8f}", 'status': self.status,
+            'timeInForce': 'GTC', 'type': self.type, 'side': self.side, 'orderListId': self.list_id,
+        }
+        if self.stop_price:
+            response['stopPrice'] = f"{self.stop_price:.8f}"
+        if fills is not None:
+            response['fills'] = fills
+        return response
+
+
+class ExchangeSimulator:
+    """
+    Exchange en memoria que implementa el subconjunto de `binance.client.Client`
+    que usa el bot, para ejecutarlo sin red con `BinanceAPI(client=simulador)`.
+
+    El mercado se reproduce a partir de velas históricas; el tiempo es virtual
+    (ver `VirtualClock`). Las órdenes límite reposan en un libro por símbolo
+    con prioridad precio-tiempo y se casan con cada vela que cierra: una
+    compra se ejecuta si el mínimo de la vela alcanza su precio, una venta si
+    lo alcanza el máximo, repartiendo entre las órdenes (en orden de
+    prioridad) como mucho `participation` del volumen de la vela. Las órdenes
+    stop se activan de la misma forma y pasan al libro como límite.
+
+    Las órdenes de mercado se ejecutan al último cierre disponible al llegar la
+    petición (según `latency`) más un deslizamiento fijo (`slippage_bps`) y un
+    impacto proporcional al tamaño respecto al volumen de la vela
+    (`impact_bps`). Las comisiones se cobran en el activo recibido, como en
+    Binance: `fee_rate` para órdenes que toman liquidez, `maker_fee_rate` para
+    las que reposan en el libro.
+
+    Cada cambio de una orden se notifica a los `listeners` con un evento
+    `executionReport` como los del stream de datos de usuario (útil para
+    probar la reconciliación de órdenes sin consultar el exchange). Admite
+    además OCO (`create_oco_order`: una orden límite y un stop; al ejecutarse
+    o activarse una, se cancela la otra) y `cancel_replace_order`.
+
+    Args:
+        klines (dict): `{símbolo: filas de get_klines}` en orden cronológico.
+        interval (str): Intervalo de las velas.
+        balances (dict): Saldos iniciales por activo.
+        start_time (int, opcional): Tiempo virtual inicial (ms). Por defecto,
+            el cierre de la vela número `warmup_candles`.
+        filters (dict, opcional): `{símbolo: {'step_size', 'tick_size', 'min_notional'}}`.
+    """
+
+    def __init__(self, klines, interval="1m", balances=None, start_time=None, warmup_candles=100,
+                 fee_rate=0.001, maker_fee_rate=0.001, latency=None, slippage_bps=1.0, impact_bps=10.0,
+                 participation=0.1, filters=None):
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.fee_rate = fee_rate
+        self.maker_fee_rate = maker_fee_rate
+        self.latency = latency or LatencyModel(0.0, 0.0)
+        self.slippage_bps = slippage_bps
+        self.impact_bps = impact_bps
+        self.participation = participation
+        self.lock = threading.RLock()
+
+        self.candles = {symbol: parse_klines(rows) for symbol, rows in klines.items()}
+        self.assets = {symbol: self._split_symbol(symbol) for symbol in self.candles}
+        self.filters = {symbol: {**DEFAULT_FILTERS, **(filters or {}).get(symbol, {})} for symbol in self.candles}
+        self.balances = {asset: [float(amount), 0.0] for asset, amount in (balances or {'USDT': 1000.0}).items()}
+
+        self.orders = {}
+        self.client_orders = {}
+        self.order_lists = {}
+        self.listeners = []  # Reciben cada `executionReport` (se llaman con el lock tomado)
+        self.books = {symbol: {'BUY': [], 'SELL': [], 'STOP': []} for symbol in self.candles}
+        self._order_ids = itertools.count(1)
+        self._list_ids = itertools.count(1)
+        self._sequence = itertools.count()
+
+        if start_time is None:
+            first = min(int(c['CloseTime'][min(warmup_candles, len(c['CloseTime'])) - 1])
+                        for c in self.candles.values())
+            start_time = first + 1
+        self.end_time = max(int(c['CloseTime'][-1]) for c in self.candles.values())
+        self.now_ms = int(start_time)
+        # Número de velas cerradas (ya casadas) por símbolo
+        self.closed = {symbol: self._closed_count(symbol, self.now_ms) for symbol in self.candles}
+
+    @classmethod
+    def from_store(cls, root, symbols, interval, start_time=None, end_time=None, **kwargs):
+        """Crea el simulador con velas de un `CandleStore` local."""
+        from data.candle_store import CandleStore
+
+        klines = {symbol: CandleStore(root, symbol, interval).klines(start_time, end_time) for symbol in symbols}
+        return cls(klines, interval, **kwargs)
+
+    def clock(self, speed=None):
+        return VirtualClock(self, speed)
+
+    @property
+    def finished(self):
+        return self.now_ms > self.end_time
+
+    @staticmethod
+    def _split_symbol(symbol):
+        for quote in QUOTE_ASSETS:
+            if symbol.endswith(quote) and len(symbol) > len(quote):
+                return symbol[:-len(quote)], quote
+        raise ValueError(f"No se reconoce el activo cotizado de {symbol}.")
+
+    def _closed_count(self, symbol, time_ms):
+        return int(np.searchsorted(self.candles[symbol]['CloseTime'], time_ms, side='right'))
+
+    def _price(self, symbol, time_ms):
+        """Último cierre conocido en `time_ms` (apertura de la primera vela si aún no cerró ninguna)."""
+        candles = self.candles[symbol]
+        index = self._closed_count(symbol, time_ms)
+        return float(candles['Close'][index - 1]) if index else float(candles['Open'][0])
+
+    # --- Tiempo ---------------------------------------------------------------
+
+    def advance(self, time_ms):
+        """Avanza el reloj virtual y casa las órdenes con las velas que cierran hasta `time_ms`."""
+        with self.lock:
+            time_ms = int(time_ms)
+            if time_ms <= self.now_ms:
+                return
+            for symbol, book in self.books.items():
+                closed = self._closed_count(symbol, time_ms)
+                if book['BUY'] or book['SELL'] or book['STOP']:
+                    for index in range(self.closed[symbol], closed):
+                        self._match_candle(symbol, index)
+                self.closed[symbol] = closed
+            self.now_ms = time_ms
+
+    def _match_candle(self, symbol, index):
+        candles = self.candles[symbol]
+        open_, high, low = candles['Open'][index], candles['High'][index], candles['Low'][index]
+        close_time = int(candles['CloseTime'][index])
+        book = self.books[symbol]
+
+        # Órdenes stop activadas por el rango de la vela, en orden de llegada
+        for order in [o for o in book['STOP'] if self._stop_triggered(o, high, low)]:
+            if order.status not in ('NEW', 'PARTIALLY_FILLED'):
+                continue  # Cancelada al activarse la otra orden de su OCO
+            book['STOP'].remove(order)
+            if order.list_id != -1:
+                # OCO: al activarse el stop se cancela la orden límite y el bloqueo pasa al stop
+                self._cancel_siblings(order, close_time)
+                try:
+                    self._lock(order)
+                except SimulatedExchangeError:
+                    order.status = 'EXPIRED'
+                    order.update_time = close_time
+                    self._report(order, 'EXPIRED')
+                    continue
+            self._rest(order)
+
+        available = candles['Volume'][index] * self.participation if self.participation else float('inf')
+        for side in ('BUY', 'SELL'):
+            levels = book[side]
+            while levels and available > 0:
+                order = levels[0][1]
+                if (side == 'BUY' and low > order.price) or (side == 'SELL' and high < order.price):
+                    break  # El resto del libro tiene peor precio
+                # Si la vela abre ya más allá del límite, se ejecuta a la apertura
+                price = min(order.price, open_) if side == 'BUY' else max(order.price, open_)
+                quantity = min(order.quantity - order.executed, available)
+                self._fill(order, quantity, price, self.maker_fee_rate, close_time)
+                available -= quantity
+                if order.status == 'FILLED':
+                    levels.pop(0)
+
+    @staticmethod
+    def _stop_triggered(order, high, low):
+        falling = (order.side == 'SELL') == (order.type == 'STOP_LOSS_LIMIT')
+        return low <= order.stop_price if falling else high >= order.stop_price
+
+    # --- Saldos ---------------------------------------------------------------
+
+    def _balance(self, asset):
+        return self.balances.setdefault(asset, [0.0, 0.0])
+
+    def _lock(self, order):
+        base, quote = self.assets[order.symbol]
+        asset, amount = (quote, order.quantity * order.price) if order.side == 'BUY' else (base, order.quantity)
+        balance = self._balance(asset)
+        if balance[0] + 1e-12 < amount:
+            raise SimulatedExchangeError(-2010, "Account has insufficient balance for requested action.")
+        balance[0] -= amount
+        balance[1] += amount
+        order.locked = amount
+
+    def _release(self, order):
+        base, quote = self.assets[order.symbol]
+        balance = self._balance(quote if order.side == 'BUY' else base)
+        balance[0] += order.locked
+        balance[1] -= order.locked
+        order.locked = 0.0
+
+    def _fill(self, order, quantity, price, fee_rate, time_ms):
+        """Aplica una ejecución parcial o total a saldos y orden; devuelve el `fill` de la respuesta."""
+        base, quote = self.assets[order.symbol]
+        notional = quantity * price
+        if order.side == 'BUY':
+            spent, received, received_amount = quote, base, quantity
+            cost = notional
+        else:
+            spent, received, received_amount = base, quote, notional
+            cost = quantity
+        commission = received_amount * fee_rate
+
+        spend_balance = self._balance(spent)
+        if order.locked:
+            # Las órdenes en libro pagan con lo bloqueado; el sobrante de una compra mejorada vuelve a libre
+            reserved = quantity * order.price if order.side == 'BUY' else quantity
+            spend_balance[1] -= reserved
+            spend_balance[0] += reserved - cost
+            order.locked -= reserved
+        else:
+            spend_balance[0] -= cost
+        self._balance(received)[0] += received_amount - commission
+
+        order.executed += quantity
+        order.quote += notional
+        order.commission += commission
+        order.update_time = time_ms
+        if order.quantity - order.executed <= 1e-12:
+            order.status = 'FILLED'
+            if order.locked:
+                self._release(order)
+        else:
+            order.status = 'PARTIALLY_FILLED'
+        self._report(order, 'TRADE', quantity, price, commission, received)
+        if order.list_id != -1:
+            self._cancel_siblings(order, time_ms)
+        return {'price': f"{price:.8f}", 'qty': f"{quantity:.8f}", 'commission': f"{commission:.8f}",
+                'commissionAsset': received}
+
+    def _report(self, order, execution, last_quantity=0.0, last_price=0.0, commission=0.0,
+                commission_asset=None, cancel_client_order_id=None):
+        """Notifica a los `listeners` un `executionReport` con el estado actual de `order`."""
+        if not self.listeners:
+            return
+        event = {
+            'e': 'executionReport', 'E': self.now_ms, 's': order.symbol,
+            'c': cancel_client_order_id or order.client_order_id, 'S': order.side, 'o': order.type,
+            'f': 'GTC', 'q': f"{order.quantity:.8f}", 'p': f"{order.price or 0:.8f}",
+            'P': f"{order.stop_price or 0:.8f}", 'g': order.list_id,
+            'C': order.client_order_id if cancel_client_order_id else "", 'x': execution, 'X': order.status,
+            'r': 'NONE', 'i': order.order_id, 'l': f"{last_quantity:.8f}", 'z': f"{order.executed:.8f}",
+            'L': f"{last_price:.8f}", 'n': f"{commission:.8f}", 'N': commission_asset, 'T': order.update_time,
+            'O': order.time, 'Z': f"{order.quote:.8f}",
+        }
+        for listener in self.listeners:
+            listener(event)
+
+    # --- Órdenes --------------------------------------------------------------
+
+    def _validate(self, symbol, quantity, price):
+        if symbol not in self.candles:
+            raise SimulatedExchangeError(-1121, "Invalid symbol.")
+        filters = self.filters[symbol]
+        step = Decimal(str(filters['step_size']))
+        if quantity <= 0 or Decimal(str(quantity)) % step != 0:
+            raise SimulatedExchangeError(-1013, "Filter failure: LOT_SIZE")
+        if quantity * price < filters['min_notional']:
+            raise SimulatedExchangeError(-1013, "Filter failure: NOTIONAL")
+
+    def _new_order(self, symbol, side, order_type, quantity, price=None, stop_price=None, client_order_id=None):
+        arrival = self.now_ms + int(self.latency.sample())
+        order = _Order()
+        order.order_id = next(self._order_ids)
+        order.client_order_id = client_order_id or f"sim_{order.order_id}"
+        order.symbol = symbol
+        order.side = side
+        order.type = order_type
+        order.price = float(price) if price is not None else None
+        order.stop_price = float(stop_price) if stop_price is not None else None
+        order.quantity = float(quantity)
+        order.executed = order.quote = order.commission = order.locked = 0.0
+        order.status = 'NEW'
+        order.time = order.update_time = arrival
+        order.sequence = next(self._sequence)
+        order.list_id = -1
+        return order
+
+    def _store(self, order):
+        self.orders[order.order_id] = order
+        self.client_orders[order.client_order_id] = order
+
+    def _check_duplicate(self, client_order_id):
+        existing = self.client_orders.get(client_order_id)
+        if existing is not None and existing.status in ('NEW', 'PARTIALLY_FILLED'):
+            raise SimulatedExchangeError(-2010, "Duplicate order sent.")
+
+    def _market_price(self, symbol, side, quantity, time_ms):
+        price = self._price(symbol, time_ms)
+        index = max(self._closed_count(symbol, time_ms) - 1, 0)
+        volume = float(self.candles[symbol]['Volume'][index]) or 1.0
+        bps = self.slippage_bps + self.impact_bps * quantity / volume
+        return price * (1 + bps / 1e4) if side == 'BUY' else price * (1 - bps / 1e4)
+
+    def _execute_market(self, order):
+        price = self._market_price(order.symbol, order.side, order.quantity, order.time)
+        self._validate(order.symbol, order.quantity, price)
+        base, quote = self.assets[order.symbol]
+        needed, asset = (order.quantity * price, quote) if order.side == 'BUY' else (order.quantity, base)
+        if self._balance(asset)[0] + 1e-12 < needed:
+            raise SimulatedExchangeError(-2010, "Account has insufficient balance for requested action.")
+        self._store(order)
+        self._report(order, 'NEW')
+        fill = self._fill(order, order.quantity, price, self.fee_rate, order.time)
+        return order.to_response([fill])
+
+    def _rest(self, order):
+        """Coloca una orden límite en el libro (prioridad precio-tiempo)."""
+        levels = self.books[order.symbol][order.side]
+        key = (-order.price if order.side == 'BUY' else order.price, order.sequence)
+        bisect.insort(levels, (key, order), key=lambda level: level[0])
+
+    def _place_limit(self, order):
+        self._validate(order.symbol, order.quantity, order.price)
+        self._lock(order)
+        self._store(order)
+        self._report(order, 'NEW')
+        if order.type in ('STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT'):
+            self.books[order.symbol]['STOP'].append(order)
+            return order.to_response([])
+
+        fills = []
+        market = self._price(order.symbol, order.time)
+        if (order.side == 'BUY' and order.price >= market) or (order.side == 'SELL' and order.price <= market):
+            # Orden ejecutable al llegar: toma liquidez al precio de mercado
+            price = self._market_price(order.symbol, order.side, order.quantity, order.time)
+            price = min(price, order.price) if order.side == 'BUY' else max(price, order.price)
+            fills.append(self._fill(order, order.quantity, price, self.fee_rate, order.time))
+        if order.status != 'FILLED':
+            self._rest(order)
+        return order.to_response(fills)
+
+    def create_order(self, symbol, side, type, quantity, price=None, stopPrice=None, newClientOrderId=None,
+                     **params):
+        """Crea una orden MARKET, LIMIT, STOP_LOSS_LIMIT o TAKE_PROFIT_LIMIT."""
+        with self.lock:
+            if type != 'MARKET' and price is None:
+                raise SimulatedExchangeError(-1102, "Mandatory parameter 'price' was not sent.")
+            if type in ('STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT') and stopPrice is None:
+                raise SimulatedExchangeError(-1102, "Mandatory parameter 'stopPrice' was not sent.")
+            if type not in ('MARKET', 'LIMIT', 'STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT'):
+                raise SimulatedExchangeError(-1116, "Invalid orderType.")
+            self._check_duplicate(newClientOrderId)
+            order = self._new_order(symbol, side, type, quantity, price, stopPrice, newClientOrderId)
+            if type == 'MARKET':
+                return self._execute_market(order)
+            return self._place_limit(order)
+
+    def order_market(self, symbol, side, quantity, **params):
+        return self.create_order(symbol=symbol, side=side, type='MARKET', quantity=quantity, **params)
+
+    def order_limit(self, symbol, side, quantity, price, **params):
+        return self.create_order(symbol=symbol, side=side, type='LIMIT', quantity=quantity, price=price, **params)
+
+    def _find(self, symbol, orderId=None, origClientOrderId=None, code=-2011, message="Unknown order sent."):
+        order = self.orders.get(orderId)
+        if order is None and origClientOrderId is not None:
+            order = self.client_orders.get(origClientOrderId)
+        if order is None or order.symbol != symbol:
+            raise SimulatedExchangeError(code, message)
+        return order
+
+    def _cancel(self, order, time_ms, cancel_client_order_id=None):
+        """Retira una orden abierta del libro y libera su saldo bloqueado."""
+        book = self.books[order.symbol]
+        if order in book['STOP']:
+            book['STOP'].remove(order)
+        else:
+            # En el sitio: `_match_candle` puede estar recorriendo esta misma lista
+            levels = book[order.side]
+            levels[:] = [level for level in levels if level[1] is not order]
+        if order.locked:
+            self._release(order)
+        order.status = 'CANCELED'
+        order.update_time = time_ms
+        self._report(order, 'CANCELED', cancel_client_order_id=cancel_client_order_id or f"cancel_{order.order_id}")
+
+    def _cancel_siblings(self, order, time_ms):
+        for sibling in self.order_lists.get(order.list_id, ()):
+            if sibling is not order and sibling.status in ('NEW', 'PARTIALLY_FILLED'):
+                self._cancel(sibling, time_ms)
+
+    def cancel_order(self, symbol, orderId=None, origClientOrderId=None, newClientOrderId=None, **params):
+        """Cancela una orden abierta; si pertenece a una OCO, se cancela la lista entera."""
+        with self.lock:
+            order = self._find(symbol, orderId, origClientOrderId)
+            if order.status not in ('NEW', 'PARTIALLY_FILLED'):
+                raise SimulatedExchangeError(-2011, "Unknown order sent.")
+            self._cancel(order, self.now_ms, newClientOrderId)
+            if order.list_id != -1:
+                self._cancel_siblings(order, self.now_ms)
+            return order.to_response()
+
+    def cancel_replace_order(self, symbol, side, type, cancelReplaceMode='STOP_ON_FAILURE', quantity=None,
+                             price=None, cancelOrderId=None, cancelOrigClientOrderId=None, newClientOrderId=None,
+                             stopPrice=None, **params):
+        """
+        Cancela una orden y crea otra en la misma petición. Si falla la
+        cancelación no se crea la nueva (`STOP_ON_FAILURE`); si falla la nueva,
+        la cancelación se mantiene y se devuelve el error -2021.
+        """
+        with self.lock:
+            try:
+                canceled = self.cancel_order(symbol, orderId=cancelOrderId, origClientOrderId=cancelOrigClientOrderId)
+            except SimulatedExchangeError:
+                raise SimulatedExchangeError(-2022, "Order cancel-replace failed.")
+            try:
+                created = self.create_order(symbol, side, type, quantity, price=price, stopPrice=stopPrice,
+                                            newClientOrderId=newClientOrderId)
+            except SimulatedExchangeError:
+                raise SimulatedExchangeError(-2021, "Order cancel-replace partially failed.")
+            return {'cancelResult': 'SUCCESS', 'newOrderResult': 'SUCCESS', 'cancelResponse': canceled,
+                    'newOrderResponse': created}
+
+    def create_oco_order(self, symbol, side, quantity, price, stopPrice, stopLimitPrice=None, listClientOrderId=None,
+                         limitClientOrderId=None, stopClientOrderId=None, **params):
+        """
+        OCO: una orden LIMIT_MAKER a `price` y una STOP_LOSS_LIMIT activada en
+        `stopPrice` (límite `stopLimitPrice`) sobre la misma cantidad. El saldo
+        se bloquea una sola vez, en la orden límite, y pasa al stop si se activa.
+        """
+        with self.lock:
+            stop_limit = stopPrice if stopLimitPrice is None else stopLimitPrice
+            market = self._price(symbol, self.now_ms) if symbol in self.candles else None
+            if market is not None and not (
+                    (side == 'SELL' and float(price) > market > float(stopPrice)) or
+                    (side == 'BUY' and float(price) < market < float(stopPrice))):
+                raise SimulatedExchangeError(-2010, "The relationship of the prices for the orders is not correct.")
+            self._check_duplicate(limitClientOrderId)
+            self._check_duplicate(stopClientOrderId)
+            list_id = next(self._list_ids)
+            stop = self._new_order(symbol, side, 'STOP_LOSS_LIMIT', quantity, stop_limit, stopPrice, stopClientOrderId)
+            limit = self._new_order(symbol, side, 'LIMIT_MAKER', quantity, price, None, limitClientOrderId)
+            self._validate(symbol, stop.quantity, stop.price)
+            self._validate(symbol, limit.quantity, limit.price)
+            self._lock(limit)
+            for order in (stop, limit):
+                order.list_id = list_id
+                self._store(order)
+                self._report(order, 'NEW')
+            self.order_lists[list_id] = (stop, limit)
+            self.books[symbol]['STOP'].append(stop)
+            self._rest(limit)
+            return {
+                'orderListId': list_id, 'contingencyType': 'OCO', 'listStatusType': 'EXEC_STARTED',
+                'listOrderStatus': 'EXECUTING', 'listClientOrderId': listClientOrderId or f"sim_list_{list_id}",
+                'transactionTime': limit.time, 'symbol': symbol,
+                'orders': [{'symbol': symbol, 'orderId': o.order_id, 'clientOrderId': o.client_order_id}
+                           for o in (stop, limit)],
+                'orderReports': [stop.to_response(), limit.to_response()],
+            }
+
+    def get_order(self, symbol, orderId=None, origClientOrderId=None, **params):
+        with self.lock:
+            return self._find(symbol, orderId, origClientOrderId, -2013, "Order does not exist.").to_response()
+
+    def get_open_orders(self, symbol=None, **params):
+        with self.lock:
+            return [o.to_response() for o in self.orders.values()
+                    if o.status in ('NEW', 'PARTIALLY_FILLED') and (symbol is None or o.symbol == symbol)]
+
+    # --- Datos de mercado y cuenta ---------------------------------------------
+
+    def get_klines(self, symbol, interval, limit=500, startTime=None, endTime=None, **params):
+        """
+        Velas hasta el tiempo virtual actual. Como en Binance, la última puede
+        ser la vela en curso (con `CloseTime` posterior al tiempo actual).
+        """
+        if interval != self.interval:
+            raise SimulatedExchangeError(-1120, f"Solo hay velas de {self.interval} en el simulador.")
+        with self.lock:
+            candles = self.candles[symbol]
+            open_times = candles['OpenTime']
+            end = int(np.searchsorted(open_times, self.now_ms, side='right'))
+            if endTime is not None:
+                end = min(end, int(np.searchsorted(open_times, endTime, side='right')))
+            if startTime is not None:
+                start = int(np.searchsorted(open_times, startTime, side='left'))
+                end = min(end, start + limit)
+            else:
+                start = max(end - limit, 0)
+        return [[int(candles['OpenTime'][i]), f"{candles['Open'][i]:.8f}", f"{candles['High'][i]:.8f}",
+                 f"{candles['Low'][i]:.8f}", f"{candles['Close'][i]:.8f}", f"{candles['Volume'][i]:.8f}",
+                 int(candles['CloseTime'][i]), "0", 0, "0", "0", "0"] for i in range(start, end)]
+
+    def get_ticker(self, symbol, **params):
+        with self.lock:
+            return {'symbol': symbol, 'lastPrice': f"{self._price(symbol, self.now_ms):.8f}"}
+
+    def get_account(self, **params):
+        with self.lock:
+            return {'balances': [{'asset': asset, 'free': f"{free:.8f}", 'locked': f"{locked:.8f}"}
+                                 for asset, (free, locked) in self.balances.items()],
+                    'updateTime': self.now_ms}
+
+    def get_exchange_info(self, **params):
+        symbols = []
+        for symbol, (base, quote) in self.assets.items():
+            filters = self.filters[symbol]
+            symbols.append({'symbol': symbol, 'status': 'TRADING', 'baseAsset': base, 'quoteAsset': quote,
+                            'filters': [
+                                {'filterType': 'PRICE_FILTER', 'tickSize': str(filters['tick_size'])},
+                                {'filterType': 'LOT_SIZE', 'stepSize': str(filters['step_size'])},
+                                {'filterType': 'NOTIONAL', 'minNotional': str(filters['min_notional'])},
+                            ]})
+        return {'serverTime': self.now_ms, 'symbols': symbols}
+
+    def get_server_time(self):
+        return {'serverTime': self.now_ms}
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from benchmarks.synthetic import synthetic_klines
+    from services.binance_api import BinanceAPI
+    from services.kline_stream import PollingKlineSource
+    from services.multi_symbol_runner import MultiSymbolRunner
+    from services.order_manager import OrderManager
+    from utils.rate_limiter import WeightRateLimiter
+
+    days = 3
+    symbols = ['ETHUSDT', 'SOLUSDT']
+    klines = {symbol: synthetic_klines(days * 1440, seed=seed) for seed, symbol in enumerate(symbols)}
+    exchange = ExchangeSimulator(klines, balances={'USDT': 1000.0}, latency=LatencyModel(50, 20, seed=1))
+    clock = exchange.clock()
+
+    # Límite, stop-loss y cancelación por el mismo camino que el bot real
+    api = BinanceAPI(client=exchange, rate_limiter=WeightRateLimiter(max_weight=1e12))
+    order_manager = OrderManager(api)
+    price = api.get_price('ETHUSDT')
+    limit = order_manager.place_limit_order('ETHUSDT', 'BUY', 0.01, round(price * 0.999, 2))
+    exchange.advance(exchange.now_ms + 3_600_000)
+    print("Orden límite:", exchange.get_order('ETHUSDT', orderId=limit['orderId'])['status'])
+
+    os.chdir(tempfile.mkdtemp())  # El historial de transacciones se escribe en un directorio temporal
+    source = PollingKlineSource(api.client, symbols, "1m", clock=clock.time, sleep=clock.sleep)
+    runner = MultiSymbolRunner(api, order_manager, symbols, source=source, clock=clock.time,
+                               min_notional=5, report_seconds=3600)
+    start = time.perf_counter()
+    try:
+        asyncio.run(runner.run())
+    except ReplayFinished:
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"{days} días de velas de 1m en {elapsed:.1f}s ({days * 86400 / elapsed:,.0f}x tiempo real)")
+    print("Saldos finales:", {a: round(b[0] + b[1], 6) for a, b in exchange.balances.items()})
+    print("Órdenes:", len(exchange.orders))
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+from utils.logger import main_logger
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443"
+
+
+def kline_to_event(kline, symbol, interval, is_closed=True):
+    """Convierte una fila de `get_klines` en un evento con el formato del stream de Binance."""
+    return {
+        'e': 'kline',
+        's': symbol,
+        'k': {
+            't': int(kline[0]), 'o': kline[1], 'h': kline[2], 'l': kline[3],
+            'c': kline[4], 'v': kline[5], 'T': int(kline[6]),
+            's': symbol, 'i': interval, 'x': is_closed,
+        },
+    }
+
+
+def event_to_kline(event):
+    """Convierte un evento de vela del stream en una fila compatible con `get_klines`."""
+    k = event['k']
+    return [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T']]
+
+
+class QueueKlineSource:
+    """
+    Fuente de eventos en memoria basada en `asyncio.Queue`.
+
+    Permite alimentar el runtime desde el mismo proceso (pruebas, simulación o
+    un puente desde otro hilo con `put_threadsafe`).
+    """
+
+    _CLOSE = object()
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def put(self, event):
+        await self.queue.put(event)
+
+    def put_nowait(self, event):
+        self.queue.put_nowait(event)
+
+    def put_threadsafe(self, loop, event):
+        loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def close(self):
+        self.queue.put_nowait(self._CLOSE)
+
+    async def events(self):
+        while True:
+            event = await self.queue.get()
+            if event is self._CLOSE:
+                return
+            yield event
+
+
+class WebsocketKlineSource:
+    """
+    Fuente de eventos desde el stream combinado de velas (Binance o un servidor
+    local equivalente) para uno o varios símbolos en una sola conexión. Se
+    reconecta automáticamente con espera exponencial.
+    """
+
+    stream_name = "velas"  # Para los mensajes de registro
+
+    def __init__(self, symbols, interval, url=BINANCE_WS_URL, max_backoff=30):
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.interval = interval
+        self.url = f"{url.rstrip('/')}/stream?streams={'/'.join(self._streams())}"
+        self.max_backoff = max_backoff
+
+    def _streams(self):
+        return [f"{symbol.lower()}@kline_{self.interval}" for symbol in self.symbols]
+
+    async def events(self):
+        try:
+            import websockets
+        except ImportError as e:
+            raise RuntimeError(
+                f"Se requiere el paquete 'websockets' para usar el stream de {self.stream_name}."
+            ) from e
+
+        backoff = 1
+        while True:
+            try:
+                async with websockets.connect(self.url, max_size=None) as ws:
+                    main_logger.info(f"Conectado al stream de {self.stream_name} ({len(self.symbols)} símbolos).")
+                    backoff = 1
+                    async for message in ws:
+                        payload = json.loads(message)
+                        # El stream combinado envuelve cada evento en {"stream": ..., "data": ...}
+                        yield payload.get('data', payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                main_logger.warning(f"Stream de {self.stream_name} desconectado ({e}); reintentando en {backoff}s.")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+
+class PollingKlineSource:
+    """
+    Fuente de respaldo que consulta `get_klines` por REST justo después del
+    cierre de cada vela y emite solo las velas cerradas. Con varios símbolos,
+    las consultas se lanzan de forma concurrente.
+    """
+
+    def __init__(self, client, symbols, interval, close_delay=0.5, clock=time.time, sleep=asyncio.sleep):
+        self.client = client
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.interval = interval
+        self.close_delay = close_delay
+        self.clock = clock
+        self.sleep = sleep
+
+    async def _fetch(self, symbol):
+        try:
+            return await asyncio.to_thread(self.client.get_klines, symbol=symbol, interval=self.interval, limit=3)
+        except Exception as e:
+            main_logger.error(f"Error al consultar velas de {symbol} por REST: {e}")
+            return []
+
+    async def events(self):
+        last_open_times = {}
+        while True:
+            responses = await asyncio.gather(*(self._fetch(symbol) for symbol in self.symbols))
+
+            now_ms = self.clock() * 1000
+            next_close_ms = None
+            for symbol, candles in zip(self.symbols, responses):
+                for kline in candles:
+                    if int(kline[6]) > now_ms:
+                        next_close_ms = int(kline[6]) if next_close_ms is None else min(next_close_ms, int(kline[6]))
+                        continue
+                    if symbol not in last_open_times or int(kline[0]) > last_open_times[symbol]:
+                        last_open_times[symbol] = int(kline[0])
+                        yield kline_to_event(kline, symbol, self.interval)
+
+            # Espera hasta el cierre de la vela en curso
+            wait = 1.0 if next_close_ms is None else (next_close_ms - now_ms) / 1000
+            await self.sleep(max(wait, 0) + self.close_delay)
+
+
+def create_kline_source(client, symbols, interval):
+    """Usa el websocket si `websockets` está instalado; si no, el sondeo REST."""
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        main_logger.warning("Paquete 'websockets' no disponible; se usará sondeo REST de velas.")
+        return PollingKlineSource(client, symbols, interval)
+    return WebsocketKlineSource(symbols, interval)
@@ -0,0 +1,304 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import numpy as np
+from data.candle_store import CandleStore
+from data.portfolio import Portfolio, RiskLimits
+from data.position_ledger import get_ledger
+from data.state_snapshot import load_state, save_state
+from services.depth_stream import OrderBookManager
+from services.kline_stream import QueueKlineSource, create_kline_source
+from services.trading_runtime import TradingRuntime
+from utils.logger import main_logger
+from utils.metrics import metrics
+
+
+def symbol_filters(exchange_info, symbols):
+    """
+    Extrae de `get_exchange_info` la precisión de cantidad, el notional mínimo y
+    los activos base/cotizado de cada símbolo.
+    """
+    wanted = set(symbols)
+    filters = {}
+    for info in exchange_info.get('symbols', []):
+        if info['symbol'] not in wanted:
+            continue
+        by_type = {f['filterType']: f for f in info.get('filters', [])}
+        params = {'quote_asset': info['quoteAsset']}
+        step = by_type.get('LOT_SIZE', {}).get('stepSize')
+        if step:
+            params['precision'] = max(0, -Decimal(step).normalize().as_tuple().exponent)
+        notional = by_type.get('NOTIONAL', by_type.get('MIN_NOTIONAL', {})).get('minNotional')
+        if notional:
+            params['min_notional'] = float(notional)
+        filters[info['symbol']] = params
+    return filters
+
+
+class MultiSymbolRunner:
+    """
+    Ejecuta un `TradingRuntime` por símbolo dentro del mismo proceso.
+
+    Todos los símbolos comparten el mismo `BinanceAPI` (una sesión HTTP con
+    pool de conexiones y un limitador de peso global) y una única fuente de
+    velas; cada evento se encamina a la cola de su símbolo, de modo que un
+    símbolo lento no bloquea a los demás. Los saldos se consultan una sola vez
+    para todos los símbolos. Con `snapshot_dir`, cada símbolo guarda y
+    reanuda su estado desde `<snapshot_dir>/<SYMBOL>-<interval>.npz`. Con
+    `candle_store_dir`, cada símbolo guarda sus velas cerradas en un
+    `CandleStore` bajo ese directorio y arranca desde él. Con
+    `depth_source` (stream de profundidad) o `use_order_books=True` (eventos
+    `depthUpdate` en la propia fuente, p. ej. al reproducir una sesión), se
+    mantiene un libro de órdenes local por símbolo que los runtimes usan para
+    dimensionar las órdenes.
+
+    En simulación todos los símbolos operan sobre un único saldo simulado
+    (`simulated_balance`, por defecto 1000 de la moneda cotizada), como una
+    cuenta real compartida. Con `snapshot_dir` se guarda una sola vez en
+    `<snapshot_dir>/simulated_balance.npz`, no en la instantánea de cada
+    símbolo.
+
+    Con `user_data_source` (stream de datos de usuario) y un `OrderEngine` en
+    `order_manager.engine`, el motor consume los informes de ejecución mientras
+    el runner está en marcha, así que las órdenes límite, cancelaciones y OCO
+    de `order_manager` quedan seguidas en su tabla de órdenes abiertas.
+
+    Con `risk_limits` (argumentos de `RiskLimits`), todos los símbolos
+    comparten una `Portfolio` valorada a mercado con cada precio, que limita
+    la exposición y el VaR de las compras y detiene las órdenes si el
+    drawdown supera el máximo. Su estado (incluido el kill switch) se guarda
+    en `<snapshot_dir>/portfolio.npz`.
+    """
+
+    def __init__(self, api, order_manager, symbols, interval="1m", source=None,
+                 balance_refresh_seconds=30, report_seconds=60, max_threads=64,
+                 is_simulation=False, sleep=asyncio.sleep, snapshot_dir=None, depth_source=None,
+                 use_order_books=None, risk_limits=None, user_data_source=None, simulated_balance=None,
+                 candle_store_dir=None, **runtime_params):
+        self.api = api
+        self.order_manager = order_manager
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.source = source or create_kline_source(api.client, self.symbols, interval)
+        self.balance_refresh_seconds = balance_refresh_seconds
+        self.report_seconds = report_seconds
+        self.max_threads = max_threads
+        self.is_simulation = is_simulation
+        self.simulated_balance = None
+        if is_simulation:
+            self.simulated_balance = (simulated_balance if simulated_balance is not None
+                                      else {runtime_params.get('quote_asset', "USDT"): 1000})
+        self.sleep = sleep
+        self.snapshot_dir = snapshot_dir
+        self.candle_store_dir = candle_store_dir
+        self.depth_source = depth_source
+        self.user_data_source = user_data_source
+        if use_order_books is None:
+            use_order_books = depth_source is not None
+        self.order_books = OrderBookManager(api.client, self.symbols, sleep=sleep) if use_order_books else None
+        self.runtime_params = runtime_params
+        self.portfolio = None
+        if risk_limits is not None:
+            # En vivo, las posiciones parten del libro de posiciones del historial de transacciones
+            positions = None if is_simulation else {
+                symbol: data for symbol, data in get_ledger().state().items() if symbol in self.symbols}
+            self.portfolio = Portfolio(runtime_params.get('quote_asset', "USDT"), limits=RiskLimits(**risk_limits),
+                                       positions=positions)
+        self.balances = {}
+        self.runtimes = {}
+        self._queues = {}
+
+    def _load_filters(self):
+        try:
+            return symbol_filters(self.api.client.get_exchange_info(), self.symbols)
+        except Exception as e:
+            main_logger.warning(f"No se pudieron obtener los filtros de los símbolos: {e}")
+            return {}
+
+    async def _build_runtimes(self):
+        filters = await asyncio.to_thread(self._load_filters)
+        if self.is_simulation:
+            self._restore_simulated_balance()
+        for symbol in self.symbols:
+            queue = QueueKlineSource()
+            params = {**self.runtime_params, **filters.get(symbol, {})}
+            if self.snapshot_dir:
+                params['snapshot_file'] = os.path.join(self.snapshot_dir, f"{symbol}-{self.interval}.npz")
+            if self.candle_store_dir:
+                params['candle_store'] = CandleStore(self.candle_store_dir, symbol, self.interval)
+            if self.order_books is not None:
+                params['order_book'] = self.order_books.books[symbol]
+            if self.portfolio is not None:
+                params['portfolio'] = self.portfolio
+            if self.simulated_balance is not None:
+                params['simulated_balance'] = self.simulated_balance
+            runtime = TradingRuntime(self.api, self.order_manager, queue, symbol=symbol,
+                                     interval=self.interval, is_simulation=self.is_simulation,
+                                     balance_refresh_seconds=None, sleep=self.sleep, **params)
+            runtime.balances = self.balances  # Saldos compartidos entre todos los símbolos
+            self.runtimes[symbol] = runtime
+            self._queues[symbol] = queue
+
+        results = await asyncio.gather(*(runtime.warm_up(refresh_balances=False)
+                                         for runtime in self.runtimes.values()), return_exceptions=True)
+        for symbol, result in zip(list(self.runtimes), results):
+            if isinstance(result, Exception):
+                main_logger.error(f"No se pudo inicializar {symbol}; se excluye: {result}")
+                del self.runtimes[symbol]
+                del self._queues[symbol]
+        if self.portfolio is not None:
+            self._restore_portfolio()
+
+    def _portfolio_file(self):
+        return os.path.join(self.snapshot_dir, "portfolio.npz") if self.snapshot_dir else None
+
+    def _restore_portfolio(self):
+        """Reanuda la cartera desde su instantánea; en simulación, si no la hay, parte de los saldos simulados."""
+        path = self._portfolio_file()
+        if path:
+            try:
+                self.portfolio.restore(load_state(path)['portfolio'])
+                halted = f" (kill switch activo: {self.portfolio.halt_reason})" if self.portfolio.halted else ""
+                main_logger.info(f"Cartera reanudada desde {path}{halted}.")
+                return
+            except FileNotFoundError:
+                pass
+            except (KeyError, ValueError) as e:
+                main_logger.warning(f"Instantánea de la cartera descartada: {e}")
+        if self.is_simulation:
+            self.portfolio.set_cash(self.simulated_balance.get(self.portfolio.quote_asset, 0))
+
+    def _balance_file(self):
+        return os.path.join(self.snapshot_dir, "simulated_balance.npz") if self.snapshot_dir else None
+
+    def _restore_simulated_balance(self):
+        """Reanuda el saldo simulado compartido desde su instantánea, si la hay."""
+        path = self._balance_file()
+        if path is None:
+            return
+        try:
+            balance = load_state(path)['simulated_balance']
+        except FileNotFoundError:
+            return
+        except (KeyError, ValueError) as e:
+            main_logger.warning(f"Instantánea del saldo simulado descartada: {e}")
+            return
+        # En el sitio: los runtimes comparten este mismo diccionario
+        self.simulated_balance.update(balance)
+        main_logger.info(f"Saldo simulado reanudado desde {path}.")
+
+    def save_simulated_balance(self):
+        path = self._balance_file()
+        if not self.is_simulation or path is None:
+            return
+        try:
+            save_state(path, {'simulated_balance': dict(self.simulated_balance)})
+        except Exception as e:
+            metrics.inc('errors', component='snapshot')
+            main_logger.error(f"No se pudo guardar la instantánea del saldo simulado: {e}")
+
+    def save_portfolio(self):
+        path = self._portfolio_file()
+        if self.portfolio is None or path is None:
+            return
+        try:
+            save_state(path, {'portfolio': self.portfolio.state()})
+        except Exception as e:
+            metrics.inc('errors', component='snapshot')
+            main_logger.error(f"No se pudo guardar la instantánea de la cartera: {e}")
+
+    async def run(self):
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.max_threads))
+        await self._build_runtimes()
+        main_logger.info(f"Operando {len(self.runtimes)} símbolos en {self.interval}.")
+
+        runtime_tasks = [asyncio.create_task(runtime.run(warm_up=False)) for runtime in self.runtimes.values()]
+        background = [asyncio.create_task(self._report_loop())]
+        if self.depth_source is not None and self.order_books is not None:
+            background.append(asyncio.create_task(self.order_books.run(self.depth_source)))
+        engine = getattr(self.order_manager, 'engine', None)
+        if self.user_data_source is not None and engine is not None:
+            background.append(asyncio.create_task(engine.run(self.user_data_source)))
+        if not self.is_simulation:
+            await self.refresh_balances()
+            background.append(asyncio.create_task(self._balance_refresh_loop()))
+
+        try:
+            async for event in self.source.events():
+                if event.get('e') == 'depthUpdate':
+                    if self.order_books is not None:
+                        self.order_books.on_event(event)
+                    continue
+                symbol = event.get('s') or event.get('k', {}).get('s')
+                queue = self._queues.get(symbol)
+                if queue is not None:
+                    queue.put_nowait(event)
+        finally:
+            for queue in self._queues.values():
+                queue.close()
+            await asyncio.gather(*runtime_tasks, return_exceptions=True)
+            for task in background:
+                task.cancel()
+            if self.order_books is not None:
+                self.order_books.close()
+            self.save_portfolio()
+            self.save_simulated_balance()
+            self.log_latency_report()
+
+    async def refresh_balances(self):
+        try:
+            with metrics.timer('trading_stage', stage='balance_fetch', symbol='*'):
+                balances = await asyncio.to_thread(self.api.get_account_balance)
+            self.balances.clear()
+            self.balances.update(balances)
+            if self.portfolio is not None:
+                self.portfolio.set_cash(balances.get(self.portfolio.quote_asset, 0))
+        except Exception as e:
+            metrics.inc('errors', component='balances')
+            main_logger.error(f"Error al actualizar saldos: {e}")
+
+    async def _balance_refresh_loop(self):
+        while True:
+            await self.sleep(self.balance_refresh_seconds)
+            await self.refresh_balances()
+
+    def latency_report(self):
+        """
+        Latencia por símbolo en ms: retraso desde el cierre de la vela hasta la
+        decisión (p50/max) y tiempo de proceso (p50).
+        """
+        report = {}
+        for symbol, runtime in self.runtimes.items():
+            if not runtime.latencies:
+                continue
+            samples = np.array(runtime.latencies)
+            report[symbol] = {
+                'lag_p50_ms': float(np.median(samples[:, 0])),
+                'lag_max_ms': float(samples[:, 0].max()),
+                'process_p50_ms': float(np.median(samples[:, 1])),
+                'events': len(samples),
+            }
+        return report
+
+    def log_latency_report(self, top=10):
+        report = self.latency_report()
+        if not report:
+            return
+        slowest = sorted(report.items(), key=lambda item: item[1]['lag_p50_ms'], reverse=True)[:top]
+        summary = ", ".join(f"{symbol}: p50={stats['lag_p50_ms']:.0f}ms max={stats['lag_max_ms']:.0f}ms"
+                            for symbol, stats in slowest)
+        main_logger.info(f"Latencia por símbolo (más lentos): {summary}")
+
+    async def _report_loop(self):
+        while True:
+            await self.sleep(self.report_seconds)
+            self.log_latency_report()
+            main_logger.info(f"Métricas: {metrics.summary_line()}")
+            if self.portfolio is not None:
+                summary = self.portfolio.summary()
+                main_logger.info("Cartera: " + ", ".join(
+                    f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in summary.items()))
+                self.save_portfolio()
+            self.save_simulated_balance()
@@ -0,0 +1,639 @@
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from services.kline_stream import BINANCE_WS_URL
+from utils.logger import log_event, main_logger
+from utils.metrics import metrics
+
+OPEN_STATUSES = ('PENDING_NEW', 'NEW', 'PARTIALLY_FILLED')
+FINAL_STATUSES = ('FILLED', 'CANCELED', 'REJECTED', 'EXPIRED', 'EXPIRED_IN_MATCH')
+# Orden de los estados: un informe atrasado nunca hace retroceder una orden
+_STATUS_RANK = {'PENDING_NEW': 0, 'NEW': 1, 'PARTIALLY_FILLED': 2, **{status: 3 for status in FINAL_STATUSES}}
+
+# Códigos de Binance: la orden consultada no existe / la cancelación no encontró una orden abierta
+UNKNOWN_ORDER = -2013
+CANCEL_REJECTED = -2011
+_NETWORK_ERRORS = ('ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout')
+# Tipos con precio límite que requieren `timeInForce`
+_TIME_IN_FORCE_TYPES = ('LIMIT', 'STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT')
+
+# Evento local que emite `WebsocketUserDataSource` tras cada (re)conexión
+USER_STREAM_CONNECTED = 'userStreamConnected'
+
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def _base36(value):
+    value = int(value)
+    digits = ''
+    while True:
+        value, digit = divmod(value, 36)
+        digits = _DIGITS[digit] + digits
+        if not value:
+            return digits
+
+
+def client_order_id(prefix, time_ms, sequence=0):
+    """
+    ID de cliente (`newClientOrderId`) determinista: prefijo, hora en ms y
+    secuencia en base 36 (p. ej. 'ETHUSDT-lq3x9k2a-0', como mucho 36
+    caracteres). Reenviar una orden con el mismo ID es seguro: Binance rechaza
+    el duplicado mientras siga abierta y permite consultarla por ese ID.
+    """
+    return f"{prefix[:20]}-{_base36(time_ms)}-{_base36(sequence)}"
+
+
+def _ambiguous(error):
+    """Error sin respuesta clara del exchange (red o 5xx): la petición pudo llegar o no."""
+    status = getattr(error, 'status_code', None)
+    return type(error).__name__ in _NETWORK_ERRORS or (isinstance(status, int) and status >= 500)
+
+
+def _duplicate(error):
+    return getattr(error, 'code', None) == -2010 and 'Duplicate' in str(getattr(error, 'message', error))
+
+
+class TrackedOrder:
+    """Estado local de una orden, tal como lo conoce el motor."""
+
+    __slots__ = ('client_order_id', 'symbol', 'side', 'type', 'quantity', 'price', 'stop_price', 'order_id',
+                 'list_id', 'status', 'executed', 'quote', 'commission', 'created_at', 'updated_at')
+
+    def __init__(self, client_order_id, symbol, side, order_type, quantity, price=None, stop_price=None,
+                 created_at=None):
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side
+        self.type = order_type
+        self.quantity = float(quantity)
+        self.price = float(price) if price else None
+        self.stop_price = float(stop_price) if stop_price else None
+        self.order_id = None
+        self.list_id = -1
+        self.status = 'PENDING_NEW'  # Enviada, sin confirmación del exchange
+        self.executed = 0.0
+        self.quote = 0.0
+        self.commission = 0.0
+        self.created_at = created_at
+        self.updated_at = None  # Hora del exchange (ms) del último cambio
+
+    @property
+    def is_open(self):
+        return self.status in OPEN_STATUSES
+
+    @property
+    def average_price(self):
+        """Precio medio de lo ejecutado, o None si aún no se ejecutó nada."""
+        return self.quote / self.executed if self.executed else None
+
+    def as_response(self):
+        """La orden con los campos de una respuesta REST de Binance (para quien espera ese formato)."""
+        return {'symbol': self.symbol, 'orderId': self.order_id, 'clientOrderId': self.client_order_id,
+                'orderListId': self.list_id, 'side': self.side, 'type': self.type, 'status': self.status,
+                'origQty': str(self.quantity), 'executedQty': str(self.executed),
+                'cummulativeQuoteQty': str(self.quote), 'price': str(self.price or 0)}
+
+    def __repr__(self):
+        return (f"TrackedOrder({self.client_order_id}, {self.symbol} {self.side} {self.type} "
+                f"{self.executed:g}/{self.quantity:g}, {self.status})")
+
+
+class OrderEngine:
+    """
+    Ciclo de vida de las órdenes: una tabla en memoria de las órdenes vivas,
+    indexada por ID de cliente (y por símbolo), con envío y cancelación
+    concurrentes, cancel-replace y OCO nativas.
+
+    Cada orden se registra en la tabla con su ID de cliente antes de enviarla,
+    de modo que los `executionReport` del stream de datos de usuario se
+    asocian a ella aunque lleguen antes que la respuesta REST. El estado se
+    reconcilia con esos informes y con las respuestas, sin consultar el
+    exchange en bucle: solo se consulta una orden por su ID tras un error
+    ambiguo (red o 5xx), para saber si llegó antes de reenviarla con el mismo
+    ID, y las abiertas con `reconcile` al arrancar o reconectar el stream.
+
+    Las peticiones usan el pool de hilos de órdenes de `BinanceAPI`
+    (`order_threads` fija cuántas viajan a la vez).
+
+    Args:
+        api (BinanceAPI): Acceso compartido al exchange.
+        prefix (str): Prefijo de los IDs de cliente.
+        max_retries (int): Reenvíos con el mismo ID tras un error ambiguo.
+        history_size (int): Órdenes terminadas que se conservan en la tabla.
+        clock: Reloj (segundos) para los IDs y las marcas de tiempo.
+    """
+
+    def __init__(self, api, prefix="bot", max_retries=2, history_size=10_000, clock=time.time):
+        self.api = api
+        self.client = api.client
+        self.prefix = prefix
+        self.max_retries = max_retries
+        self.history_size = history_size
+        self.clock = clock
+        self.orders = {}
+        self.listeners = []  # Reciben cada `TrackedOrder` que cambia de estado o se ejecuta
+        self._open = {}  # {símbolo: {ID de cliente: orden}}
+        self._by_order_id = {}
+        self._finished = deque()
+        self._sequence = itertools.count()
+        self._reconcile_task = None
+        self.loop = None  # Bucle de eventos de `run` mientras consume informes
+
+    # --- Tabla ----------------------------------------------------------------
+
+    def new_client_order_id(self):
+        return client_order_id(self.prefix, self.clock() * 1000, next(self._sequence))
+
+    def get(self, client_order_id):
+        return self.orders.get(client_order_id)
+
+    def get_by_order_id(self, order_id):
+        """Orden de la tabla por su ID del exchange (`orderId`), o None."""
+        return self._find(None, order_id)
+
+    def open_orders(self, symbol=None):
+        """Órdenes abiertas (o pendientes de confirmación), de un símbolo o de todos."""
+        if symbol is not None:
+            return list(self._open.get(symbol, {}).values())
+        return [order for orders in self._open.values() for order in orders.values()]
+
+    def _track(self, order):
+        self.orders[order.client_order_id] = order
+        self._open.setdefault(order.symbol, {})[order.client_order_id] = order
+        return order
+
+    def _close(self, order):
+        self._open.get(order.symbol, {}).pop(order.client_order_id, None)
+        self._finished.append(order.client_order_id)
+        while len(self._finished) > self.history_size:
+            old = self.orders.pop(self._finished.popleft(), None)
+            if old is not None:
+                self._by_order_id.pop(old.order_id, None)
+
+    def _apply(self, order, status, executed, quote, order_id=None, list_id=None, updated_at=None, commission=None):
+        """
+        Aplica un estado del exchange (respuesta o informe) si es más reciente
+        que el conocido: más cantidad ejecutada o un estado posterior.
+        """
+        if order.status in FINAL_STATUSES:
+            return False
+        rank = _STATUS_RANK.get(status, _STATUS_RANK['NEW'])
+        if executed < order.executed or (executed == order.executed and rank <= _STATUS_RANK[order.status]):
+            return False
+        if order_id is not None and order.order_id is None:
+            order.order_id = order_id
+            self._by_order_id[order_id] = order.client_order_id
+        if list_id is not None:
+            order.list_id = list_id
+        order.status = status
+        order.executed = executed
+        order.quote = quote
+        if commission is not None:
+            order.commission = commission
+        order.updated_at = updated_at
+        if status in FINAL_STATUSES:
+            self._close(order)
+        for listener in self.listeners:
+            listener(order)
+        return True
+
+    def _find(self, client_order_id, order_id=None):
+        order = self.orders.get(client_order_id)
+        if order is None and order_id is not None:
+            order = self.orders.get(self._by_order_id.get(order_id))
+        return order
+
+    def _apply_response(self, response):
+        """Aplica una respuesta REST de orden (o las `orderReports` de una lista)."""
+        for report in response.get('orderReports') or [response]:
+            # En las cancelaciones, `clientOrderId` es el de la petición y `origClientOrderId` el de la orden
+            order = self._find(report.get('origClientOrderId') or report.get('clientOrderId'), report.get('orderId'))
+            if order is None:
+                continue
+            fills = report.get('fills')
+            self._apply(order, report['status'], float(report.get('executedQty', 0)),
+                        float(report.get('cummulativeQuoteQty', 0)), order_id=report.get('orderId'),
+                        list_id=report.get('orderListId'),
+                        updated_at=report.get('transactTime') or report.get('updateTime'),
+                        commission=sum(float(fill['commission']) for fill in fills) if fills else None)
+
+    def _adopt(self, response):
+        """Añade a la tabla una orden abierta creada fuera del motor (otra sesión, la web, etc.)."""
+        order = TrackedOrder(response['clientOrderId'], response['symbol'], response['side'], response['type'],
+                             response['origQty'], response.get('price'), response.get('stopPrice'),
+                             created_at=self.clock())
+        return self._track(order)
+
+    # --- Informes de ejecución ----------------------------------------------------
+
+    def on_event(self, event):
+        """Aplica un `executionReport` del stream de datos de usuario; el resto de eventos se ignoran."""
+        if event.get('e') != 'executionReport':
+            return
+        metrics.inc('execution_reports', status=event['X'])
+        # En las cancelaciones, 'c' es el ID de la petición de cancelación y 'C' el de la orden
+        client_id = event.get('C') or event['c']
+        order = self._find(client_id, event.get('i'))
+        if order is None:
+            if event['X'] not in OPEN_STATUSES:
+                return
+            order = self._adopt({'clientOrderId': client_id, 'symbol': event['s'], 'side': event['S'],
+                                 'type': event['o'], 'origQty': event['q'], 'price': float(event.get('p') or 0),
+                                 'stopPrice': float(event.get('P') or 0)})
+        self._apply(order, event['X'], float(event['z']), float(event['Z']), order_id=event.get('i'),
+                    list_id=event.get('g'), updated_at=event.get('T'),
+                    commission=order.commission + float(event.get('n') or 0))
+
+    async def run(self, source):
+        """
+        Aplica los informes de `source` (stream de datos de usuario o una cola
+        alimentada por el simulador) hasta que termine. Tras cada reconexión
+        del stream se reconcilian las órdenes abiertas en segundo plano.
+        """
+        self.loop = asyncio.get_running_loop()
+        try:
+            async for event in source.events():
+                if event.get('e') == USER_STREAM_CONNECTED:
+                    if self._reconcile_task is None or self._reconcile_task.done():
+                        self._reconcile_task = asyncio.create_task(self.reconcile())
+                    continue
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    metrics.inc('errors', component='order_engine')
+                    main_logger.error(f"Error al aplicar un informe de ejecución: {e}")
+        finally:
+            self.loop = None
+            if self._reconcile_task is not None:
+                self._reconcile_task.cancel()
+
+    async def reconcile(self, symbols=None):
+        """
+        Sincroniza la tabla con las órdenes abiertas del exchange: adopta las
+        que no conoce y consulta por ID las que la tabla da por abiertas y el
+        exchange ya no (los informes emitidos durante una desconexión se pierden).
+        """
+        try:
+            if symbols is None:
+                responses = await asyncio.to_thread(self.client.get_open_orders)
+            else:
+                per_symbol = await asyncio.gather(*(asyncio.to_thread(self.client.get_open_orders, symbol=symbol)
+                                                    for symbol in symbols))
+                responses = [response for responses in per_symbol for response in responses]
+        except Exception as e:
+            metrics.inc('errors', component='order_engine')
+            main_logger.error(f"Error al reconciliar las órdenes abiertas: {e}")
+            return
+        live = set()
+        for response in responses:
+            live.add(response['clientOrderId'])
+            if self._find(response['clientOrderId'], response.get('orderId')) is None:
+                self._adopt(response)
+            self._apply_response(response)
+        # Las pendientes de confirmación tienen su petición en curso: la resuelve `_request`
+        missing = [order for order in self.open_orders() if order.client_order_id not in live
+                   and order.status != 'PENDING_NEW' and (symbols is None or order.symbol in symbols)]
+        if missing:
+            await self._recover(missing)
+        main_logger.info(f"Órdenes reconciliadas: {len(responses)} abiertas en el exchange, "
+                         f"{len(missing)} cerradas mientras no había informes.")
+
+    # --- Peticiones -------------------------------------------------------------
+
+    async def _lookup(self, order):
+        """Consulta una orden por su ID de cliente: True si existe, False si no, None si no se sabe."""
+        try:
+            response = await self.api.run_order(self.client.get_order, symbol=order.symbol,
+                                                origClientOrderId=order.client_order_id)
+        except Exception as e:
+            if getattr(e, 'code', None) == UNKNOWN_ORDER:
+                return False
+            main_logger.warning(f"No se pudo consultar la orden {order.client_order_id}: {e}")
+            return None
+        self._apply_response(response)
+        return True
+
+    async def _recover(self, orders):
+        found = await asyncio.gather(*(self._lookup(order) for order in orders))
+        if None in found:
+            return None
+        return all(found)
+
+    async def _request(self, label, call, orders, recoverable_codes=()):
+        """
+        Envía `call` en el pool de órdenes. Tras un error ambiguo o un duplicado
+        consulta las órdenes por su ID de cliente y, si no llegaron, reenvía la
+        misma petición (mismos IDs, así que nunca se duplican).
+
+        Returns:
+            dict: La respuesta; `{}` si la petición llegó pero su respuesta se
+            perdió (la tabla ya se actualizó con la consulta); None si falló.
+        """
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.timer('order', type=label):
+                    return await self.api.run_order(call)
+            except Exception as e:
+                error = e
+                code = getattr(e, 'code', None)
+                if not (_ambiguous(e) or _duplicate(e) or code in recoverable_codes):
+                    break
+                found = await self._recover(orders)
+                if found:
+                    return {}
+                if found is None or not _ambiguous(e):
+                    break
+                metrics.inc('retries', method=label)
+                main_logger.warning(f"Reenvío {attempt + 1}/{self.max_retries} de {label} con el mismo ID: {e}")
+        metrics.inc('order_errors', type=label)
+        main_logger.error(f"Error en {label} ({', '.join(o.client_order_id for o in orders)}): {error}")
+        if not _ambiguous(error):
+            # Rechazo definitivo: las órdenes que no llegaron a confirmarse no existen
+            for order in orders:
+                if order.status == 'PENDING_NEW':
+                    self._apply(order, 'REJECTED', 0.0, 0.0)
+        return None
+
+    def _log(self, message, order):
+        log_event(main_logger, logging.INFO, message, symbol=order.symbol, client_order_id=order.client_order_id,
+                  order_id=order.order_id, side=order.side, type=order.type, status=order.status,
+                  executed_qty=order.executed)
+
+    async def submit(self, symbol, side, order_type, quantity, price=None, stop_price=None, client_order_id=None):
+        """
+        Envía una orden y la añade a la tabla. Con un `client_order_id` ya
+        conocido devuelve la orden existente sin reenviarla.
+
+        Returns:
+            TrackedOrder: La orden (su estado se sigue actualizando con los
+            informes), o None si el exchange la rechazó.
+        """
+        client_order_id = client_order_id or self.new_client_order_id()
+        if client_order_id in self.orders:
+            return self.orders[client_order_id]
+        order = self._track(TrackedOrder(client_order_id, symbol, side, order_type, quantity, price, stop_price,
+                                         created_at=self.clock()))
+        params = {'symbol': symbol, 'side': side, 'type': order_type, 'quantity': quantity,
+                  'newClientOrderId': client_order_id}
+        if price is not None:
+            params['price'] = str(price)
+        if stop_price is not None:
+            params['stopPrice'] = str(stop_price)
+        if order_type in _TIME_IN_FORCE_TYPES:
+            params['timeInForce'] = 'GTC'
+        response = await self._request(order_type, functools.partial(self.client.create_order, **params), [order])
+        if response is None:
+            return None
+        if response:
+            self._apply_response(response)
+        metrics.inc('orders', type=order_type, side=side)
+        self._log("Orden enviada", order)
+        return order
+
+    async def submit_many(self, orders):
+        """Envía varias órdenes a la vez (dicts con los argumentos de `submit`); mismo orden en el resultado."""
+        return await asyncio.gather(*(self.submit(**order) for order in orders))
+
+    async def cancel(self, client_order_id):
+        """
+        Cancela una orden abierta (si es de una OCO, el exchange cancela la
+        lista). Si ya no estaba abierta, su estado final queda en la tabla.
+        """
+        order = self.orders.get(client_order_id)
+        if order is None or not order.is_open:
+            return order
+        call = functools.partial(self.client.cancel_order, symbol=order.symbol, origClientOrderId=client_order_id)
+        response = await self._request('CANCEL', call, [order], recoverable_codes=(CANCEL_REJECTED,))
+        if response:
+            self._apply_response(response)
+        if response is not None:
+            metrics.inc('cancels')
+            self._log("Orden cancelada", order)
+        return order
+
+    async def cancel_all(self, symbol=None):
+        """Cancela a la vez todas las órdenes abiertas (de un símbolo o de todos), una petición por OCO."""
+        targets, lists = [], set()
+        for order in self.open_orders(symbol):
+            if order.status == 'PENDING_NEW':
+                continue
+            if order.list_id != -1:
+                if order.list_id in lists:
+                    continue
+                lists.add(order.list_id)
+            targets.append(order.client_order_id)
+        return await asyncio.gather(*(self.cancel(client_order_id) for client_order_id in targets))
+
+    async def replace(self, client_order_id, price=None, quantity=None):
+        """
+        Sustituye una orden abierta por otra con nuevo precio o cantidad en una
+        sola petición (`cancel_replace_order`, modo STOP_ON_FAILURE: si la
+        cancelación falla, no se crea la nueva). Por defecto la nueva conserva
+        el precio y la cantidad pendiente.
+
+        Returns:
+            TrackedOrder: La orden nueva, o None si no se pudo sustituir.
+        """
+        old = self.orders.get(client_order_id)
+        if old is None or not old.is_open:
+            return None
+        price = old.price if price is None else price
+        quantity = round(old.quantity - old.executed, 8) if quantity is None else quantity
+        new = self._track(TrackedOrder(self.new_client_order_id(), old.symbol, old.side, old.type, quantity, price,
+                                       old.stop_price, created_at=self.clock()))
+        params = {'symbol': old.symbol, 'side': old.side, 'type': old.type, 'cancelReplaceMode': 'STOP_ON_FAILURE',
+                  'cancelOrigClientOrderId': client_order_id, 'newClientOrderId': new.client_order_id,
+                  'quantity': quantity, 'price': str(price)}
+        if old.stop_price is not None:
+            params['stopPrice'] = str(old.stop_price)
+        if old.type in _TIME_IN_FORCE_TYPES:
+            params['timeInForce'] = 'GTC'
+        response = await self._request('CANCEL_REPLACE', functools.partial(self.client.cancel_replace_order, **params),
+                                       [new])
+        if response:
+            self._apply_response(response['cancelResponse'])
+            self._apply_response(response['newOrderResponse'])
+        else:
+            # Respuesta perdida o fallo parcial: el estado de la orden original se consulta
+            await self._recover([old])
+        if response is None:
+            return None
+        metrics.inc('orders', type='CANCEL_REPLACE', side=old.side)
+        self._log("Orden sustituida", new)
+        return new
+
+    async def place_oco(self, symbol, side, quantity, price, stop_price, stop_limit_price=None):
+        """
+        OCO nativa (`create_oco_order`): una orden límite a `price` (toma de
+        beneficios) y un stop-loss activado en `stop_price` sobre la misma
+        cantidad, en una sola petición. El exchange cancela una al ejecutarse
+        la otra, así que nunca queda una orden huérfana.
+
+        Returns:
+            tuple: (stop, límite) como `TrackedOrder`, o None si se rechazó.
+        """
+        stop_limit_price = stop_price if stop_limit_price is None else stop_limit_price
+        created_at = self.clock()
+        list_client_order_id = self.new_client_order_id()
+        stop = self._track(TrackedOrder(self.new_client_order_id(), symbol, side, 'STOP_LOSS_LIMIT', quantity,
+                                        stop_limit_price, stop_price, created_at=created_at))
+        limit = self._track(TrackedOrder(self.new_client_order_id(), symbol, side, 'LIMIT_MAKER', quantity, price,
+                                         created_at=created_at))
+        params = {'symbol': symbol, 'side': side, 'quantity': quantity, 'price': str(price),
+                  'stopPrice': str(stop_price), 'stopLimitPrice': str(stop_limit_price),
+                  'stopLimitTimeInForce': 'GTC', 'listClientOrderId': list_client_order_id,
+                  'limitClientOrderId': limit.client_order_id, 'stopClientOrderId': stop.client_order_id}
+        response = await self._request('OCO', functools.partial(self.client.create_oco_order, **params), [stop, limit])
+        if response is None:
+            return None
+        if response:
+            self._apply_response(response)
+        metrics.inc('orders', amount=2, type='OCO', side=side)
+        self._log("OCO colocada (stop)", stop)
+        self._log("OCO colocada (límite)", limit)
+        return stop, limit
+
+
+class WebsocketUserDataSource:
+    """
+    Stream de datos de usuario de Binance (informes de ejecución y saldos).
+
+    Pide un `listenKey` por REST, lo renueva cada `keepalive_seconds` y se
+    reconecta con espera exponencial. Tras cada conexión emite el evento local
+    `{'e': USER_STREAM_CONNECTED}` para que `OrderEngine.run` reconcilie lo
+    que pudo perderse mientras estaba desconectado.
+    """
+
+    def __init__(self, client, url=BINANCE_WS_URL, keepalive_seconds=1800, max_backoff=30):
+        self.client = client
+        self.url = url.rstrip('/')
+        self.keepalive_seconds = keepalive_seconds
+        self.max_backoff = max_backoff
+
+    async def _keepalive(self, listen_key):
+        while True:
+            await asyncio.sleep(self.keepalive_seconds)
+            try:
+                await asyncio.to_thread(self.client.stream_keepalive, listenKey=listen_key)
+            except Exception as e:
+                main_logger.warning(f"No se pudo renovar el listenKey del stream de datos de usuario: {e}")
+
+    async def events(self):
+        try:
+            import websockets
+        except ImportError as e:
+            raise RuntimeError("Se requiere el paquete 'websockets' para usar el stream de datos de usuario.") from e
+
+        backoff = 1
+        while True:
+            keepalive = None
+            try:
+                listen_key = await asyncio.to_thread(self.client.stream_get_listen_key)
+                async with websockets.connect(f"{self.url}/ws/{listen_key}", max_size=None) as ws:
+                    main_logger.info("Conectado al stream de datos de usuario.")
+                    backoff = 1
+                    keepalive = asyncio.create_task(self._keepalive(listen_key))
+                    yield {'e': USER_STREAM_CONNECTED, 'E': int(time.time() * 1000)}
+                    async for message in ws:
+                        yield json.loads(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                main_logger.warning(f"Stream de datos de usuario desconectado ({e}); reintentando en {backoff}s.")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if keepalive is not None:
+                    keepalive.cancel()
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    from benchmarks.synthetic import synthetic_klines
+    from services.binance_api import BinanceAPI
+    from services.exchange_simulator import ExchangeSimulator
+    from services.kline_stream import QueueKlineSource
+    from utils.rate_limiter import WeightRateLimiter
+
+    class NetworkClient:
+        """Simulador con 5 ms de ida y vuelta real por petición y fallos de red a demanda."""
+
+        def __init__(self, exchange):
+            self.exchange = exchange
+            self.lose_responses = 0  # Peticiones que llegan al exchange pero cuya respuesta se pierde
+
+        def __getattr__(self, name):
+            method = getattr(self.exchange, name)
+
+            def call(*args, **kwargs):
+                time.sleep(0.005)
+                result = method(*args, **kwargs)
+                if self.lose_responses and name == 'create_order':
+                    self.lose_responses -= 1
+                    raise type('ReadTimeout', (Exception,), {})("Respuesta perdida")
+                return result
+            return call
+
+    async def main():
+        exchange = ExchangeSimulator({'ETHUSDT': synthetic_klines(2000)}, balances={'USDT': 1e6, 'ETH': 100.0})
+        network = NetworkClient(exchange)
+        api = BinanceAPI(client=network, rate_limiter=WeightRateLimiter(max_weight=1e12), order_threads=32)
+        engine = OrderEngine(api, clock=exchange.clock().time)
+        reports = QueueKlineSource()
+        loop = asyncio.get_running_loop()
+        exchange.listeners.append(lambda event: reports.put_threadsafe(loop, event))
+        consumer = asyncio.create_task(engine.run(reports))
+        price = api.get_price('ETHUSDT')
+
+        # Cientos de órdenes en reposo, en serie y a la vez
+        n = 200
+        levels = [round(price * (1 - 0.0005 * (i + 1)), 2) for i in range(n)]
+        start = time.perf_counter()
+        for level in levels[:20]:
+            await engine.submit('ETHUSDT', 'BUY', 'LIMIT', 0.01, level)
+        serial = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        await engine.submit_many([{'symbol': 'ETHUSDT', 'side': 'BUY', 'order_type': 'LIMIT', 'quantity': 0.01,
+                                   'price': level} for level in levels[20:]])
+        concurrent = (time.perf_counter() - start) / (n - 20)
+        print(f"{n} órdenes en reposo: {serial * 1e3:.1f} ms por orden en serie, "
+              f"{concurrent * 1e3:.2f} ms por orden a la vez")
+
+        # Respuesta perdida: la consulta por ID de cliente evita duplicar la orden
+        network.lose_responses = 1
+        order = await engine.submit('ETHUSDT', 'SELL', 'LIMIT', 0.5, round(price * 1.05, 2))
+        assert order.status == 'NEW' and len(exchange.get_open_orders('ETHUSDT')) == n + 1
+
+        # Cancel-replace y OCO nativa
+        replaced = await engine.replace(order.client_order_id, price=round(price * 1.04, 2))
+        assert order.status == 'CANCELED' and replaced.status == 'NEW'
+        stop, limit = await engine.place_oco('ETHUSDT', 'SELL', 1.0, round(price * 1.002, 2), round(price * 0.99, 2))
+
+        # El mercado avanza: los informes de ejecución actualizan la tabla sin consultar el exchange
+        exchange.advance(exchange.now_ms + 6 * 3_600_000)
+        await asyncio.sleep(0.05)
+        filled = sum(o.status == 'FILLED' for o in engine.orders.values())
+        print(f"Tras 6 horas: {filled} ejecutadas; OCO: stop {stop.status}, límite {limit.status}")
+        assert {stop.status, limit.status} in ({'FILLED', 'CANCELED'}, {'NEW'})
+
+        # La tabla coincide con el exchange
+        live = {o['clientOrderId']: o for o in exchange.get_open_orders('ETHUSDT')}
+        assert set(live) == {o.client_order_id for o in engine.open_orders('ETHUSDT')}
+        for o in engine.open_orders('ETHUSDT'):
+            assert abs(float(live[o.client_order_id]['executedQty']) - o.executed) < 1e-9
+
+        start = time.perf_counter()
+        await engine.cancel_all('ETHUSDT')
+        print(f"{len(live)} órdenes canceladas en {(time.perf_counter() - start) * 1e3:.0f} ms")
+        assert not engine.open_orders() and not exchange.get_open_orders()
+
+        await engine.reconcile(['ETHUSDT'])
+        reports.close()
+        await consumer
+
+    asyncio.run(main())
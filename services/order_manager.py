@@ -1,68 +1,136 @@
+import asyncio
+import logging
 from services.binance_api import BinanceAPI
-from utils.logger import main_logger
+from utils.logger import log_event, main_logger
+from utils.metrics import metrics
+
+def _log_order(message, response):
+    """Registra un resumen de la orden; la respuesta completa solo a nivel DEBUG."""
+    log_event(main_logger, logging.INFO, message, symbol=response.get('symbol'), order_id=response.get('orderId'),
+              side=response.get('side'), type=response.get('type'), status=response.get('status'),
+              executed_qty=response.get('executedQty'))
+    log_event(main_logger, logging.DEBUG, message, response=response)
+
+_NOT_ROUTED = object()
 
 class OrderManager:
-    def __init__(self):
-        self.api = BinanceAPI()
+    """
+    Envío de órdenes con llamadas bloqueantes (se usan desde hilos, p. ej. el
+    pool de órdenes de `BinanceAPI`).
+
+    Con un `OrderEngine` en marcha (`engine.run` consumiendo el stream de datos
+    de usuario), las órdenes límite, las cancelaciones y las OCO pasan por él:
+    quedan en su tabla de órdenes abiertas con un ID de cliente, se reenvían
+    sin duplicarse tras errores de red y su estado se actualiza con los
+    informes de ejecución. Sin motor (o con el motor parado) se envían
+    directamente, como antes. Las órdenes de mercado siempre van directas: el
+    runtime ya las sigue por su ID de cliente.
+    """
+
+    def __init__(self, api=None, engine=None):
+        self.api = api or BinanceAPI()  # Reutiliza el cliente compartido si se proporciona
+        self.engine = engine
+
+    def _via_engine(self, method, *args):
+        """
+        Ejecuta el método `method` del motor en su bucle de eventos y espera
+        el resultado; `_NOT_ROUTED` si no hay motor en marcha.
+        """
+        loop = self.engine.loop if self.engine is not None else None
+        if loop is None or not loop.is_running():
+            return _NOT_ROUTED
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("Desde el bucle de eventos hay que usar OrderEngine directamente (con await).")
+        return asyncio.run_coroutine_threadsafe(getattr(self.engine, method)(*args), loop).result()
 
-    def place_market_order(self, symbol, side, quantity):
-        """Coloca una orden de mercado."""
+    def place_market_order(self, symbol, side, quantity, client_order_id=None):
+        """
+        Coloca una orden de mercado. Con `client_order_id` la orden puede
+        consultarse después por ese ID (p. ej. tras un reinicio).
+        """
         try:
-            response = self.api.place_order(symbol, side, quantity)
-            main_logger.info(f"Orden de mercado ejecutada: {response}")
+            with metrics.timer('order', type='MARKET'):
+                response = self.api.place_order(symbol, side, quantity, client_order_id)
+            metrics.inc('orders', type='MARKET', side=side)
+            _log_order("Orden de mercado ejecutada", response)
             return response
         except Exception as e:
+            metrics.inc('order_errors', type='MARKET')
             main_logger.error(f"Error al colocar orden de mercado: {e}")
             return None
 
     def place_limit_order(self, symbol, side, quantity, price):
         """Coloca una orden límite."""
+        order = self._via_engine('submit', symbol, side, 'LIMIT', quantity, price)
+        if order is not _NOT_ROUTED:
+            return order.as_response() if order is not None else None
         try:
-            response = self.api.client.order_limit(
-                symbol=symbol, side=side, quantity=quantity, price=str(price)
-            )
-            main_logger.info(f"Orden límite colocada: {response}")
+            with metrics.timer('order', type='LIMIT'):
+                response = self.api.client.order_limit(
+                    symbol=symbol, side=side, quantity=quantity, price=str(price)
+                )
+            metrics.inc('orders', type='LIMIT', side=side)
+            _log_order("Orden límite colocada", response)
             return response
         except Exception as e:
+            metrics.inc('order_errors', type='LIMIT')
             main_logger.error(f"Error al colocar orden límite: {e}")
             return None
 
     def cancel_order(self, symbol, order_id):
         """Cancela una orden pendiente."""
+        tracked = self.engine.get_by_order_id(order_id) if self.engine is not None else None
+        if tracked is not None:
+            order = self._via_engine('cancel', tracked.client_order_id)
+            if order is not _NOT_ROUTED:
+                return order.as_response() if order is not None and not order.is_open else None
         try:
-            response = self.api.client.cancel_order(symbol=symbol, orderId=order_id)
-            main_logger.info(f"Orden cancelada: {response}")
+            with metrics.timer('order', type='CANCEL'):
+                response = self.api.client.cancel_order(symbol=symbol, orderId=order_id)
+            metrics.inc('cancels')
+            _log_order("Orden cancelada", response)
             return response
         except Exception as e:
+            metrics.inc('order_errors', type='CANCEL')
             main_logger.error(f"Error al cancelar orden: {e}")
             return None
 
     def place_stop_loss_take_profit_order(self, symbol, quantity, stop_price, take_price):
-        """Combina órdenes de stop-loss y take-profit."""
+        """
+        Coloca stop-loss y take-profit como una OCO nativa: una sola petición
+        que el exchange acepta o rechaza entera, y al ejecutarse una orden
+        cancela la otra (nunca queda una orden huérfana).
+        """
+        orders = self._via_engine('place_oco', symbol, 'SELL', quantity, take_price, stop_price)
+        if orders is not _NOT_ROUTED:
+            if orders is None:
+                return None
+            stop, limit = orders
+            return {'symbol': symbol, 'orderListId': stop.list_id,
+                    'orderReports': [stop.as_response(), limit.as_response()]}
         try:
-            # Coloca orden stop-loss
-            stop_order = self.api.client.create_order(
-                symbol=symbol,
-                side='SELL',
-                type='STOP_LOSS_LIMIT',
-                quantity=quantity,
-                price=str(stop_price),
-                stopPrice=str(stop_price)
-            )
-            main_logger.info(f"Orden stop-loss colocada: {stop_order}")
-
-            # Coloca orden take-profit
-            take_order = self.api.client.create_order(
-                symbol=symbol,
-                side='SELL',
-                type='LIMIT',
-                quantity=quantity,
-                price=str(take_price)
-            )
-            main_logger.info(f"Orden take-profit colocada: {take_order}")
-
+            with metrics.timer('order', type='OCO'):
+                response = self.api.client.create_oco_order(
+                    symbol=symbol,
+                    side='SELL',
+                    quantity=quantity,
+                    price=str(take_price),
+                    stopPrice=str(stop_price),
+                    stopLimitPrice=str(stop_price),
+                    stopLimitTimeInForce='GTC'
+                )
+            for report in response.get('orderReports', []):
+                _log_order("Orden OCO colocada", report)
+            metrics.inc('orders', amount=2, type='OCO', side='SELL')
+            return response
         except Exception as e:
-            main_logger.error(f"Error al colocar órdenes stop-loss/take-profit: {e}")
+            metrics.inc('order_errors', type='OCO')
+            main_logger.error(f"Error al colocar la OCO de stop-loss/take-profit: {e}")
+            return None
 
     def check_balance(self, symbol, quantity, price, fee_rate=0.001):
         """
@@ -0,0 +1,606 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from data.kline_cache import KlineCache, interval_to_ms
+from data.position_ledger import PositionLedger, get_ledger
+from data.resampler import MultiTimeframeResampler
+from data.state_snapshot import load_state, save_state
+from data.transaction_handler import record_transaction
+from services.kline_stream import event_to_kline
+from services.order_engine import UNKNOWN_ORDER, client_order_id
+from strategies.incremental import IndicatorEngine
+from strategies.trading_logic import TradingLogic
+from utils.logger import log_event, main_logger
+from utils.metrics import metrics
+
+# Etapas cronometradas de cada vela (histograma `trading_stage`)
+STAGES = ('backfill', 'cache_ingest', 'indicators', 'resample', 'decision', 'cost_basis', 'balance_fetch',
+          'order_place', 'record_transaction', 'signal_to_fill', 'candle_to_decision', 'snapshot_save',
+          'warm_restart', 'risk')
+
+
+class TradingRuntime:
+    """
+    Bucle de trading orientado a eventos.
+
+    Consume eventos de velas de una fuente intercambiable (websocket, cola en
+    memoria o sondeo REST) y evalúa la estrategia en cuanto cierra cada vela.
+    Las órdenes y la actualización de saldos se ejecutan como tareas en segundo
+    plano para no bloquear el procesamiento de eventos.
+
+    Con `order_book` (un `OrderBook` local sincronizado por el stream de
+    profundidad), las cantidades se recortan para no superar
+    `max_slippage_bps` de deslizamiento y las reglas usan el precio medio de
+    ejecución esperado en lugar del último cierre, sin peticiones extra.
+
+    Con `portfolio` (una `Portfolio`, normalmente compartida entre símbolos),
+    cada precio recibido valora la posición a mercado y las órdenes pasan por
+    sus límites: las compras se recortan a la exposición y el VaR permitidos
+    y el kill switch bloquea cualquier orden nueva.
+
+    Con `candle_store` (un `CandleStore` de este símbolo e intervalo), cada
+    vela cerrada se añade al histórico local; el arranque en frío lo completa
+    con las velas que falten desde la última ejecución y siembra la caché desde
+    él, y las velas perdidas se recuperan a través de él.
+
+    Con `snapshot_file`, el estado (velas, acumuladores de indicadores,
+    posiciones simuladas y la orden en curso) se guarda cada
+    `snapshot_seconds` y al terminar; al arrancar se reanuda desde ahí y solo
+    se descargan las velas que faltan. El saldo simulado solo se incluye si
+    es propio del runtime: uno recibido en `simulated_balance` (compartido por
+    varios símbolos) lo guarda y restaura quien lo creó.
+    """
+
+    def __init__(self, api, order_manager, source, symbol="ETHUSDT", interval="1m",
+                 quote_asset="USDT", short_window=5, long_window=10, rsi_window=14,
+                 fee_rate=0.001, precision=4, min_notional=10, percentage=0.7,
+                 min_margin=0.003, min_rsi=35, max_rsi=75, is_simulation=False,
+                 simulated_balance=None, balance_refresh_seconds=30, history_size=100, clock=time.time,
+                 sleep=asyncio.sleep, timeframes=(), snapshot_file=None, snapshot_seconds=60, order_book=None,
+                 max_slippage_bps=10, max_book_age=10, portfolio=None, candle_store=None):
+        self.api = api
+        self.order_manager = order_manager
+        self.source = source
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.quote_asset = quote_asset
+        self.base_asset = symbol[:-len(quote_asset)]
+        self.fee_rate = fee_rate
+        self.precision = precision
+        self.min_notional = min_notional
+        self.percentage = percentage
+        self.min_margin = min_margin
+        self.min_rsi = min_rsi
+        self.max_rsi = max_rsi
+        self.is_simulation = is_simulation
+        self._owns_balance = simulated_balance is None
+        self.simulated_balance = simulated_balance if simulated_balance is not None else {quote_asset: 1000}
+        # Un saldo compartido por varios símbolos se amplía con el activo base de cada uno
+        self.simulated_balance.setdefault(quote_asset, 0)
+        self.simulated_balance.setdefault(self.base_asset, 0)
+        self.balance_refresh_seconds = balance_refresh_seconds
+        # Reloj y espera del mercado (virtuales con el simulador o al reproducir un diario)
+        self.clock = clock
+        self.sleep = sleep
+
+        self.cache = KlineCache(api.client, symbol, interval, capacity=history_size)
+        self.candle_store = candle_store
+        self.timeframes = tuple(timeframes)
+        self._new_engine = lambda: IndicatorEngine(short_window=short_window, long_window=long_window,
+                                                   rsi_window=rsi_window)
+        self._reset_indicators()
+        self.balances = dict(self.simulated_balance) if is_simulation else {}
+        # En simulación las posiciones se llevan en un libro propio (solo se guarda en las instantáneas)
+        self.ledger = PositionLedger(history_file=None) if is_simulation else get_ledger()
+        self.last_open_time = None
+        self._order_task = None
+        self.pending_order = None  # Orden enviada y aún sin respuesta del exchange
+        self.snapshot_file = snapshot_file
+        self.snapshot_seconds = snapshot_seconds
+        self._last_snapshot = None
+        self.order_book = order_book
+        self.max_slippage_bps = max_slippage_bps
+        self.max_book_age = max_book_age
+        self.portfolio = portfolio
+        # Muestras recientes (ms): retraso desde el cierre de la vela y tiempo de proceso
+        self.latencies = deque(maxlen=500)
+        # Histogramas resueltos una sola vez: evita buscar etiquetas en cada vela
+        self._stages = {stage: metrics.histogram('trading_stage', stage=stage, symbol=symbol) for stage in STAGES}
+
+    def _reset_indicators(self):
+        self.engine = self._new_engine()
+        # Intervalos superiores (p. ej. '5m', '1h') construidos desde las mismas velas, sin peticiones extra
+        self.resampler = MultiTimeframeResampler(
+            self.timeframes, self.interval, capacity=self.cache.buffer.capacity, engine_factory=self._new_engine
+        ) if self.timeframes else None
+
+    async def run(self, warm_up=True):
+        """Siembra el estado inicial (salvo `warm_up=False`) y procesa eventos hasta que la fuente termine."""
+        if warm_up:
+            await self.warm_up()
+        balance_task = None
+        if not self.is_simulation and self.balance_refresh_seconds:
+            balance_task = asyncio.create_task(self._balance_refresh_loop())
+        try:
+            async for event in self.source.events():
+                try:
+                    await self.on_event(event)
+                except Exception as e:
+                    metrics.inc('errors', component='runtime')
+                    main_logger.error(f"Error en el bot: {e}")
+        finally:
+            if balance_task is not None:
+                balance_task.cancel()
+            if self._order_task is not None:
+                await asyncio.gather(self._order_task, return_exceptions=True)
+            if self.snapshot_file:
+                await self.save_snapshot()
+
+    async def warm_up(self, refresh_balances=True):
+        """
+        Reanuda desde la instantánea si la hay y es válida; si no, descarga el
+        histórico una sola vez e inicializa los indicadores con las velas cerradas.
+        """
+        if not (self.snapshot_file and await self._warm_restart()):
+            await self._cold_start()
+        if self.portfolio is not None and self.last_open_time is not None:
+            closed = self.cache.column('OpenTime') <= self.last_open_time
+            self.portfolio.seed(self.symbol, self.cache.column('Close')[closed])
+        if refresh_balances and not self.is_simulation:
+            await self.refresh_balances()
+        main_logger.info(f"Análisis inicial del mercado completado ({self.symbol}).")
+
+    async def _cold_start(self):
+        if not (self.candle_store is not None and await self._seed_from_store()):
+            await asyncio.to_thread(self.cache.seed)
+        now_ms = self.clock() * 1000
+        open_times = self.cache.column('OpenTime')
+        close_times = self.cache.column('CloseTime')
+        closes = self.cache.column('Close')
+        ohlcv = [self.cache.column(name) for name in ('OpenTime', 'Open', 'High', 'Low', 'Close', 'Volume')]
+        for index, (open_time, close_time, close) in enumerate(zip(open_times, close_times, closes)):
+            if close_time > now_ms:
+                break  # Vela en curso: se procesará al recibir su cierre
+            self.engine.update(close)
+            if self.resampler is not None:
+                self.resampler.update([column[index] for column in ohlcv])
+            self.last_open_time = int(open_time)
+
+    def _update_store(self, end_time=None):
+        """Añade al histórico local las velas cerradas que falten (hasta `end_time`) y rellena sus huecos."""
+        store = self.candle_store
+        added = store.ingest(self.api.client, end_time=end_time, now_ms=self.clock() * 1000)
+        added += store.backfill(self.api.client)
+        return added
+
+    async def _seed_from_store(self):
+        """
+        Completa el histórico local y siembra la caché con sus últimas velas. Si
+        falla o no llega hasta la última vela cerrada, se siembra por REST.
+        """
+        try:
+            added = await asyncio.to_thread(self._update_store)
+        except Exception as e:
+            metrics.inc('errors', component='candle_store')
+            main_logger.error(f"Error al completar el histórico local de {self.symbol}: {e}")
+            return False
+        last_open_time = self.candle_store.last_open_time()
+        if last_open_time is None or self.clock() * 1000 - last_open_time > 2 * self.interval_ms:
+            return False
+        self.cache.seed_from_store(self.candle_store)
+        main_logger.info(f"Histórico local de {self.symbol} {self.interval}: {len(self.candle_store)} velas "
+                         f"({added} nuevas).")
+        return True
+
+    def snapshot_state(self):
+        """Estado necesario para reanudar sin recalcular nada (ver `restore_state`)."""
+        return {
+            'symbol': self.symbol,
+            'interval': self.interval,
+            'saved_at': self.clock(),
+            'last_open_time': self.last_open_time,
+            'cache': self.cache.buffer.state(),
+            'engine': self.engine.state(),
+            'resampler': self.resampler.state() if self.resampler is not None else None,
+            'simulation': self.is_simulation,
+            'simulated_balance': dict(self.simulated_balance) if self.is_simulation and self._owns_balance else None,
+            'ledger': self.ledger.state() if self.is_simulation else None,
+            'pending_order': self.pending_order,
+        }
+
+    async def save_snapshot(self):
+        """
+        Guarda el estado en `snapshot_file` (los errores se registran, no se
+        propagan). El estado se copia en el bucle de eventos y el archivo se
+        escribe en un hilo, sin bloquear al resto de símbolos.
+        """
+        try:
+            with self._stages['snapshot_save'].time():
+                state = self.snapshot_state()
+                await asyncio.to_thread(save_state, self.snapshot_file, state)
+        except Exception as e:
+            metrics.inc('errors', component='snapshot')
+            main_logger.error(f"No se pudo guardar la instantánea de {self.symbol}: {e}")
+        self._last_snapshot = self.clock()
+
+    def restore_state(self, state, account=True):
+        """
+        Restaura el estado de `snapshot_state`. Si no corresponde a este símbolo e
+        intervalo, a estos parámetros o a este modo, lanza ValueError. Con
+        `account=False` solo restaura velas e indicadores (ver `restore_account`).
+        """
+        if (state['symbol'], state['interval']) != (self.symbol, self.interval):
+            raise ValueError(f"La instantánea es de {state['symbol']} {state['interval']}.")
+        if (state['resampler'] is None) != (self.resampler is None):
+            raise ValueError("Intervalos superiores distintos en la instantánea.")
+        if state['simulation'] != self.is_simulation:
+            raise ValueError("La instantánea es de otro modo (real/simulación).")
+        try:
+            self.cache.buffer.restore(state['cache'])
+            self.engine.restore(state['engine'])
+            if self.resampler is not None:
+                self.resampler.restore(state['resampler'])
+        except Exception:
+            self.cache.buffer.clear()
+            self._reset_indicators()
+            raise
+        self.last_open_time = state['last_open_time']
+        if account:
+            self.restore_account(state)
+
+    def restore_account(self, state):
+        """Restaura el libro simulado, el saldo simulado si es propio y la orden en curso de `snapshot_state`."""
+        if self.is_simulation:
+            if self._owns_balance and state['simulated_balance'] is not None:
+                self.simulated_balance.update(state['simulated_balance'])
+            self.ledger.restore(state['ledger'])
+        self.pending_order = state['pending_order']
+
+    async def _warm_restart(self):
+        """
+        Reanuda desde la instantánea y descarga solo las velas posteriores. La
+        última vela guardada se compara con la del exchange; si no coincide, si la
+        instantánea es más antigua que la ventana de velas o no se puede leer, se
+        descarta y se hace un arranque en frío.
+        """
+        started = time.perf_counter()
+        try:
+            state = await asyncio.to_thread(load_state, self.snapshot_file)
+        except FileNotFoundError:
+            return False
+        except ValueError as e:
+            main_logger.warning(f"{e}; arranque en frío de {self.symbol}.")
+            return False
+
+        last_open_time = state.get('last_open_time')
+        window_ms = self.cache.buffer.capacity * self.interval_ms
+        if last_open_time is None or self.clock() * 1000 - last_open_time > window_ms:
+            main_logger.info(f"Instantánea de {self.symbol} demasiado antigua; arranque en frío.")
+            return False
+        # Saldos, libro y orden en curso solo se restauran si la instantánea resulta válida
+        try:
+            self.restore_state(state, account=False)
+        except (KeyError, ValueError) as e:
+            main_logger.warning(f"Instantánea de {self.symbol} incompatible ({e}); arranque en frío.")
+            return False
+
+        try:
+            candles = await asyncio.to_thread(
+                self.api.client.get_klines, symbol=self.symbol, interval=self.interval,
+                startTime=last_open_time, limit=self.cache.buffer.capacity + 1
+            )
+        except Exception as e:
+            metrics.inc('errors', component='warm_restart')
+            main_logger.error(f"Error al completar la instantánea de {self.symbol}: {e}")
+            candles = []
+        saved_close = self.cache.column('Close')[self.cache.column('OpenTime') == last_open_time]
+        if not candles or int(candles[0][0]) != last_open_time or len(saved_close) != 1 or \
+                float(candles[0][4]) != saved_close[0]:
+            main_logger.warning(f"La instantánea de {self.symbol} no coincide con el exchange; arranque en frío.")
+            self.cache.buffer.clear()
+            self._reset_indicators()
+            self.last_open_time = None
+            return False
+        self.restore_account(state)
+
+        now_ms = self.clock() * 1000
+        recovered = 0
+        for kline in candles[1:]:
+            if int(kline[6]) > now_ms:
+                break  # Vela en curso: se procesará al recibir su cierre
+            self._apply_candle(kline)
+            recovered += 1
+        if self.pending_order is not None:
+            await self._reconcile_pending()
+        elapsed = time.perf_counter() - started
+        self._stages['warm_restart'].record(elapsed)
+        self._last_snapshot = self.clock()
+        main_logger.info(f"Arranque en caliente de {self.symbol} desde la instantánea: "
+                         f"{recovered} velas recuperadas en {elapsed * 1000:.0f} ms.")
+        return True
+
+    async def _reconcile_pending(self):
+        """
+        Resuelve la orden que estaba en curso al detener el bot consultándola
+        por su ID de cliente: si llegó a ejecutarse, se registra la transacción.
+        Los saldos se vuelven a consultar al exchange justo después de reanudar.
+        """
+        order, self.pending_order = self.pending_order, None
+        client_id = order.get('client_order_id')
+        if client_id is None or self.is_simulation:
+            main_logger.warning(f"Había una orden en curso al detener el bot ({order}); "
+                                f"se reconcilia con los saldos del exchange.")
+            return
+        try:
+            response = await asyncio.to_thread(self.api.client.get_order, symbol=self.symbol,
+                                               origClientOrderId=client_id)
+        except Exception as e:
+            if getattr(e, 'code', None) == UNKNOWN_ORDER:
+                main_logger.info(f"La orden en curso al detener el bot ({client_id}) no llegó al exchange.")
+            else:
+                metrics.inc('errors', component='warm_restart')
+                main_logger.error(f"No se pudo consultar la orden en curso {client_id}: {e}")
+            return
+        executed = float(response['executedQty'])
+        main_logger.info(f"Orden en curso al detener el bot ({client_id}): {response['status']}, "
+                         f"{executed} ejecutado.")
+        if executed > 0:
+            total = float(response['cummulativeQuoteQty'])
+            if self.portfolio is not None:
+                self.portfolio.apply_fill(order['side'], self.symbol, executed, total / executed)
+            await asyncio.to_thread(record_transaction, order['side'], self.symbol, executed, total / executed,
+                                    total, response['orderId'])
+
+    async def on_event(self, event):
+        """Procesa un evento del stream; solo las velas cerradas disparan decisiones."""
+        if event.get('e') != 'kline':
+            return  # Otros eventos (p. ej. trades) no afectan a la estrategia
+        kline = event['k']
+        if self.portfolio is not None:
+            # Valoración a mercado con cada precio, también los de la vela en curso
+            self.portfolio.mark(self.symbol, float(kline['c']), bar_close=kline['x'])
+        if not kline['x']:
+            return
+
+        received = time.perf_counter()
+        open_time = int(kline['t'])
+        if self.last_open_time is not None and open_time <= self.last_open_time:
+            log_event(main_logger, logging.DEBUG, "Vela duplicada o fuera de orden ignorada",
+                      symbol=self.symbol, open_time=open_time)
+            return
+
+        if self.last_open_time is not None and open_time > self.last_open_time + self.interval_ms:
+            with self._stages['backfill'].time():
+                await self._backfill(open_time)
+
+        self._apply_candle(event_to_kline(event))
+        with self._stages['decision'].time():
+            self.evaluate()
+        lag_ms = self.clock() * 1000 - int(kline['T'])
+        self.latencies.append((lag_ms, (time.perf_counter() - received) * 1000))
+        self._stages['candle_to_decision'].record(max(lag_ms, 0) / 1000)
+        if self.snapshot_file and (self._last_snapshot is None or
+                                   self.clock() - self._last_snapshot >= self.snapshot_seconds):
+            await self.save_snapshot()
+
+    async def _backfill(self, open_time):
+        """Recupera por REST las velas perdidas entre la última procesada y `open_time`."""
+        start_time = self.last_open_time + self.interval_ms
+        main_logger.warning(f"Velas perdidas en {self.symbol} desde {start_time}; recuperando por REST.")
+        try:
+            if self.candle_store is not None:
+                candles = await asyncio.to_thread(self._fetch_from_store, start_time, open_time - 1)
+            else:
+                candles = await asyncio.to_thread(
+                    self.api.client.get_klines, symbol=self.symbol, interval=self.interval,
+                    startTime=start_time, endTime=open_time - 1, limit=1000
+                )
+        except Exception as e:
+            metrics.inc('errors', component='backfill')
+            main_logger.error(f"Error al recuperar velas perdidas: {e}")
+            return
+        for kline in candles:
+            if self.last_open_time < int(kline[0]) < open_time:
+                self._apply_candle(kline)
+
+    def _fetch_from_store(self, start_time, end_time):
+        """Completa el histórico local hasta `end_time` y devuelve sus velas desde `start_time`."""
+        self._update_store(end_time)
+        return self.candle_store.klines(start_time, end_time)
+
+    def _apply_candle(self, kline):
+        with self._stages['cache_ingest'].time():
+            self.cache.ingest([kline])
+            if self.candle_store is not None:
+                self._store_candle(kline)
+        with self._stages['indicators'].time():
+            self.engine.update(kline[4])
+        if self.resampler is not None:
+            with self._stages['resample'].time():
+                self.resampler.update(kline)
+        self.last_open_time = int(kline[0])
+
+    def _store_candle(self, kline):
+        try:
+            self.candle_store.append([kline])
+        except Exception as e:
+            metrics.inc('errors', component='candle_store')
+            main_logger.error(f"No se pudo guardar la vela de {self.symbol} en el histórico local: {e}")
+
+    def evaluate(self):
+        """Aplica las reglas de compra/venta sobre los indicadores de la última vela cerrada."""
+        values = self.engine.values
+        latest_price = values['Close']
+        lower_band = values['Lower_Band']
+        upper_band = values['Upper_Band']
+        rsi = values['RSI']
+        macd = values['MACD']
+        signal_line = values['Signal_Line']
+
+        # Campos estructurados: el formateo se hace en el hilo del logger
+        timeframe_rsi = {f"rsi_{interval}": self.resampler.values(interval).get('RSI')
+                         for interval in self.resampler.aggregators} if self.resampler is not None else {}
+        log_event(main_logger, logging.INFO, "Indicadores", symbol=self.symbol, price=latest_price,
+                  sma_short=values['SMA_Short'], sma_long=values['SMA_Long'], rsi=rsi, macd=macd,
+                  signal_line=signal_line, upper_band=upper_band, lower_band=lower_band, **timeframe_rsi)
+
+        if self._order_task is not None and not self._order_task.done():
+            main_logger.info("Orden en curso; se omite la evaluación de esta vela.")
+            return
+
+        balances = self.simulated_balance if self.is_simulation else self.balances
+        quote_balance = balances.get(self.quote_asset, 0)
+        base_balance = balances.get(self.base_asset, 0)
+
+        if quote_balance == 0 and base_balance == 0:
+            main_logger.warning("No hay saldo disponible para operar. Esperando próxima vela.")
+            return
+
+        # Precios esperados de ejecución: mejor venta/compra del libro local si está al día
+        book = self._usable_book()
+        buy_price = book.best_ask()[0] if book else latest_price
+        sell_price = book.best_bid()[0] if book else latest_price
+        quantity_buy = TradingLogic.calculate_operable_quantity(
+            quote_balance, buy_price, self.fee_rate, self.precision, self.min_notional, self.percentage
+        )
+        quantity_sell = TradingLogic.calculate_operable_quantity(
+            base_balance * sell_price, sell_price, self.fee_rate, self.precision, self.min_notional, self.percentage
+        )
+        if book:
+            quantity_buy, buy_price = self._fit_to_book(book, 'BUY', quantity_buy, buy_price)
+            quantity_sell, sell_price = self._fit_to_book(book, 'SELL', quantity_sell, sell_price)
+            log_event(main_logger, logging.DEBUG, "Ejecución esperada según el libro", symbol=self.symbol,
+                      buy_price=buy_price, quantity_buy=quantity_buy, sell_price=sell_price,
+                      quantity_sell=quantity_sell)
+
+        if self.portfolio is not None:
+            with self._stages['risk'].time():
+                quantity_buy, quantity_sell = self._apply_risk_limits(quantity_buy, buy_price, quantity_sell)
+
+        # Coste medio de los lotes abiertos según el libro de posiciones (FIFO)
+        with self._stages['cost_basis'].time():
+            cost_avg = self.ledger.cost_basis(self.symbol) if base_balance > 0 else None
+
+        if TradingLogic.should_buy(buy_price, lower_band, rsi, min_rsi=self.min_rsi) and quantity_buy > 0:
+            self._submit('BUY', quantity_buy, buy_price)
+        elif cost_avg is not None and TradingLogic.should_sell(
+            sell_price, cost_avg, upper_band, macd, signal_line, self.fee_rate, self.min_margin, max_rsi=self.max_rsi
+        ) and quantity_sell > 0:
+            self._submit('SELL', quantity_sell, sell_price)
+        else:
+            log_event(main_logger, logging.INFO, "Sin señales claras en este momento.", symbol=self.symbol)
+
+    def _usable_book(self):
+        """El libro local si está sincronizado, tiene ambos lados y se actualizó hace poco; si no, None."""
+        book = self.order_book
+        if book is None or not book.synced or book.best_bid() is None or book.best_ask() is None:
+            return None
+        if book.updated_at is not None and self.clock() * 1000 - book.updated_at > self.max_book_age * 1000:
+            return None
+        return book
+
+    def _fit_to_book(self, book, side, quantity, price):
+        """Recorta `quantity` al deslizamiento máximo y devuelve (cantidad, precio medio esperado)."""
+        if quantity <= 0:
+            return quantity, price
+        quantity = TradingLogic.limit_quantity_to_depth(
+            quantity, book.max_quantity(side, self.max_slippage_bps), price, self.precision, self.min_notional
+        )
+        if quantity > 0:
+            price = book.vwap(side, quantity)[0]
+        return quantity, price
+
+    def _apply_risk_limits(self, quantity_buy, buy_price, quantity_sell):
+        """Recorta la compra a la capacidad de riesgo de la cartera; con el kill switch no se opera."""
+        portfolio = self.portfolio
+        if portfolio.halted:
+            if quantity_buy > 0 or quantity_sell > 0:
+                log_event(main_logger, logging.WARNING, "Órdenes bloqueadas por el kill switch", symbol=self.symbol,
+                          reason=portfolio.halt_reason)
+            return 0, 0
+        if quantity_buy > 0:
+            # Mismo recorte que con el libro: redondeo hacia abajo y notional mínimo
+            limited = TradingLogic.limit_quantity_to_depth(
+                quantity_buy, portfolio.buy_capacity(self.symbol) / buy_price, buy_price, self.precision,
+                self.min_notional
+            )
+            if limited < quantity_buy:
+                log_event(main_logger, logging.INFO, "Compra recortada por los límites de riesgo", symbol=self.symbol,
+                          quantity=quantity_buy, limited=limited, exposure=portfolio.exposure, var=portfolio.var)
+            quantity_buy = limited
+        return quantity_buy, quantity_sell
+
+    def _submit(self, side, quantity, price):
+        if self.is_simulation:
+            self._simulate_fill(side, quantity, price)
+            return
+        action = "COMPRA" if side == 'BUY' else "VENTA"
+        log_event(main_logger, logging.INFO, f"🔔 ¡Alerta de {action} detectada!", symbol=self.symbol,
+                  side=side, quantity=quantity, price=price)
+        # ID de cliente derivado del reloj del mercado: permite reconciliar la orden tras un reinicio
+        order_id = client_order_id(self.symbol, self.clock() * 1000)
+        self.pending_order = {'side': side, 'quantity': quantity, 'price': price, 'submitted_at': self.clock(),
+                              'client_order_id': order_id}
+        self._order_task = asyncio.create_task(self._place_order(side, quantity, price, time.perf_counter(),
+                                                                 order_id))
+
+    def _simulate_fill(self, side, quantity, price):
+        action = "COMPRA" if side == 'BUY' else "VENTA"
+        log_event(main_logger, logging.INFO, f"🔔 ¡Simulación de {action}!", symbol=self.symbol,
+                  side=side, quantity=quantity, price=price)
+        sign = 1 if side == 'BUY' else -1
+        self.simulated_balance[self.quote_asset] -= sign * quantity * price
+        self.simulated_balance[self.base_asset] += sign * quantity
+        self.ledger.apply(side, self.symbol, quantity, price)
+        if self.portfolio is not None:
+            self.portfolio.apply_fill(side, self.symbol, quantity, price)
+        log_event(main_logger, logging.INFO, "Saldo simulado", symbol=self.symbol,
+                  quote_balance=self.simulated_balance[self.quote_asset],
+                  base_balance=self.simulated_balance[self.base_asset])
+
+    async def _place_order(self, side, quantity, price, signaled_at=None, order_id=None):
+        try:
+            with self._stages['order_place'].time():
+                # Pool de hilos propio: la orden no espera detrás de descargas de velas o saldos
+                response = await self.api.run_order(self.order_manager.place_market_order, self.symbol, side,
+                                                    quantity, order_id)
+        finally:
+            self.pending_order = None
+        if response:
+            if signaled_at is not None:
+                # Desde la señal hasta la confirmación del exchange (incluye la cola de hilos)
+                self._stages['signal_to_fill'].record(time.perf_counter() - signaled_at)
+            # Lo ejecutado según el exchange (parciales, deslizamiento); la misma cifra va al
+            # portafolio y al historial para que ambos libros no diverjan
+            executed = float(response.get('executedQty', quantity))
+            total = float(response.get('cummulativeQuoteQty') or executed * price)
+            if executed > 0:
+                if self.portfolio is not None:
+                    self.portfolio.apply_fill(side, self.symbol, executed, total / executed)
+                with self._stages['record_transaction'].time():
+                    await asyncio.to_thread(record_transaction, side, self.symbol, executed, total / executed,
+                                            total, response['orderId'])
+            await self.refresh_balances()
+
+    async def refresh_balances(self):
+        try:
+            with self._stages['balance_fetch'].time():
+                balances = await asyncio.to_thread(self.api.get_account_balance)
+            # Actualización en el sitio: el diccionario puede compartirse entre varios símbolos
+            self.balances.clear()
+            self.balances.update(balances)
+            if self.portfolio is not None:
+                self.portfolio.set_cash(balances.get(self.portfolio.quote_asset, 0))
+            log_event(main_logger, logging.INFO, "Saldo actual", symbol=self.symbol,
+                      quote_balance=self.balances.get(self.quote_asset, 0),
+                      base_balance=self.balances.get(self.base_asset, 0))
+        except Exception as e:
+            metrics.inc('errors', component='balances')
+            main_logger.error(f"Error al actualizar saldos: {e}")
+
+    async def _balance_refresh_loop(self):
+        while True:
+            await self.sleep(self.balance_refresh_seconds)
+            await self.refresh_balances()
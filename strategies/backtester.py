@@ -0,0 +1,215 @@
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from data.candle_store import CandleStore
+from strategies.pipeline import StrategyPipeline
+from strategies.trading_logic import TradingLogic
+
+# Mismas columnas que transaction_history.csv, más la comisión y el PnL realizado
+TRADE_FIELDS = ['type', 'symbol', 'quantity', 'price', 'total', 'order_id', 'timestamp', 'fee', 'realized_pnl']
+INDICATOR_COLUMNS = ('RSI', 'MACD', 'Signal_Line', 'Upper_Band', 'Lower_Band')
+
+
+def compute_indicator_columns(close, rsi_window=14, bb_window=20, num_std_dev=2,
+                              macd_short=12, macd_long=26, macd_signal=9):
+    """
+    Calcula de forma vectorizada solo los indicadores que usan las reglas de
+    compra/venta, con las mismas fórmulas que el bot en vivo.
+
+    Returns:
+        dict: Arrays de numpy por columna (RSI, MACD, Signal_Line, Upper_Band, Lower_Band).
+    """
+    pipeline = StrategyPipeline(
+        {'Close': np.asarray(close, dtype=float)}, rsi_window=rsi_window, bb_window=bb_window,
+        num_std_dev=num_std_dev, macd_short=macd_short, macd_long=macd_long, macd_signal=macd_signal
+    )
+    return pipeline.compute(INDICATOR_COLUMNS)
+
+
+def simulate(close, indicators, close_time=None, symbol="ETHUSDT", initial_balance=1000,
+             fee_rate=0.001, precision=4, min_notional=10, percentage=0.7,
+             min_margin=0.003, min_rsi=35, max_rsi=75):
+    """
+    Reproduce las decisiones de `TradingLogic` sobre indicadores ya calculados.
+
+    Las condiciones de precio/indicador se evalúan de forma vectorizada y solo
+    las velas candidatas pasan por la lógica con estado (saldos, lotes FIFO),
+    que usa exactamente `calculate_operable_quantity`, `should_buy` y
+    `should_sell`. La comisión se descuenta del saldo en cada operación.
+
+    Returns:
+        tuple: (equity, trades) como DataFrames. `trades` es compatible con
+        transaction_history.csv.
+    """
+    close = np.asarray(close, dtype=float)
+    lower_band = indicators['Lower_Band']
+    upper_band = indicators['Upper_Band']
+    rsi = indicators['RSI']
+    macd = indicators['MACD']
+    signal_line = indicators['Signal_Line']
+
+    # Condiciones sin estado; las comparaciones con NaN son False, igual que en Python
+    with np.errstate(invalid='ignore'):
+        buy_mask = (close < lower_band) & (rsi < min_rsi)
+        sell_mask = (close > upper_band) & (macd > signal_line)
+    candidates = np.flatnonzero(buy_mask | sell_mask)
+
+    quote_balance = float(initial_balance)
+    base_balance = 0.0
+    open_cost = 0.0
+    lots = deque()  # [cantidad, precio] pendientes de vender (FIFO)
+
+    trade_index, trade_rows = [], []
+    quote_after, base_after = [], []
+
+    for i in candidates:
+        price = close[i]
+        side = None
+
+        quantity = TradingLogic.calculate_operable_quantity(
+            quote_balance, price, fee_rate, precision, min_notional, percentage
+        )
+        if buy_mask[i] and TradingLogic.should_buy(price, lower_band[i], rsi[i], min_rsi=min_rsi) and quantity > 0:
+            side = 'BUY'
+            total = quantity * price
+            fee = total * fee_rate
+            quote_balance -= total + fee
+            base_balance += quantity
+            open_cost += total
+            lots.append([quantity, price])
+            realized_pnl = 0.0
+        elif sell_mask[i] and base_balance > 0:
+            cost_avg = open_cost / base_balance
+            quantity = TradingLogic.calculate_operable_quantity(
+                base_balance * price, price, fee_rate, precision, min_notional, percentage
+            )
+            if (0 < quantity <= base_balance and TradingLogic.should_sell(
+                    price, cost_avg, upper_band[i], macd[i], signal_line[i], fee_rate, min_margin, max_rsi=max_rsi)):
+                side = 'SELL'
+                total = quantity * price
+                fee = total * fee_rate
+                quote_balance += total - fee
+                base_balance -= quantity
+                sold_cost = _consume_lots(lots, quantity)
+                open_cost -= sold_cost
+                realized_pnl = total - sold_cost - fee
+
+        if side is None:
+            continue
+        trade_index.append(i)
+        quote_after.append(quote_balance)
+        base_after.append(base_balance)
+        trade_rows.append((side, symbol, quantity, price, total, len(trade_rows) + 1, fee, realized_pnl))
+
+    equity = _equity_curve(close, close_time, initial_balance, trade_index, quote_after, base_after)
+    trades = _trades_frame(trade_rows, trade_index, close_time)
+    return equity, trades
+
+
+def _consume_lots(lots, quantity):
+    """Consume lotes en orden FIFO y devuelve el coste de la cantidad vendida."""
+    cost = 0.0
+    remaining = quantity
+    while remaining > 1e-12 and lots:
+        lot = lots[0]
+        used = min(lot[0], remaining)
+        cost += used * lot[1]
+        remaining -= used
+        lot[0] -= used
+        if lot[0] <= 1e-12:
+            lots.popleft()
+    return cost
+
+
+def _equity_curve(close, close_time, initial_balance, trade_index, quote_after, base_after):
+    """Construye la curva de capital vela a vela a partir de los saldos tras cada operación."""
+    n = len(close)
+    quote = np.full(n, float(initial_balance))
+    base = np.zeros(n)
+    if trade_index:
+        # Índice de la última operación ejecutada en o antes de cada vela
+        position = np.searchsorted(np.asarray(trade_index), np.arange(n), side='right') - 1
+        traded = position >= 0
+        quote[traded] = np.asarray(quote_after)[position[traded]]
+        base[traded] = np.asarray(base_after)[position[traded]]
+    equity = pd.DataFrame({'Close': close, 'quote_balance': quote, 'base_balance': base,
+                           'equity': quote + base * close})
+    if close_time is not None:
+        equity.insert(0, 'CloseTime', np.asarray(close_time))
+    return equity
+
+
+def _trades_frame(trade_rows, trade_index, close_time):
+    columns = ['type', 'symbol', 'quantity', 'price', 'total', 'order_id', 'fee', 'realized_pnl']
+    trades = pd.DataFrame(trade_rows, columns=columns)
+    if close_time is not None and len(trade_index):
+        timestamps = pd.to_datetime(np.asarray(close_time)[trade_index], unit='ms')
+        trades['timestamp'] = timestamps.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        trades['timestamp'] = pd.Series(trade_index, dtype=object)
+    return trades[TRADE_FIELDS]
+
+
+def summarize(equity, trades):
+    """Métricas básicas de un backtest: capital final, rentabilidad, drawdown, operaciones y comisiones."""
+    curve = equity['equity'].to_numpy()
+    peak = np.maximum.accumulate(curve)
+    initial = curve[0] if len(curve) else 0.0
+    final = curve[-1] if len(curve) else 0.0
+    return {
+        'final_equity': float(final),
+        'return_pct': (final / initial - 1) * 100 if initial else 0.0,
+        'max_drawdown_pct': float(((peak - curve) / peak).max() * 100) if len(curve) else 0.0,
+        'trades': len(trades),
+        'realized_pnl': float(trades['realized_pnl'].sum()),
+        'fees': float(trades['fee'].sum()),
+    }
+
+
+def run_backtest(candles, symbol="ETHUSDT", initial_balance=1000, rsi_window=14, bb_window=20,
+                 num_std_dev=2, macd_short=12, macd_long=26, macd_signal=9, **decision_params):
+    """
+    Ejecuta un backtest completo sobre velas con columna `Close` (y opcionalmente
+    `CloseTime` en milisegundos): un DataFrame o un diccionario de arrays, como
+    las vistas memory-mapped que devuelve `CandleStore.range()`.
+
+    Los parámetros adicionales (`fee_rate`, `precision`, `min_notional`,
+    `percentage`, `min_margin`, `min_rsi`, `max_rsi`) se pasan a `simulate`.
+    """
+    close = np.asarray(candles['Close'], dtype=float)
+    close_time = np.asarray(candles['CloseTime']) if 'CloseTime' in candles else None
+    indicators = compute_indicator_columns(close, rsi_window, bb_window, num_std_dev,
+                                           macd_short, macd_long, macd_signal)
+    return simulate(close, indicators, close_time, symbol, initial_balance, **decision_params)
+
+
+def run_backtest_from_store(root, symbol, interval, start_time=None, end_time=None, **params):
+    """
+    Backtest sobre el histórico local de un `CandleStore` (`<root>/<SYMBOL>/<interval>`)
+    con `OpenTime` en [start_time, end_time] (ms). Las columnas se leen como
+    vistas memory-mapped; `params` se pasan a `run_backtest`.
+    """
+    candles = CandleStore(root, symbol, interval).range(start_time, end_time, columns=['Close', 'CloseTime'])
+    if not len(candles['Close']):
+        raise ValueError(f"No hay velas de {symbol} {interval} en el histórico local para ese rango.")
+    return run_backtest(candles, symbol, **params)
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    # Un año de velas de 1 minuto sintéticas (paseo aleatorio)
+    rng = np.random.default_rng(7)
+    n = 525_600
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.0008, n)))
+    close_time = 1_704_067_200_000 + np.arange(1, n + 1) * 60_000 - 1
+    candles = pd.DataFrame({'Close': close, 'CloseTime': close_time})
+
+    start = time.perf_counter()
+    equity, trades = run_backtest(candles)
+    elapsed = time.perf_counter() - start
+
+    print(f"{n} velas simuladas en {elapsed:.2f}s, {len(trades)} operaciones.")
+    print(f"Capital final: {equity['equity'].iloc[-1]:.2f} USDT")
+    trades.to_csv('backtest_trades.csv', index=False)
+    print("Operaciones guardadas en 'backtest_trades.csv'")
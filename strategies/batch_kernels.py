@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Indicadores que calcula `compute_indicators` (mismos nombres que las columnas de strategies/)
+BATCH_COLUMNS = ('SMA_Short', 'SMA_Long', 'RSI', 'EMA_Short', 'EMA_Long', 'MACD', 'Signal_Line',
+                 'MACD_Histogram', 'SMA', 'Upper_Band', 'Lower_Band')
+
+
+def close_matrix(closes, length=None):
+    """
+    Apila los cierres de varios pares en una matriz (pares × tiempo) de float64.
+
+    Las series se alinean por el final (la última vela de cada par en la última
+    columna) y las más cortas se rellenan con NaN por delante, como un par que
+    empezó a cotizar más tarde.
+
+    Args:
+        closes (list): Arrays o Series de cierres, uno por par.
+        length (int, opcional): Columnas de la matriz; por defecto, la serie más larga.
+    """
+    length = max((len(c) for c in closes), default=0) if length is None else length
+    matrix = np.full((len(closes), length), np.nan)
+    for row, close in enumerate(closes):
+        values = np.asarray(close, dtype=np.float64)[-length:] if length else ()
+        if len(values):
+            matrix[row, length - len(values):] = values
+    return matrix
+
+
+def _rolling(matrix, window):
+    """
+    Ventanas deslizantes (sin copia) por fila, con la columna de salida de cada
+    una ya preparada. Una ventana con algún NaN da NaN, como en pandas.
+    """
+    out = np.full(matrix.shape, np.nan)
+    if window > matrix.shape[1]:
+        return None, out
+    return sliding_window_view(matrix, window, axis=1), out
+
+
+def sma(matrix, window):
+    """Media móvil simple por fila; igual que `Series.rolling(window).mean()`."""
+    windows, out = _rolling(np.asarray(matrix, dtype=np.float64), window)
+    if windows is not None:
+        out[:, window - 1:] = windows.mean(axis=-1)
+    return out
+
+
+def rolling_std(matrix, window):
+    """Desviación típica móvil muestral (ddof=1) por fila; igual que `Series.rolling(window).std()`."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    # Centrar cada par en su media evita perder precisión al restar sumas de cuadrados
+    with np.errstate(all='ignore'):
+        centered = matrix - np.nan_to_num(np.nanmean(matrix, axis=1, keepdims=True)) if matrix.size else matrix
+    windows, out = _rolling(centered, window)
+    if windows is not None and window > 1:
+        total = windows.sum(axis=-1)
+        squares = np.einsum('ijk,ijk->ij', windows, windows)
+        out[:, window - 1:] = np.sqrt(np.maximum(squares - total * total / window, 0.0) / (window - 1))
+    return out
+
+
+def bollinger_bands(matrix, window=20, num_std_dev=2):
+    """Bandas de Bollinger por fila (SMA, Upper_Band, Lower_Band)."""
+    middle = sma(matrix, window)
+    band_width = num_std_dev * rolling_std(matrix, window)
+    return {'SMA': middle, 'Upper_Band': middle + band_width, 'Lower_Band': middle - band_width}
+
+
+def ema(matrix, span):
+    """
+    Media móvil exponencial por fila con la semántica de
+    `Series.ewm(span=span, adjust=False).mean()`, incluidos los NaN: la media
+    empieza en el primer valor de cada par y, tras un hueco, el valor anterior
+    pesa como si hubiera decaído durante el hueco.
+
+    El bucle recorre el tiempo; cada paso actualiza todos los pares a la vez.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    out = np.empty(matrix.shape)
+    weighted = np.full(len(matrix), np.nan)
+    old_weight = np.ones(len(matrix))
+    has_nan = np.isnan(matrix).any()
+    for t in range(matrix.shape[1]):
+        current = matrix[:, t]
+        if not has_nan and t:
+            # Camino rápido sin huecos: old_weight vale siempre `decay`
+            updated = (decay * weighted + alpha * current) / (decay + alpha)
+            weighted = np.where(weighted != current, updated, weighted)
+        elif t:
+            observed = ~np.isnan(current)
+            started = ~np.isnan(weighted)
+            old_weight = np.where(started, old_weight * decay, old_weight)
+            update = observed & started
+            updated = (old_weight * weighted + alpha * current) / (old_weight + alpha)
+            weighted = np.where(update & (weighted != current), updated, weighted)
+            weighted = np.where(observed & ~started, current, weighted)
+            old_weight = np.where(observed, 1.0, old_weight)
+        else:
+            weighted = current.copy()
+        out[:, t] = weighted
+    return out
+
+
+def macd(matrix, short_window=12, long_window=26, signal_window=9):
+    """MACD por fila (EMA_Short, EMA_Long, MACD, Signal_Line, MACD_Histogram)."""
+    ema_short = ema(matrix, short_window)
+    ema_long = ema(matrix, long_window)
+    macd_line = ema_short - ema_long
+    signal_line = ema(macd_line, signal_window)
+    return {'EMA_Short': ema_short, 'EMA_Long': ema_long, 'MACD': macd_line, 'Signal_Line': signal_line,
+            'MACD_Histogram': macd_line - signal_line}
+
+
+def rsi(matrix, window=14):
+    """
+    RSI por fila, con las mismas medias simples de ganancias y pérdidas que
+    `calculate_rsi` (la primera diferencia, y las que tocan un NaN, cuentan como 0).
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    delta = np.full(matrix.shape, np.nan)
+    delta[:, 1:] = np.diff(matrix, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gain = sma(np.where(delta > 0, delta, 0.0), window)
+        loss = sma(-np.where(delta < 0, delta, 0.0), window)
+        return 100 - (100 / (1 + gain / loss))
+
+
+def compute_indicators(matrix, short_window=5, long_window=10, rsi_window=14, macd_short=12, macd_long=26,
+                       macd_signal=9, bb_window=20, num_std_dev=2):
+    """
+    Todos los indicadores de `strategies/` para todos los pares en una pasada.
+
+    Args:
+        matrix: Cierres (pares × tiempo), p. ej. de `close_matrix`.
+
+    Returns:
+        dict: `{columna: matriz (pares × tiempo)}` con las columnas de `BATCH_COLUMNS`.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    indicators = {'SMA_Short': sma(matrix, short_window), 'SMA_Long': sma(matrix, long_window),
+                  'RSI': rsi(matrix, rsi_window)}
+    indicators.update(macd(matrix, macd_short, macd_long, macd_signal))
+    indicators.update(bollinger_bands(matrix, bb_window, num_std_dev))
+    return indicators
+
+
+def latest(indicators, symbols, close=None):
+    """
+    Último valor de cada indicador por par, como DataFrame indexado por símbolo
+    (listo para ordenar y filtrar el mercado).
+    """
+    table = pd.DataFrame({name: values[:, -1] for name, values in indicators.items()}, index=list(symbols))
+    if close is not None:
+        table.insert(0, 'Close', np.asarray(close, dtype=np.float64)[:, -1])
+    return table
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import time
+    from benchmarks.synthetic import synthetic_closes
+    from strategies.bollinger_bands import calculate_bollinger_bands
+    from strategies.macd import calculate_macd
+    from strategies.rsi import calculate_rsi
+
+    n_symbols, n_candles = 400, 1440
+    closes = [synthetic_closes(n_candles, seed=seed) for seed in range(n_symbols)]
+    closes[1] = closes[1][-300:]  # Par listado hace poco: NaN por delante
+    closes[2] = closes[2].copy()
+    closes[2][700:705] = np.nan  # Hueco en los datos
+    matrix = close_matrix(closes)
+
+    start = time.perf_counter()
+    indicators = compute_indicators(matrix)
+    batched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames = [calculate_bollinger_bands(calculate_macd(calculate_rsi(pd.DataFrame({'Close': row}))))
+              for row in matrix]
+    per_symbol = time.perf_counter() - start
+    print(f"{n_symbols} pares × {n_candles} velas: {batched * 1e3:.0f} ms en lote, "
+          f"{per_symbol * 1e3:.0f} ms con pandas par a par")
+
+    # Mismos valores (y mismos NaN) que las funciones por par
+    for row, df in enumerate(frames):
+        for column in ('RSI', 'MACD', 'Signal_Line', 'MACD_Histogram', 'SMA', 'Upper_Band', 'Lower_Band'):
+            assert np.allclose(indicators[column][row], df[column].to_numpy(), rtol=1e-9, atol=1e-9,
+                               equal_nan=True), (row, column)
+
+    table = latest(indicators, [f"PAR{i}USDT" for i in range(n_symbols)], close=matrix)
+    oversold = table[(table['Close'] < table['Lower_Band']) & (table['RSI'] < 35)]
+    print(f"{len(oversold)} pares bajo la banda inferior con RSI < 35")
+    print(table.sort_values('RSI').head())
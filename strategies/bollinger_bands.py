@@ -1,5 +1,4 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 
 def calculate_bollinger_bands(data, window=20, num_std_dev=2):
     """
@@ -7,9 +6,11 @@ def calculate_bollinger_bands(data, window=20, num_std_dev=2):
     - window: Número de períodos para la SMA y la desviación estándar.
     - num_std_dev: Número de desviaciones estándar para las bandas superior e inferior.
     """
-    data['SMA'] = data['Close'].rolling(window=window).mean()
-    data['Upper_Band'] = data['SMA'] + (num_std_dev * data['Close'].rolling(window=window).std())
-    data['Lower_Band'] = data['SMA'] - (num_std_dev * data['Close'].rolling(window=window).std())
+    rolling = data['Close'].rolling(window=window)
+    data['SMA'] = rolling.mean()
+    band_width = num_std_dev * rolling.std()  # Se calcula una sola vez para ambas bandas
+    data['Upper_Band'] = data['SMA'] + band_width
+    data['Lower_Band'] = data['SMA'] - band_width
     return data
 
 def bollinger_strategy(data, window=20, num_std_dev=2):
@@ -18,42 +19,23 @@ def bollinger_strategy(data, window=20, num_std_dev=2):
     - Compra cuando el precio está por debajo de la banda inferior.
     - Venta cuando el precio está por encima de la banda superior.
     """
-    data = calculate_bollinger_bands(data, window, num_std_dev)
-    data['Buy_Signal'] = data['Close'] < data['Lower_Band']
-    data['Sell_Signal'] = data['Close'] > data['Upper_Band']
+    return add_bollinger_signals(calculate_bollinger_bands(data, window, num_std_dev))
+
+def add_bollinger_signals(data):
+    """Señales de Bollinger (`bollinger.buy`/`bollinger.sell`) a partir de las bandas."""
+    data['bollinger.buy'] = data['Close'] < data['Lower_Band']
+    data['bollinger.sell'] = data['Close'] > data['Upper_Band']
     return data
 
-def plot_bollinger_bands(data):
+def plot_bollinger_bands(data, output_file='bollinger_bands_plot.png', max_points=2000):
     """
-    Grafica las Bandas de Bollinger junto con los precios.
+    Grafica las Bandas de Bollinger junto con los precios (series largas
+    reducidas a `max_points` puntos por línea; ver `strategies.charts.render_chart`).
     """
-    plt.figure(figsize=(12, 6))
-
-    # Gráfica del precio de cierre
-    plt.plot(data['Close'], label='Precio de Cierre', color='blue', alpha=0.6)
-
-    # Gráfica de las bandas
-    plt.plot(data['SMA'], label='SMA (Media Móvil)', color='orange', alpha=0.8)
-    plt.plot(data['Upper_Band'], label='Banda Superior', color='red', linestyle='--', alpha=0.8)
-    plt.plot(data['Lower_Band'], label='Banda Inferior', color='green', linestyle='--', alpha=0.8)
-
-    # Señales de compra y venta
-    buy_signals = data[data['Buy_Signal']]
-    plt.scatter(buy_signals.index, buy_signals['Close'], label='Compra', marker='^', color='green', alpha=1)
-
-    sell_signals = data[data['Sell_Signal']]
-    plt.scatter(sell_signals.index, sell_signals['Close'], label='Venta', marker='v', color='red', alpha=1)
-
-    plt.title('Bandas de Bollinger')
-    plt.xlabel('Tiempo')
-    plt.ylabel('Precio')
-    plt.legend()
-    plt.grid()
-    plt.tight_layout()
+    from strategies.charts import render_chart
 
-    # Guardar gráfico como archivo PNG
-    plt.savefig('bollinger_bands_plot.png')
-    print("Gráfico guardado como 'bollinger_bands_plot.png'")
+    render_chart(data, 'bollinger', output_file, max_points=max_points)
+    print(f"Gráfico guardado como '{output_file}'")
 
 # Bloque de prueba
 if __name__ == "__main__":
@@ -67,7 +49,7 @@ if __name__ == "__main__":
     result = bollinger_strategy(df, window=5, num_std_dev=2)
 
     # Muestra las columnas relevantes
-    print(result[['Close', 'SMA', 'Upper_Band', 'Lower_Band', 'Buy_Signal', 'Sell_Signal']])
+    print(result[['Close', 'SMA', 'Upper_Band', 'Lower_Band', 'bollinger.buy', 'bollinger.sell']])
 
     # Guarda los resultados en un archivo CSV
     result.to_csv('bollinger_bands_results.csv', index=False)
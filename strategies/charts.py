@@ -0,0 +1,253 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from strategies.pipeline import StrategyPipeline
+from utils.logger import main_logger
+from utils.metrics import metrics
+
+# Gráfico de cada estrategia: líneas (columna, etiqueta, color, estilo, alpha) y señales de compra y venta,
+# todas columnas de `StrategyPipeline`
+STRATEGY_CHARTS = {
+    'moving_average': {
+        'title': 'Estrategia de Medias Móviles',
+        'lines': [
+            ('Close', 'Precio de Cierre', 'blue', '-', 0.6),
+            ('SMA_Short', 'SMA Corta', 'green', '-', 0.6),
+            ('SMA_Long', 'SMA Larga', 'red', '-', 0.6),
+        ],
+        'buy': 'ma.buy',
+        'sell': 'ma.sell',
+    },
+    'bollinger': {
+        'title': 'Bandas de Bollinger',
+        'lines': [
+            ('Close', 'Precio de Cierre', 'blue', '-', 0.6),
+            ('SMA', 'SMA (Media Móvil)', 'orange', '-', 0.8),
+            ('Upper_Band', 'Banda Superior', 'red', '--', 0.8),
+            ('Lower_Band', 'Banda Inferior', 'green', '--', 0.8),
+        ],
+        'buy': 'bollinger.buy',
+        'sell': 'bollinger.sell',
+    },
+}
+
+
+def minmax_indices(y, max_points):
+    """
+    Índices de una reducción min/max: en cada uno de `(max_points - 2) // 2` tramos
+    se conservan el mínimo y el máximo (más el primer y el último punto), de
+    modo que los picos siguen viéndose. Completamente vectorizado.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max((max_points - 2) // 2, 1)
+    size = -(-n // buckets)
+    # El último tramo se completa repitiendo el último valor; sus índices se recortan a n - 1
+    padded = np.concatenate([y, np.full(buckets * size - n, y[-1])]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate([[0], offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1), [n - 1]])
+    return np.unique(np.minimum(indices, n - 1))
+
+
+def lttb_indices(y, max_points):
+    """
+    Índices de Largest-Triangle-Three-Buckets: en cada tramo se elige el punto
+    que forma el triángulo de mayor área con el punto elegido en el tramo
+    anterior y la media del siguiente. Conserva mejor la forma que min/max
+    con menos puntos, pero recorre los tramos uno a uno.
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        mean_x, mean_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[selected] - mean_x) * (y[start:end] - y[selected])
+                      - (x[selected] - x[start:end]) * (mean_y - y[selected]))
+        selected = start + int(area.argmax())
+        indices[bucket + 1] = selected
+    return indices
+
+
+DOWNSAMPLERS = {'minmax': minmax_indices, 'lttb': lttb_indices}
+
+
+def downsample(y, max_points=2000, method='minmax'):
+    """
+    Índices de los puntos a dibujar de una serie (los NaN iniciales de las
+    medias móviles se descartan antes de reducir).
+    """
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(np.isfinite(y))
+    if len(valid) == len(y):
+        return DOWNSAMPLERS[method](y, max_points)
+    return valid[DOWNSAMPLERS[method](y[valid], max_points)]
+
+
+def signal_entries(mask, max_markers=500):
+    """
+    Posiciones donde una señal booleana se activa (flanco de subida), en vez
+    de una marca por cada vela con la señal activa. Si hay más de
+    `max_markers`, se toma una muestra uniforme.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    entries = np.flatnonzero(mask & ~np.concatenate([[False], mask[:-1]]))
+    if len(entries) > max_markers:
+        entries = entries[np.linspace(0, len(entries) - 1, max_markers).astype(int)]
+    return entries
+
+
+def _x_values(data, n):
+    """Eje X: `CloseTime` (ms) como fechas si existe; si no, el índice del DataFrame o la posición."""
+    if 'CloseTime' in data:
+        return np.asarray(data['CloseTime']).astype('datetime64[ms]')
+    if isinstance(data, pd.DataFrame):
+        return np.asarray(data.index)
+    return np.arange(n)
+
+
+def render_chart(data, strategy, output_file, title=None, max_points=2000, method='minmax', max_markers=500,
+                 figsize=(12, 6), dpi=100):
+    """
+    Dibuja el gráfico de una estrategia con el backend Agg y la API orientada
+    a objetos (sin estado global de `pyplot`, seguro en hilos y procesos).
+
+    Args:
+        data: DataFrame o diccionario de arrays con las columnas de la estrategia.
+        strategy (str): Clave de `STRATEGY_CHARTS`.
+        output_file (str): Ruta del archivo (el formato sale de la extensión).
+        max_points (int): Puntos por línea como máximo tras la reducción.
+        method (str): 'minmax' o 'lttb'.
+        max_markers (int): Marcas de compra/venta como máximo.
+
+    Returns:
+        str: `output_file`.
+    """
+    spec = STRATEGY_CHARTS[strategy]
+    n = len(data['Close'])
+    x = _x_values(data, n)
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    for column, label, color, linestyle, alpha in spec['lines']:
+        y = np.asarray(data[column], dtype=float)
+        keep = downsample(y, max_points, method)
+        axes.plot(x[keep], y[keep], label=label, color=color, linestyle=linestyle, alpha=alpha)
+
+    close = np.asarray(data['Close'], dtype=float)
+    for column, label, marker, color in ((spec['buy'], 'Compra', '^', 'green'), (spec['sell'], 'Venta', 'v', 'red')):
+        entries = signal_entries(data[column], max_markers)
+        axes.scatter(x[entries], close[entries], label=label, marker=marker, color=color, alpha=1)
+
+    axes.set_title(title or spec['title'])
+    axes.set_xlabel('Tiempo')
+    axes.set_ylabel('Precio')
+    axes.legend()
+    axes.grid()
+    figure.tight_layout()
+    figure.savefig(output_file)
+    return output_file
+
+
+def chart_columns(strategy):
+    """Columnas que necesita el gráfico de una estrategia."""
+    spec = STRATEGY_CHARTS[strategy]
+    return [column for column, *_ in spec['lines']] + [spec['buy'], spec['sell']]
+
+
+def _render_job(symbol, strategy, candles, output_file, params, options):
+    """Tarea de un worker: calcula con el pipeline las columnas que falten y dibuja el gráfico."""
+    data = pd.DataFrame(candles)
+    missing = [column for column in chart_columns(strategy) if column not in data]
+    if missing:
+        computed = StrategyPipeline(data, **params).frame(missing)
+        data = pd.concat([data, computed], axis=1)
+    title = f"{STRATEGY_CHARTS[strategy]['title']} - {symbol}"
+    return render_chart(data, strategy, output_file, title=title, **options)
+
+
+def render_many(jobs, output_dir="charts", max_workers=None, fmt='png', **options):
+    """
+    Dibuja en paralelo (pool de procesos) los gráficos de muchos símbolos y
+    estrategias, un archivo por símbolo y estrategia:
+    `<output_dir>/<símbolo>_<estrategia>.<fmt>`.
+
+    Args:
+        jobs: Iterable de (símbolo, estrategia, velas[, parámetros]). Las velas
+            son un DataFrame o diccionario de arrays con `Close` (y opcionalmente
+            `CloseTime`); si no traen las columnas de la estrategia, el worker las
+            calcula con `StrategyPipeline` y `parámetros` (p. ej. `bb_window`).
+        options: Se pasan a `render_chart` (`max_points`, `method`, `figsize`...).
+
+    Yields:
+        tuple: (símbolo, estrategia, ruta) de cada gráfico, a medida que terminan.
+        Los que fallan se registran en el log y no se devuelven.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {}
+        for job in jobs:
+            symbol, strategy, candles = job[:3]
+            params = job[3] if len(job) > 3 else {}
+            if isinstance(candles, pd.DataFrame):
+                candles = {column: candles[column].to_numpy() for column in candles}
+            output_file = os.path.join(output_dir, f"{symbol}_{strategy}.{fmt}")
+            future = executor.submit(_render_job, symbol, strategy, candles, output_file, params, options)
+            futures[future] = (symbol, strategy)
+        for future in as_completed(futures):
+            symbol, strategy = futures[future]
+            try:
+                yield symbol, strategy, future.result()
+            except Exception as e:
+                metrics.inc('errors', component='charts')
+                main_logger.error(f"Error al generar el gráfico {strategy} de {symbol}: {e}")
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import tempfile
+    from strategies.bollinger_bands import bollinger_strategy
+
+    # Un año de velas de 1 minuto
+    rng = np.random.default_rng(7)
+    n = 525_600
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.0008, n)))
+    close_time = 1_704_067_200_000 + np.arange(1, n + 1) * 60_000 - 1
+    data = bollinger_strategy(pd.DataFrame({'Close': close, 'CloseTime': close_time}))
+
+    # Las reducciones conservan los extremos y el primer y último punto
+    for method in DOWNSAMPLERS:
+        start = time.perf_counter()
+        keep = downsample(close, 2000, method)
+        elapsed = time.perf_counter() - start
+        assert keep[0] == 0 and keep[-1] == n - 1 and len(keep) <= 2000
+        print(f"{method}: {n} -> {len(keep)} puntos en {elapsed * 1e3:.1f} ms")
+    keep = downsample(close, 2000, 'minmax')
+    assert close[keep].max() == close.max() and close[keep].min() == close.min()
+
+    directory = tempfile.mkdtemp()
+    start = time.perf_counter()
+    render_chart(data, 'bollinger', os.path.join(directory, 'bollinger.png'))
+    print(f"Gráfico de {n} velas en {time.perf_counter() - start:.2f}s")
+
+    # Muchos símbolos y las dos estrategias en paralelo
+    symbols = [f"PAR{i}USDT" for i in range(16)]
+    jobs = [(symbol, strategy, {'Close': 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n))), 'CloseTime': close_time},
+             {'bb_window': 60} if strategy == 'bollinger' else {'short_window': 30, 'long_window': 120})
+            for symbol in symbols for strategy in STRATEGY_CHARTS]
+    start = time.perf_counter()
+    paths = list(render_many(jobs, output_dir=directory))
+    print(f"{len(paths)} gráficos en {time.perf_counter() - start:.2f}s en '{directory}'")
+    assert len(paths) == len(jobs) and all(os.path.getsize(path) > 0 for _, _, path in paths)
@@ -0,0 +1,273 @@
+import math
+from collections import deque
+
+
+class RollingWindow:
+    """
+    Media y varianza de una ventana deslizante actualizadas en O(1) por vela.
+
+    Usa Welford con reemplazo (entra un valor, sale el más antiguo) y recalcula
+    la suma exacta cada cierto número de actualizaciones para acotar el error
+    acumulado de coma flotante.
+    """
+
+    RECALC_EVERY = 10_000
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("La ventana debe ser mayor o igual a 1.")
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._updates = 0
+
+    @property
+    def ready(self):
+        return len(self.values) == self.window
+
+    def update(self, value):
+        """Añade un valor a la ventana y descarta el más antiguo si está llena."""
+        self.values.append(value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            new_mean = self.mean + (value - old) / self.window
+            self.m2 += (value - old) * (value - new_mean + old - self.mean)
+            self.mean = new_mean
+        else:
+            delta = value - self.mean
+            self.mean += delta / len(self.values)
+            self.m2 += delta * (value - self.mean)
+        if self.m2 < 0:
+            self.m2 = 0.0
+
+        self._updates += 1
+        if self._updates % self.RECALC_EVERY == 0:
+            self._recalculate()
+
+    def _recalculate(self):
+        """Recalcula media y M2 desde la ventana (O(window), amortizado)."""
+        n = len(self.values)
+        self.mean = math.fsum(self.values) / n
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in self.values)
+
+    def state(self):
+        return {'window': self.window, 'values': list(self.values), 'mean': self.mean, 'm2': self.m2,
+                'updates': self._updates}
+
+    def restore(self, state):
+        if state['window'] != self.window:
+            raise ValueError(f"Ventana distinta en la instantánea ({state['window']} != {self.window}).")
+        self.values = deque(float(value) for value in state['values'])
+        self.mean = state['mean']
+        self.m2 = state['m2']
+        self._updates = state['updates']
+
+    def get_mean(self):
+        """Media de la ventana; NaN hasta tener `window` valores (como pandas)."""
+        return self.mean if self.ready else math.nan
+
+    def get_std(self):
+        """Desviación estándar muestral (ddof=1), igual que `rolling().std()`."""
+        if not self.ready or self.window < 2:
+            return math.nan
+        return math.sqrt(self.m2 / (self.window - 1))
+
+
+class IncrementalEMA:
+    """EMA recursiva equivalente a `ewm(span=span, adjust=False).mean()`."""
+
+    def __init__(self, span):
+        self.alpha = 2 / (span + 1)
+        self.value = math.nan
+
+    def update(self, value):
+        if math.isnan(self.value):
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def state(self):
+        return {'alpha': self.alpha, 'value': self.value}
+
+    def restore(self, state):
+        if state['alpha'] != self.alpha:
+            raise ValueError("Periodo de EMA distinto en la instantánea.")
+        self.value = state['value']
+
+
+class IncrementalRSI:
+    """
+    RSI incremental.
+
+    Por defecto reproduce `calculate_rsi` (medias simples de ganancias y
+    pérdidas, con la primera diferencia tratada como 0). Con `wilder=True`
+    aplica el suavizado de Wilder una vez completada la primera ventana.
+    """
+
+    def __init__(self, window=14, wilder=False):
+        self.window = window
+        self.wilder = wilder
+        self.gains = RollingWindow(window)
+        self.losses = RollingWindow(window)
+        self.prev_close = None
+        self.avg_gain = math.nan
+        self.avg_loss = math.nan
+        self.value = math.nan
+
+    def update(self, close):
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+
+        if self.wilder and self.gains.ready:
+            self.avg_gain = (self.avg_gain * (self.window - 1) + gain) / self.window
+            self.avg_loss = (self.avg_loss * (self.window - 1) + loss) / self.window
+        else:
+            self.gains.update(gain)
+            self.losses.update(loss)
+            self.avg_gain = self.gains.get_mean()
+            self.avg_loss = self.losses.get_mean()
+
+        self.value = self._rsi(self.avg_gain, self.avg_loss)
+        return self.value
+
+    def state(self):
+        return {'wilder': self.wilder, 'gains': self.gains.state(), 'losses': self.losses.state(),
+                'prev_close': self.prev_close, 'avg_gain': self.avg_gain, 'avg_loss': self.avg_loss,
+                'value': self.value}
+
+    def restore(self, state):
+        if state['wilder'] != self.wilder:
+            raise ValueError("Tipo de suavizado del RSI distinto en la instantánea.")
+        self.gains.restore(state['gains'])
+        self.losses.restore(state['losses'])
+        self.prev_close = state['prev_close']
+        self.avg_gain = state['avg_gain']
+        self.avg_loss = state['avg_loss']
+        self.value = state['value']
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            return math.nan
+        if avg_loss == 0:
+            # Igual que pandas: x/0 -> inf (RSI=100) y 0/0 -> NaN
+            return 100.0 if avg_gain > 0 else math.nan
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+class IndicatorEngine:
+    """
+    Motor de indicadores en streaming: recibe una vela cerrada cada vez y
+    actualiza SMA corta/larga, RSI, MACD y Bandas de Bollinger en tiempo
+    constante. Los nombres de los valores coinciden con las columnas que
+    generan las estrategias de pandas.
+    """
+
+    def __init__(self, short_window=5, long_window=10, rsi_window=14,
+                 macd_short=12, macd_long=26, macd_signal=9,
+                 bb_window=20, num_std_dev=2):
+        self.num_std_dev = num_std_dev
+        self.sma_short = RollingWindow(short_window)
+        self.sma_long = RollingWindow(long_window)
+        self.rsi = IncrementalRSI(rsi_window)
+        self.ema_short = IncrementalEMA(macd_short)
+        self.ema_long = IncrementalEMA(macd_long)
+        self.signal_line = IncrementalEMA(macd_signal)
+        self.bollinger = RollingWindow(bb_window)
+        self.values = {}
+
+    def update(self, close):
+        """Procesa el cierre de una vela y devuelve los valores actualizados."""
+        close = float(close)
+        self.sma_short.update(close)
+        self.sma_long.update(close)
+        self.bollinger.update(close)
+        rsi = self.rsi.update(close)
+        ema_short = self.ema_short.update(close)
+        ema_long = self.ema_long.update(close)
+        macd = ema_short - ema_long
+        signal_line = self.signal_line.update(macd)
+
+        sma = self.bollinger.get_mean()
+        band_width = self.num_std_dev * self.bollinger.get_std()
+
+        values = self.values
+        values['Close'] = close
+        values['SMA_Short'] = self.sma_short.get_mean()
+        values['SMA_Long'] = self.sma_long.get_mean()
+        values['RSI'] = rsi
+        values['EMA_Short'] = ema_short
+        values['EMA_Long'] = ema_long
+        values['MACD'] = macd
+        values['Signal_Line'] = signal_line
+        values['MACD_Histogram'] = macd - signal_line
+        values['SMA'] = sma
+        values['Upper_Band'] = sma + band_width
+        values['Lower_Band'] = sma - band_width
+        return values
+
+    def seed(self, closes):
+        """Inicializa el estado con un histórico de cierres (del más antiguo al más reciente)."""
+        for close in closes:
+            self.update(close)
+        return self.values
+
+    # Acumuladores que forman el estado del motor (para instantáneas)
+    _STATE = ('sma_short', 'sma_long', 'rsi', 'ema_short', 'ema_long', 'signal_line', 'bollinger')
+
+    def state(self):
+        """Estado completo de los acumuladores, serializable, para reanudar sin reprocesar velas."""
+        state = {name: getattr(self, name).state() for name in self._STATE}
+        state['num_std_dev'] = self.num_std_dev
+        state['values'] = dict(self.values)
+        return state
+
+    @staticmethod
+    def _signature(state):
+        """Parámetros del motor implícitos en un estado (ventanas, periodos y desviaciones)."""
+        return (state['sma_short']['window'], state['sma_long']['window'], state['rsi']['gains']['window'],
+                state['rsi']['wilder'], state['ema_short']['alpha'], state['ema_long']['alpha'],
+                state['signal_line']['alpha'], state['bollinger']['window'], state['num_std_dev'])
+
+    def restore(self, state):
+        """
+        Reanuda desde `state()`. Lanza ValueError si los parámetros del motor no
+        coinciden con los de la instantánea (antes de modificar nada).
+        """
+        if self._signature(state) != self._signature(self.state()):
+            raise ValueError("Los parámetros de los indicadores no coinciden con los de la instantánea.")
+        for name in self._STATE:
+            getattr(self, name).restore(state[name])
+        self.values = dict(state['values'])
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import numpy as np
+    import pandas as pd
+    from strategies.moving_average import moving_average_strategy
+    from strategies.rsi import calculate_rsi
+    from strategies.macd import calculate_macd
+    from strategies.bollinger_bands import calculate_bollinger_bands
+
+    # Paseo aleatorio como serie de precios de ejemplo
+    rng = np.random.default_rng(42)
+    closes = 3000 + np.cumsum(rng.normal(0, 5, 5000))
+
+    df = pd.DataFrame({"Close": closes})
+    df = moving_average_strategy(df)
+    df = calculate_rsi(df)
+    df = calculate_macd(df)
+    df = calculate_bollinger_bands(df)
+
+    engine = IndicatorEngine()
+    rows = [dict(engine.update(c)) for c in closes]
+    streamed = pd.DataFrame(rows)
+
+    for column in streamed.columns:
+        np.testing.assert_allclose(streamed[column], df[column], rtol=1e-9, atol=1e-9)
+    print(f"Indicadores incrementales idénticos a pandas en {len(closes)} velas.")
@@ -9,9 +9,12 @@ def calculate_macd(data, short_window=12, long_window=26, signal_window=9):
     data['MACD_Histogram'] = data['MACD'] - data['Signal_Line']
     return data
 
+def add_macd_signals(data):
+    """Señales del MACD (`macd.buy`/`macd.sell`) a partir de sus columnas."""
+    data['macd.buy'] = (data['MACD'] > data['Signal_Line']) & (data['MACD_Histogram'] > 0)
+    data['macd.sell'] = (data['MACD'] < data['Signal_Line']) & (data['MACD_Histogram'] < 0)
+    return data
+
 def macd_strategy(data):
     """Genera señales basadas en el MACD."""
-    data = calculate_macd(data)
-    data['Buy_Signal'] = (data['MACD'] > data['Signal_Line']) & (data['MACD_Histogram'] > 0)
-    data['Sell_Signal'] = (data['MACD'] < data['Signal_Line']) & (data['MACD_Histogram'] < 0)
-    return data
+    return add_macd_signals(calculate_macd(data))
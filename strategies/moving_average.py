@@ -1,40 +1,29 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 
-def moving_average_strategy(data, short_window=5, long_window=10):
-    """Estrategia de trading basada en medias móviles."""
+def calculate_moving_averages(data, short_window=5, long_window=10):
+    """Calcula las medias móviles simples corta y larga."""
     data['SMA_Short'] = data['Close'].rolling(window=short_window).mean()
     data['SMA_Long'] = data['Close'].rolling(window=long_window).mean()
-    data['Signal'] = data['SMA_Short'] > data['SMA_Long']  # Señal de compra
-    data['Sell_Signal'] = data['SMA_Short'] < data['SMA_Long']  # Señal de venta
     return data
 
-def plot_strategy(data):
-    """Grafica los precios y las señales de compra/venta."""
-    plt.figure(figsize=(12, 6))
-
-    # Gráfica del precio de cierre y medias móviles
-    plt.plot(data['Close'], label='Precio de Cierre', color='blue', alpha=0.6)
-    plt.plot(data['SMA_Short'], label='SMA Corta', color='green', alpha=0.6)
-    plt.plot(data['SMA_Long'], label='SMA Larga', color='red', alpha=0.6)
-
-    # Señales de compra
-    buy_signals = data[data['Signal']]
-    plt.scatter(buy_signals.index, buy_signals['Close'], label='Compra', marker='^', color='green', alpha=1)
+def add_moving_average_signals(data):
+    """Señales del cruce de medias (`ma.buy`/`ma.sell`) a partir de `SMA_Short` y `SMA_Long`."""
+    data['ma.buy'] = data['SMA_Short'] > data['SMA_Long']  # Señal de compra
+    data['ma.sell'] = data['SMA_Short'] < data['SMA_Long']  # Señal de venta
+    return data
 
-    # Señales de venta
-    sell_signals = data[data['Sell_Signal']]
-    plt.scatter(sell_signals.index, sell_signals['Close'], label='Venta', marker='v', color='red', alpha=1)
+def moving_average_strategy(data, short_window=5, long_window=10):
+    """Estrategia de trading basada en medias móviles."""
+    return add_moving_average_signals(calculate_moving_averages(data, short_window, long_window))
 
-    plt.title('Estrategia de Medias Móviles')
-    plt.xlabel('Tiempo')
-    plt.ylabel('Precio')
-    plt.legend()
-    plt.grid()
+def plot_strategy(data, output_file='moving_average_plot.png', max_points=2000):
+    """
+    Grafica los precios y las señales de compra/venta (series largas reducidas
+    a `max_points` puntos por línea; ver `strategies.charts.render_chart`).
+    """
+    from strategies.charts import render_chart
 
-    # Guardar el gráfico como archivo PNG
-    output_file = 'moving_average_plot.png'
-    plt.savefig(output_file)
+    render_chart(data, 'moving_average', output_file, max_points=max_points)
     print(f"Gráfico guardado como '{output_file}'")
 
 # Bloque de pruebas
@@ -50,8 +39,8 @@ if __name__ == "__main__":
     long_window = 5
     result = moving_average_strategy(df, short_window, long_window)
 
-    # Muestra el DataFrame con las columnas SMA y Signal
-    print(result[['Close', 'SMA_Short', 'SMA_Long', 'Signal', 'Sell_Signal']])
+    # Muestra el DataFrame con las columnas SMA y las señales
+    print(result[['Close', 'SMA_Short', 'SMA_Long', 'ma.buy', 'ma.sell']])
 
     # Guarda los resultados en un archivo CSV
     result.to_csv('moving_average_results.csv', index=False)
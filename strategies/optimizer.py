@@ -0,0 +1,190 @@
+import csv
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from strategies.backtester import simulate, summarize
+from strategies.pipeline import StrategyPipeline
+
+# Parámetros de cada indicador: combinaciones con los mismos valores comparten cálculo
+INDICATOR_PARAMS = {
+    'rsi': ('rsi_window',),
+    'macd': ('macd_short', 'macd_long', 'macd_signal'),
+    'bollinger': ('bb_window', 'num_std_dev'),
+}
+
+# Columnas del pipeline que usan las reglas de cada indicador
+INDICATOR_OUTPUTS = {
+    'rsi': ('RSI',),
+    'macd': ('MACD', 'Signal_Line'),
+    'bollinger': ('Upper_Band', 'Lower_Band'),
+}
+DECISION_PARAMS = ('fee_rate', 'precision', 'min_notional', 'percentage', 'min_margin', 'min_rsi', 'max_rsi')
+DEFAULTS = {'rsi_window': 14, 'macd_short': 12, 'macd_long': 26, 'macd_signal': 9, 'bb_window': 20, 'num_std_dev': 2}
+INDICATOR_KEYS = tuple(name for params in INDICATOR_PARAMS.values() for name in params)
+
+
+def grid_space(space):
+    """Todas las combinaciones de un espacio `{parámetro: [valores]}`."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_space(space, n_samples, seed=None):
+    """
+    Muestra aleatoria (sin repetición) de `n_samples` combinaciones del espacio.
+
+    Se sortean posiciones de la rejilla y cada una se traduce a sus valores
+    (numeración de base mixta, el último parámetro varía más rápido, como en
+    `grid_space`), sin construir todas las combinaciones.
+    """
+    names = list(space)
+    sizes = [len(space[name]) for name in names]
+    total = math.prod(sizes)
+    if n_samples >= total:
+        return grid_space(space)
+    combinations = []
+    for index in random.Random(seed).sample(range(total), n_samples):
+        values = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            index, position = divmod(index, size)
+            values[name] = space[name][position]
+        combinations.append({name: values[name] for name in names})
+    return combinations
+
+
+def _validate(params):
+    unknown = set(params) - set(INDICATOR_KEYS) - set(DECISION_PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros no soportados por el backtest: {sorted(unknown)}")
+
+
+def _group_tasks(combinations, chunk_size):
+    """
+    Agrupa las combinaciones por parámetros de indicadores, de modo que cada
+    tarea calcule sus indicadores una vez y evalúe varias reglas de decisión.
+    """
+    groups = {}
+    for params in combinations:
+        _validate(params)
+        full = {**DEFAULTS, **params}
+        key = tuple(full[name] for name in INDICATOR_KEYS)
+        decision = {name: params[name] for name in DECISION_PARAMS if name in params}
+        groups.setdefault(key, []).append(decision)
+
+    # Ordenar por clave favorece que tareas consecutivas reutilicen indicadores en el mismo worker
+    for key in sorted(groups):
+        decisions = groups[key]
+        for start in range(0, len(decisions), chunk_size):
+            yield dict(zip(INDICATOR_KEYS, key)), decisions[start:start + chunk_size]
+
+
+# Estado de cada proceso worker
+_worker = {}
+
+
+def _init_worker(shm_name, length, initial_balance, symbol):
+    """Adjunta el histórico desde memoria compartida (sin copiarlo ni serializarlo)."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker['shm'] = shm  # Mantiene viva la referencia al segmento
+    _worker['close'] = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+    _worker['initial_balance'] = initial_balance
+    _worker['symbol'] = symbol
+    _worker['cache'] = {}
+
+
+def _indicator(name, params, max_cached=32):
+    """Calcula (o reutiliza) las columnas de un indicador para unos parámetros."""
+    key = (name,) + tuple(params[p] for p in INDICATOR_PARAMS[name])
+    cache = _worker['cache']
+    if key not in cache:
+        if len(cache) >= max_cached:
+            cache.pop(next(iter(cache)))
+        pipeline = StrategyPipeline({'Close': _worker['close']}, **{p: params[p] for p in INDICATOR_PARAMS[name]})
+        cache[key] = pipeline.compute(INDICATOR_OUTPUTS[name])
+    return cache[key]
+
+
+def _run_task(indicator_params, decisions):
+    indicators = {}
+    for name in INDICATOR_PARAMS:
+        indicators.update(_indicator(name, indicator_params))
+
+    results = []
+    for decision in decisions:
+        equity, trades = simulate(_worker['close'], indicators, symbol=_worker['symbol'],
+                                  initial_balance=_worker['initial_balance'], **decision)
+        results.append({**indicator_params, **decision, **summarize(equity, trades)})
+    return results
+
+
+def optimize(close, combinations, results_file=None, max_workers=None, chunk_size=16,
+             initial_balance=1000, symbol="ETHUSDT"):
+    """
+    Ejecuta backtests de todas las combinaciones en un pool de procesos.
+
+    El histórico de cierres se publica una sola vez en memoria compartida.
+    Los resultados se devuelven (y se añaden a `results_file`, si se indica)
+    a medida que terminan.
+
+    Yields:
+        dict: Parámetros y métricas de cada combinación.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=max(close.nbytes, 1))
+    np.ndarray(close.shape, dtype=np.float64, buffer=shm.buf)[:] = close
+
+    writer = None
+    file = None
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(shm.name, len(close), initial_balance, symbol)) as executor:
+            futures = [executor.submit(_run_task, params, decisions)
+                       for params, decisions in _group_tasks(combinations, chunk_size)]
+            for future in as_completed(futures):
+                for row in future.result():
+                    if results_file is not None:
+                        if writer is None:
+                            file = open(results_file, 'a', newline='')
+                            writer = csv.DictWriter(file, fieldnames=list(row))
+                            if file.tell() == 0:
+                                writer.writeheader()
+                        writer.writerow(row)
+                        file.flush()
+                    yield row
+    finally:
+        if file is not None:
+            file.close()
+        shm.close()
+        shm.unlink()
+
+
+def run_optimization(close, space, n_samples=None, seed=None, sort_by='final_equity', **kwargs):
+    """Búsqueda en rejilla (o aleatoria si se indica `n_samples`) y tabla de resultados ordenada."""
+    combinations = grid_space(space) if n_samples is None else random_space(space, n_samples, seed)
+    results = pd.DataFrame(list(optimize(close, combinations, **kwargs)))
+    return results.sort_values(sort_by, ascending=False, ignore_index=True)
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    rng = np.random.default_rng(7)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.0008, 200_000)))
+
+    space = {
+        'rsi_window': [7, 14, 21],
+        'bb_window': [20, 30],
+        'num_std_dev': [2, 2.5],
+        'min_rsi': [30, 35, 40],
+        'min_margin': [0.002, 0.003, 0.005],
+        'percentage': [0.5, 0.7],
+    }
+    start = time.perf_counter()
+    results = run_optimization(close, space)
+    print(f"{len(results)} combinaciones evaluadas en {time.perf_counter() - start:.2f}s")
+    print(results.head())
@@ -0,0 +1,220 @@
+import pandas as pd
+from strategies.bollinger_bands import add_bollinger_signals, calculate_bollinger_bands
+from strategies.macd import add_macd_signals, calculate_macd
+from strategies.moving_average import add_moving_average_signals, calculate_moving_averages
+from strategies.rsi import add_rsi_signals, calculate_rsi
+
+# Parámetros por defecto de los indicadores (los mismos que las funciones de strategies/)
+DEFAULT_PARAMS = {
+    'short_window': 5, 'long_window': 10,
+    'rsi_window': 14, 'rsi_buy': 30, 'rsi_sell': 70,
+    'macd_short': 12, 'macd_long': 26, 'macd_signal': 9,
+    'bb_window': 20, 'num_std_dev': 2,
+    'min_rsi': 35, 'max_rsi': 75,
+}
+
+
+class Indicator:
+    """Nodo del registro: calcula `outputs` a partir de `inputs` con los parámetros `params`."""
+
+    __slots__ = ('name', 'func', 'inputs', 'outputs', 'params')
+
+    def __init__(self, name, func, inputs, outputs, params):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.params = tuple(params)
+
+
+# Registro global: columna de salida -> indicador que la produce
+REGISTRY = {}
+
+
+def register(outputs, inputs=('Close',), params=()):
+    """
+    Registra un indicador o una estrategia.
+
+    La función recibe el pipeline (para pedir sus entradas con `pipeline[col]`)
+    y los valores de los parámetros declarados, y devuelve `{salida: Serie}`.
+    Las señales de una estrategia se nombran con su espacio de nombres
+    (`rsi.buy`, `macd.sell`...) para que ninguna estrategia pise las columnas
+    de otra.
+    """
+    def decorator(func):
+        node = Indicator(func.__name__, func, inputs, outputs, params)
+        for output in node.outputs:
+            if output in REGISTRY:
+                raise ValueError(f"La columna '{output}' ya la produce '{REGISTRY[output].name}'.")
+            REGISTRY[output] = node
+        return func
+    return decorator
+
+
+class StrategyPipeline:
+    """
+    Evaluación perezosa de indicadores y señales sobre una serie de velas.
+
+    Solo se calcula lo que se pide (y sus dependencias) y cada indicador una
+    sola vez por combinación de parámetros, con las mismas funciones
+    `calculate_*` de strategies/. Los datos de entrada no se modifican.
+
+    Args:
+        data: DataFrame o dict de arrays con al menos `Close`.
+        **params: Parámetros que sustituyen a `DEFAULT_PARAMS`.
+    """
+
+    def __init__(self, data, **params):
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Parámetros desconocidos: {sorted(unknown)}")
+        self.data = data
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.index = data.index if isinstance(data, pd.DataFrame) else None
+        self._results = {}
+        self._intermediates = {}
+        self.evaluated = []  # Indicadores calculados, en orden (útil para depurar el plan)
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def get(self, name):
+        """Serie de una columna de entrada, indicador o señal, calculándola si hace falta."""
+        if name in self.data:
+            return self._input(name)
+        node = REGISTRY.get(name)
+        if node is None:
+            raise KeyError(f"Columna o indicador desconocido: '{name}'")
+        key = (node.name, tuple(self.params[param] for param in node.params))
+        if key not in self._results:
+            for dependency in node.inputs:
+                self.get(dependency)
+            results = node.func(self, **{param: self.params[param] for param in node.params})
+            self._results[key] = results
+            self.evaluated.append(node.name)
+        return self._results[key][name]
+
+    def _input(self, name):
+        key = ('input', name)
+        if key not in self._intermediates:
+            column = self.data[name]
+            self._intermediates[key] = column if isinstance(column, pd.Series) else pd.Series(column, index=self.index)
+        return self._intermediates[key]
+
+    def compute(self, columns):
+        """Calcula las columnas pedidas y las devuelve como dict de arrays de numpy."""
+        return {name: self.get(name).to_numpy() for name in columns}
+
+    def frame(self, columns):
+        """DataFrame nuevo con las columnas pedidas."""
+        return pd.DataFrame({name: self.get(name) for name in columns})
+
+
+def dependencies(name):
+    """Indicadores necesarios para calcular `name`, en orden de evaluación."""
+    order = []
+
+    def visit(column):
+        node = REGISTRY.get(column)
+        if node is None or node.name in order:
+            return
+        for dependency in node.inputs:
+            visit(dependency)
+        order.append(node.name)
+
+    visit(name)
+    return order
+
+
+# --- Indicadores (las funciones de strategies/ sobre un DataFrame nuevo) -----------
+
+def _apply(p, function, inputs, outputs, *args):
+    """Aplica una función `calculate_*`/`add_*_signals` a un DataFrame con `inputs` y devuelve `outputs`."""
+    frame = function(p.frame(inputs), *args)
+    return {name: frame[name] for name in outputs}
+
+
+@register(outputs=('SMA_Short', 'SMA_Long'), params=('short_window', 'long_window'))
+def moving_averages(p, short_window, long_window):
+    return _apply(p, calculate_moving_averages, ('Close',), ('SMA_Short', 'SMA_Long'), short_window, long_window)
+
+
+@register(outputs=('RSI',), params=('rsi_window',))
+def rsi(p, rsi_window):
+    return _apply(p, calculate_rsi, ('Close',), ('RSI',), rsi_window)
+
+
+@register(outputs=('EMA_Short', 'EMA_Long', 'MACD', 'Signal_Line', 'MACD_Histogram'),
+          params=('macd_short', 'macd_long', 'macd_signal'))
+def macd(p, macd_short, macd_long, macd_signal):
+    return _apply(p, calculate_macd, ('Close',), ('EMA_Short', 'EMA_Long', 'MACD', 'Signal_Line', 'MACD_Histogram'),
+                  macd_short, macd_long, macd_signal)
+
+
+@register(outputs=('SMA', 'Upper_Band', 'Lower_Band'), params=('bb_window', 'num_std_dev'))
+def bollinger_bands(p, bb_window, num_std_dev):
+    return _apply(p, calculate_bollinger_bands, ('Close',), ('SMA', 'Upper_Band', 'Lower_Band'), bb_window,
+                  num_std_dev)
+
+
+# --- Señales por estrategia (con espacio de nombres) ------------------------------
+
+@register(outputs=('ma.buy', 'ma.sell'), inputs=('SMA_Short', 'SMA_Long'))
+def moving_average_signals(p):
+    return _apply(p, add_moving_average_signals, ('SMA_Short', 'SMA_Long'), ('ma.buy', 'ma.sell'))
+
+
+@register(outputs=('rsi.buy', 'rsi.sell'), inputs=('RSI',), params=('rsi_buy', 'rsi_sell'))
+def rsi_signals(p, rsi_buy, rsi_sell):
+    return _apply(p, add_rsi_signals, ('RSI',), ('rsi.buy', 'rsi.sell'), rsi_buy, rsi_sell)
+
+
+@register(outputs=('macd.buy', 'macd.sell'), inputs=('MACD', 'Signal_Line', 'MACD_Histogram'))
+def macd_signals(p):
+    return _apply(p, add_macd_signals, ('MACD', 'Signal_Line', 'MACD_Histogram'), ('macd.buy', 'macd.sell'))
+
+
+@register(outputs=('bollinger.buy', 'bollinger.sell'), inputs=('Close', 'Upper_Band', 'Lower_Band'))
+def bollinger_signals(p):
+    return _apply(p, add_bollinger_signals, ('Close', 'Upper_Band', 'Lower_Band'), ('bollinger.buy', 'bollinger.sell'))
+
+
+@register(outputs=('trading.buy', 'trading.sell'), inputs=('Close', 'Lower_Band', 'Upper_Band', 'RSI', 'MACD',
+                                                           'Signal_Line'), params=('min_rsi',))
+def trading_signals(p, min_rsi):
+    """
+    Condiciones sin estado de `TradingLogic.should_buy`/`should_sell`; la venta
+    además exige margen sobre el coste medio, que depende de la posición.
+    """
+    return {'trading.buy': (p['Close'] < p['Lower_Band']) & (p['RSI'] < min_rsi),
+            'trading.sell': (p['Close'] > p['Upper_Band']) & (p['MACD'] > p['Signal_Line'])}
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import numpy as np
+    import timeit
+    from benchmarks.synthetic import synthetic_frame
+    from strategies.bollinger_bands import bollinger_strategy
+    from strategies.macd import macd_strategy
+    from strategies.moving_average import moving_average_strategy
+    from strategies.rsi import rsi_strategy
+
+    data = synthetic_frame(1000)
+    pipeline = StrategyPipeline(data)
+    print("Plan para trading.buy:", dependencies('trading.buy'))
+    result = pipeline.frame(['Close', 'trading.buy', 'trading.sell', 'rsi.buy', 'bollinger.sell'])
+    print("Indicadores evaluados:", pipeline.evaluated)
+
+    # Mismos valores que las funciones de strategies/; cada estrategia conserva sus propias señales
+    legacy = bollinger_strategy(macd_strategy(rsi_strategy(moving_average_strategy(data.copy()))))
+    for column in ('SMA_Short', 'SMA_Long', 'RSI', 'MACD', 'Signal_Line', 'SMA', 'Upper_Band', 'Lower_Band'):
+        assert np.allclose(pipeline[column], legacy[column], equal_nan=True), column
+    for column in ('ma.buy', 'rsi.sell', 'macd.buy', 'bollinger.buy'):
+        assert (pipeline[column] == legacy[column]).all(), column
+
+    # Coste por iteración: cadena completa de estrategias vs. solo lo que usan las reglas
+    chain = lambda: bollinger_strategy(macd_strategy(rsi_strategy(moving_average_strategy(data.copy()))))
+    needed = lambda: StrategyPipeline(data).compute(('trading.buy', 'trading.sell'))
+    for name, func in (("cadena de estrategias", chain), ("pipeline (reglas)", needed)):
+        print(f"{name:<22} {timeit.timeit(func, number=200) / 200 * 1e3:.2f} ms")
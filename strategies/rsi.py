@@ -11,15 +11,18 @@ def calculate_rsi(data, window=14):
 
     return data
 
+def add_rsi_signals(data, buy_level=30, sell_level=70):
+    """Señales del RSI (`rsi.buy`/`rsi.sell`) a partir de la columna `RSI`."""
+    data['rsi.buy'] = data['RSI'] < buy_level  # Compra si el RSI está por debajo del umbral (30)
+    data['rsi.sell'] = data['RSI'] > sell_level  # Venta si está por encima (70)
+    return data
+
 def rsi_strategy(data, window=14):
     """Estrategia basada en el RSI"""
     data = calculate_rsi(data, window)
 
     # Genera señales de compra y venta
-    data['Buy_Signal'] = data['RSI'] < 30  # Compra si RSI < 30
-    data['Sell_Signal'] = data['RSI'] > 70  # Venta si RSI > 70
-
-    return data
+    return add_rsi_signals(data)
 
 # Bloque de prueba
 if __name__ == "__main__":
@@ -33,7 +36,7 @@ if __name__ == "__main__":
     result = rsi_strategy(df, window=5)
 
     # Muestra las columnas relevantes
-    print(result[['Close', 'RSI', 'Buy_Signal', 'Sell_Signal']])
+    print(result[['Close', 'RSI', 'rsi.buy', 'rsi.sell']])
 
     # Guarda los resultados en un archivo CSV
     result.to_csv('rsi_results.csv', index=False)
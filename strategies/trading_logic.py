@@ -1,3 +1,5 @@
+import math
+
 class TradingLogic:
     @staticmethod
     def calculate_operable_quantity(balance, price, fee_rate=0.001, precision=4, min_notional=10, percentage=0.7):
@@ -20,6 +22,28 @@ class TradingLogic:
             return 0
         return round(max_quantity, precision)
 
+    @staticmethod
+    def limit_quantity_to_depth(quantity, max_quantity, price, precision=4, min_notional=10):
+        """
+        Recorta la cantidad a la que el libro de órdenes puede absorber sin superar
+        el deslizamiento máximo.
+
+        Args:
+            quantity (float): Cantidad calculada a partir del saldo.
+            max_quantity (float): Cantidad máxima según el libro (`OrderBook.max_quantity`).
+            price (float): Precio de ejecución esperado.
+            precision (int, opcional): Precisión decimal (se redondea hacia abajo). Default: 4.
+            min_notional (float, opcional): Valor mínimo permitido por operación. Default: 10.
+
+        Returns:
+            float: Cantidad operable, o 0 si la recortada no alcanza el notional mínimo.
+        """
+        if quantity <= max_quantity:
+            return quantity
+        factor = 10 ** precision
+        limited = math.floor(max_quantity * factor) / factor
+        return limited if limited * price >= min_notional else 0
+
     @staticmethod
     def meets_expected_margin(buy_price, sell_price, fee_rate=0.001, min_margin=0.003):
         """
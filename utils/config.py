@@ -4,4 +4,35 @@ SECRET_KEY = "tOHHMTbDEbWdC19vvxpcFXClxk12EMQtXZTbndUUnPAsseCnTgG1WchKJIVgbjkE"
 
 # Configuraciones de trading
 TRADE_SYMBOL = "ETHUSDT"  # Par de mercado
-TRADE_QUANTITY = 0.001     # Cantidad fija para operar
\ No newline at end of file
+TRADE_SYMBOLS = [TRADE_SYMBOL]  # Pares operados en paralelo por el mismo proceso
+TRADE_QUANTITY = 0.001     # Cantidad fija para operar
+
+# Registro (logs)
+LOG_SAMPLING = {"DEBUG": 0.01}  # Proporción de registros a conservar por nivel
+LOG_LEAN_RECORDS = False  # True: no registrar hilo ni proceso en ningún logger del proceso (ajuste global)
+
+# Métricas
+METRICS_PORT = 9108  # Puerto local del endpoint Prometheus (None para desactivarlo)
+
+# Grabación de la E/S con el exchange (para reproducir incidencias con `python main.py --replay <archivo>`).
+# Desactivada por defecto: guarda saldos, órdenes y cada evento de profundidad de todos los pares en un
+# único archivo sin límite de tamaño. Para activarla, p. ej. "journals/exchange-%Y%m%d-%H%M%S.jsonl.gz"
+EXCHANGE_JOURNAL = None
+
+# Instantáneas del estado de cada par para reanudar en caliente tras un reinicio
+STATE_SNAPSHOT_DIR = "snapshots"  # None para arrancar siempre en frío
+
+# Histórico local de velas cerradas de cada par (columnas memory-mapped); el arranque en frío solo descarga
+# las que faltan desde la última ejecución
+CANDLE_STORE_DIR = "candles"  # None para no guardar velas en disco
+
+# Libro de órdenes L2 local (stream de profundidad) para dimensionar las órdenes según el deslizamiento esperado
+ORDER_BOOK_ENABLED = True
+
+# Límites de riesgo de la cartera (moneda cotizada); None desactiva cada límite y RISK_LIMITS = None, todos
+RISK_LIMITS = {
+    "max_symbol_exposure": None,  # Valor máximo de la posición de un par
+    "max_total_exposure": None,  # Valor máximo de todas las posiciones juntas
+    "max_var": 0.05,  # VaR (99%, una vela) máximo como fracción del capital
+    "max_drawdown": 0.2,  # Caída desde el máximo de capital que activa el kill switch
+}
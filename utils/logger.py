@@ -1,28 +1,172 @@
+import atexit
+import gzip
+import itertools
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import time
+from utils.config import LOG_LEAN_RECORDS, LOG_SAMPLING
+
+# Opcional: deja de recoger hilo y proceso en los registros de todo el proceso, no solo en
+# los del bot (ver "Optimization" en la documentación de logging)
+if LOG_LEAN_RECORDS:
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+
+class LeanLogger(logging.Logger):
+    """
+    Logger que no recorre la pila para averiguar el archivo y la línea de
+    cada llamada: el formato JSON no los usa. Solo afecta a los loggers
+    creados con `setup_logger`; el resto conserva el comportamiento estándar.
+    """
+
+    def findCaller(self, stack_info=False, stacklevel=1):
+        if stack_info:
+            return super().findCaller(stack_info, stacklevel)
+        return "(unknown file)", 0, "(unknown function)", None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola el registro sin formatearlo: el mensaje, los campos y la escritura
+    se resuelven en el hilo del `QueueListener`, no en el bucle de trading.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formatea cada registro como una línea JSON.
+
+    Los campos estructurados se pasan con `extra={'fields': {...}}`; si un
+    valor es invocable se evalúa aquí, en el hilo de escritura, de modo que
+    solo se calcula si el registro llega a escribirse.
+    """
+
+    def format(self, record):
+        payload = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            for key, value in fields.items():
+                payload[key] = value() if callable(value) else value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo por nivel: con `{'DEBUG': 0.01}` se conserva 1 de cada 100
+    registros DEBUG. Los niveles no indicados se conservan siempre.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.every = {logging.getLevelName(level) if isinstance(level, str) else level: max(1, round(1 / rate))
+                      for level, rate in rates.items() if rate > 0}
+        self.dropped = {logging.getLevelName(level) if isinstance(level, str) else level
+                        for level, rate in rates.items() if rate <= 0}
+        # Un contador por nivel: `next` sobre `itertools.count` es atómico, así que
+        # varios hilos registrando a la vez no pierden ni repiten cuentas
+        self.counters = {level: itertools.count() for level in self.every}
+
+    def filter(self, record):
+        if record.levelno in self.dropped:
+            return False
+        every = self.every.get(record.levelno)
+        if every is None or every == 1:
+            return True
+        return next(self.counters[record.levelno]) % every == 0
+
+
+def _gzip_rotator(source, dest):
+    """Comprime el archivo rotado y elimina el original."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+_listeners = []
+
+
+def setup_logger(name, log_file, level=logging.INFO, max_bytes=50 * 1024 * 1024, backup_count=10,
+                 sampling=None):
+    """
+    Crea y configura un logger no bloqueante.
+
+    Los registros pasan por una cola a un hilo en segundo plano que los
+    formatea como JSON lines y los escribe en `log_file`, rotando por tamaño
+    (`max_bytes`) y comprimiendo con gzip los archivos rotados.
+
+    Args:
+        sampling (dict, opcional): Proporción de registros a conservar por nivel,
+            p. ej. `{'DEBUG': 0.01, 'INFO': 0.5}`.
+    """
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+    if type(logger) is logging.Logger:
+        logger.__class__ = LeanLogger  # Sin estado propio: solo cambia `findCaller` de este logger
 
-def setup_logger(name, log_file, level=logging.INFO):
-    """Crea y configura un logger."""
     # Verifica que el directorio exista; si no, lo crea
     log_dir = os.path.dirname(log_file)
-    if not os.path.exists(log_dir):
+    if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
-    handler = logging.FileHandler(log_file)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding='utf-8')
+    file_handler.namer = lambda default_name: default_name + '.gz'
+    file_handler.rotator = _gzip_rotator
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
 
-    logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(handler)
+    logger.propagate = False
+    if sampling:
+        logger.addFilter(SamplingFilter(sampling))
+    logger.addHandler(DeferredQueueHandler(log_queue))
 
     return logger
 
+
+def log_event(logger, level, message, **fields):
+    """
+    Registra un evento estructurado. Los campos pueden ser valores o
+    funciones sin argumentos (evaluación diferida); si el nivel no está
+    habilitado no se construye nada.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={'fields': fields})
+
+
+@atexit.register
+def _stop_listeners():
+    # Vacía las colas pendientes antes de salir
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
 # Logger principal
-main_logger = setup_logger('main_logger', 'logs/trading_bot.log')
+main_logger = setup_logger('main_logger', 'logs/trading_bot.log', sampling=LOG_SAMPLING)
 
 # Bloque para pruebas
 if __name__ == "__main__":
     main_logger.info("Esto es un mensaje de prueba INFO.")
     main_logger.warning("Esto es un mensaje de prueba WARNING.")
     main_logger.error("Esto es un mensaje de prueba ERROR.")
+    log_event(main_logger, logging.INFO, "Evento estructurado de prueba", price=3000.5, rsi=lambda: 42.0)
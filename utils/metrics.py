@@ -0,0 +1,234 @@
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Sub-cubos por potencia de 2: error relativo máximo ~1/SUB_BUCKETS (≈3%)
+SUB_BUCKETS = 32
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    """
+    Histograma logarítmico-lineal al estilo HDR para latencias en segundos.
+
+    Cada potencia de 2 (en microsegundos) se divide en `SUB_BUCKETS` cubos
+    lineales, así que registrar un valor es O(1) y los percentiles tienen un
+    error relativo acotado independientemente del rango.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _index(micros):
+        if micros < 1:
+            return 0
+        mantissa, exponent = math.frexp(micros)
+        return exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+    @staticmethod
+    def _upper_bound(index):
+        """Límite superior (en segundos) del cubo `index`."""
+        if index == 0:
+            return 1e-6
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent) / 1e6
+
+    def record(self, seconds):
+        index = self._index(seconds * 1e6)
+        with self.lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def time(self):
+        """Context manager que registra la duración del bloque."""
+        return _Timer(self)
+
+    def quantiles(self, quantiles=QUANTILES):
+        """Percentiles aproximados (límite superior del cubo correspondiente)."""
+        with self.lock:
+            items = sorted(self.counts.items())
+            count = self.count
+        result = {}
+        if not count:
+            return {q: 0.0 for q in quantiles}
+        targets = sorted(quantiles)
+        seen = 0
+        position = 0
+        for index, bucket_count in items:
+            seen += bucket_count
+            while position < len(targets) and seen >= targets[position] * count:
+                result[targets[position]] = min(self._upper_bound(index), self.max)
+                position += 1
+        for q in targets[position:]:
+            result[q] = self.max
+        return result
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.start)
+        return False
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Registro de histogramas de latencia y contadores, con etiquetas opcionales."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name, **labels):
+        key = (name, _label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def counter(self, name, **labels):
+        key = (name, _label_key(labels))
+        counter = self.counters.get(key)
+        if counter is None:
+            with self.lock:
+                counter = self.counters.setdefault(key, Counter())
+        return counter
+
+    def timer(self, name, **labels):
+        """Context manager que registra la duración del bloque en `name`."""
+        return self.histogram(name, **labels).time()
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).record(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        self.counter(name, **labels).inc(amount)
+
+    def prometheus_text(self):
+        """Exposición en formato de texto de Prometheus (histogramas como `summary`)."""
+        lines = []
+        declared = set()
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            metric = f"{name}_seconds"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} summary")
+                declared.add(metric)
+            for q, value in histogram.quantiles().items():
+                lines.append(f"{metric}{_format_labels(labels + (('quantile', q),))} {value:.9f}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.total:.9f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), counter in sorted(self.counters.items()):
+            metric = f"{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {counter.value}")
+        return "\n".join(lines) + "\n"
+
+    def summary_line(self):
+        """Resumen compacto (p50/p99 en ms y contadores) para el log periódico."""
+        parts = []
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if not histogram.count:
+                continue
+            q = histogram.quantiles((0.5, 0.99))
+            label = ",".join(str(value) for _, value in labels)
+            parts.append(f"{name}{'[' + label + ']' if label else ''} p50={q[0.5] * 1e3:.2f}ms "
+                         f"p99={q[0.99] * 1e3:.2f}ms n={histogram.count}")
+        for (name, labels), counter in sorted(self.counters.items()):
+            label = ",".join(str(value) for _, value in labels)
+            parts.append(f"{name}{'[' + label + ']' if label else ''}={counter.value}")
+        return "; ".join(parts)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+# Registro global del proceso
+metrics = MetricsRegistry()
+
+
+def start_metrics_server(port=9108, host="127.0.0.1", registry=metrics):
+    """Sirve `/metrics` en formato Prometheus desde un hilo en segundo plano (solo localhost)."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Sin ruido en stderr por cada consulta
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# Bloque de prueba
+if __name__ == "__main__":
+    import random
+    import urllib.request
+
+    histogram = metrics.histogram('demo', stage='prueba')
+    n = 200_000
+    start = time.perf_counter()
+    for _ in range(n):
+        with histogram.time():
+            pass
+    print(f"Coste por medición: {(time.perf_counter() - start) / n * 1e6:.2f} µs")
+
+    exact = sorted(random.lognormvariate(-6, 1) for _ in range(100_000))
+    sample = metrics.histogram('demo', stage='lognormal')
+    for value in exact:
+        sample.record(value)
+    for q, value in sample.quantiles().items():
+        print(f"p{q * 100:g}: histograma={value * 1e3:.4f}ms exacto={exact[int(q * len(exact)) - 1] * 1e3:.4f}ms")
+
+    metrics.inc('orders', type='MARKET', side='BUY')
+    server = start_metrics_server(port=0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+        print(response.read().decode()[:400])
+    print(metrics.summary_line())
+    server.shutdown()
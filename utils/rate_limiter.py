@@ -0,0 +1,205 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from utils.logger import main_logger
+from utils.metrics import metrics
+
+# Peso aproximado de cada endpoint REST de Binance que usa el bot
+REQUEST_WEIGHTS = {
+    'get_klines': 2,
+    'get_account': 20,
+    'get_ticker': 2,
+    'get_exchange_info': 20,
+    'get_symbol_info': 20,
+    'get_order_book': 50,  # Con limit=1000, el que usa el libro de órdenes local
+    'order_market': 1,
+    'order_limit': 1,
+    'create_order': 1,
+    'cancel_order': 1,
+    'cancel_replace_order': 1,
+    'create_oco_order': 1,
+    'get_order': 4,
+    'get_open_orders': 6,  # Por símbolo; sin símbolo pesa 80
+    'stream_get_listen_key': 2,
+    'stream_keepalive': 2,
+}
+DEFAULT_WEIGHT = 1
+
+# Carriles de prioridad: las órdenes nunca esperan detrás de consultas de datos
+ORDER_LANE = 0
+DATA_LANE = 1
+ORDER_METHODS = {
+    'order_market', 'order_limit', 'create_order', 'cancel_order', 'cancel_replace_order',
+    'create_oco_order', 'order_oco_sell', 'order_oco_buy', 'order_market_buy', 'order_market_sell',
+    'order_limit_buy', 'order_limit_sell',
+}
+
+# Códigos HTTP de límite excedido (429) y de IP bloqueada por excederlo (418)
+RATE_LIMIT_STATUS = (429, 418)
+USED_WEIGHT_HEADER = 'X-MBX-USED-WEIGHT-1M'
+
+
+def request_lane(method):
+    return ORDER_LANE if method in ORDER_METHODS else DATA_LANE
+
+
+class WeightRateLimiter:
+    """
+    Limitador global por peso (token bucket), seguro entre hilos.
+
+    El cubo se rellena de forma continua hasta `max_weight` cada `period`
+    segundos; cada petición consume su peso y espera si no hay suficiente.
+    Las peticiones de datos no pueden usar la reserva `order_reserve` (parte
+    de la capacidad), y cuando hay que esperar se atiende primero a las
+    órdenes. El peso usado que informa Binance en las respuestas corrige el
+    cubo (`observe_used_weight`) y los 429/418 bloquean las peticiones hasta
+    que pase el `Retry-After` (`backoff`).
+    """
+
+    def __init__(self, max_weight=6000, period=60, safety_margin=0.8, order_reserve=0.1):
+        self.max_weight = max_weight
+        self.capacity = max_weight * safety_margin
+        self.refill_rate = self.capacity / period
+        self.reserve = self.capacity * order_reserve
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.condition = threading.Condition()
+        self._waiters = []
+        self._tickets = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def acquire(self, weight=1, lane=DATA_LANE):
+        """Bloquea hasta disponer de `weight` unidades de peso en el carril indicado."""
+        weight = min(weight, self.capacity - self.reserve)
+        floor = 0.0 if lane == ORDER_LANE else self.reserve
+        with self.condition:
+            ticket = (lane, next(self._tickets))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    now = time.monotonic()
+                    if now < self.blocked_until:
+                        wait = self.blocked_until - now
+                    elif self._waiters[0] != ticket:
+                        wait = None  # Hay peticiones con más prioridad (o anteriores) esperando
+                    elif self.tokens - weight >= floor:
+                        self.tokens -= weight
+                        return
+                    else:
+                        wait = (weight + floor - self.tokens) / self.refill_rate
+                    self.condition.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self.condition.notify_all()
+
+    def observe_used_weight(self, used_weight):
+        """Ajusta el cubo al peso usado que informa el servidor (nunca lo aumenta)."""
+        with self.condition:
+            self._refill()
+            remaining = self.capacity - used_weight * self.capacity / self.max_weight
+            self.tokens = min(self.tokens, remaining)
+
+    def backoff(self, seconds, jitter=0.2):
+        """Bloquea todas las peticiones durante `seconds` (con jitter para no despertar a la vez)."""
+        with self.condition:
+            until = time.monotonic() + seconds * (1 + random.uniform(0, jitter))
+            self.blocked_until = max(self.blocked_until, until)
+            self.tokens = min(self.tokens, 0.0)
+            self.condition.notify_all()
+
+
+def install_weight_tracking(session, limiter):
+    """
+    Añade a la sesión HTTP un hook que sincroniza el limitador con la cabecera
+    de peso usado y aplica el `Retry-After` de las respuestas 429/418.
+    """
+    def track(response, *args, **kwargs):
+        used = response.headers.get(USED_WEIGHT_HEADER)
+        if used is not None:
+            limiter.observe_used_weight(int(used))
+        if response.status_code in RATE_LIMIT_STATUS:
+            retry_after = float(response.headers.get('Retry-After', 60))
+            metrics.inc('rate_limited', status=response.status_code)
+            main_logger.warning(f"Límite de peso excedido (HTTP {response.status_code}); "
+                                f"pausa de {retry_after:.0f}s en las peticiones.")
+            limiter.backoff(retry_after)
+        return response
+
+    session.hooks.setdefault('response', []).append(track)
+
+
+class RateLimitedClient:
+    """
+    Envoltorio de `binance.client.Client` que descuenta el peso de cada llamada
+    en un limitador compartido antes de delegar en el cliente real.
+
+    Las órdenes van por el carril prioritario; las consultas de datos además
+    están limitadas a `max_data_in_flight` peticiones simultáneas, de modo que
+    siempre quedan conexiones e hilos libres para las órdenes. Los 429/418 se
+    reintentan con espera exponencial con jitter (las órdenes solo en ese
+    caso, porque el exchange las rechazó sin ejecutarlas; los datos también
+    ante errores de red).
+
+    Cada llamada registra la espera en el limitador y la duración de la
+    petición (`binance_request`) por método, y cuenta los errores.
+    """
+
+    def __init__(self, client, limiter, weights=None, max_data_in_flight=32, max_retries=3, base_delay=0.5,
+                 max_delay=30.0):
+        self._client = client
+        self._limiter = limiter
+        self._weights = REQUEST_WEIGHTS if weights is None else weights
+        self._data_slots = threading.BoundedSemaphore(max_data_in_flight)
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+
+    def _retryable(self, error, lane):
+        if getattr(error, 'status_code', None) in RATE_LIMIT_STATUS:
+            return True
+        # Errores de red (sin respuesta del exchange): solo es seguro repetir consultas
+        return lane == DATA_LANE and type(error).__name__ in ('ConnectionError', 'Timeout', 'ReadTimeout',
+                                                               'ConnectTimeout')
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+        weight = self._weights.get(name, DEFAULT_WEIGHT)
+        lane = request_lane(name)
+        wait_histogram = metrics.histogram('rate_limit_wait', method=name)
+        request_histogram = metrics.histogram('binance_request', method=name)
+
+        def call(*args, **kwargs):
+            with wait_histogram.time():
+                self._limiter.acquire(weight, lane)
+            with request_histogram.time():
+                return attribute(*args, **kwargs)
+
+        def limited(*args, **kwargs):
+            attempt = 0
+            while True:
+                try:
+                    if lane == DATA_LANE:
+                        with self._data_slots:
+                            return call(*args, **kwargs)
+                    return call(*args, **kwargs)
+                except Exception as e:
+                    metrics.inc('binance_errors', method=name)
+                    if attempt >= self._max_retries or not self._retryable(e, lane):
+                        raise
+                    attempt += 1
+                    delay = min(self._max_delay, self._base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    metrics.inc('retries', method=name)
+                    main_logger.warning(f"Reintento {attempt}/{self._max_retries} de {name} en {delay:.2f}s: {e}")
+                    time.sleep(delay)
+        return limited